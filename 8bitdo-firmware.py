@@ -5,80 +5,666 @@
 
 # based on https://ladis.cloud/blog/posts/firmware-update-8bitdo.html
 
-import requests, json, sys, os
-import urllib.request
+# only cheap modules here: -h and cached listings must not pay for requests,
+# hashlib or the thread pool, those are imported where they are needed
+import json, sys, os, time, heapq
 
 baseurl = "http://dl.8bitdo.com:8080"
 
-products = {}
+# the catalog is cached locally, already indexed by product type and version
+cache_format = 1
+cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "8bitdo-firmware")
+cache_file = os.path.join(cache_dir, "catalog.json")
+cache_ttl = 24 * 60 * 60
+
+offline = False
+refresh = False
+
+# mirror settings: parallel downloads, but at most host_limit at once per server
+mirror_dir = "firmware_downloads"
+jobs = 8
+host_limit = 4
+chunk_size = 64 * 1024
+strict_md5 = False
+
+# the manifest records what is already mirrored, so a sync only fetches the deltas
+manifest_format = 1
+manifest_name = "manifest.json"
+prune = False
+
+# scheduler: listed products first, then newest releases; transient failures are
+# retried with jittered exponential backoff
+priority = []
+attempts = 5
+backoff = 1.0
+max_backoff = 60.0
+status_interval = 1.0
 
 
 def help():
-    print("Usage: 8bitdo-firmware.py ...\n")
+    print("Usage: 8bitdo-firmware.py [options] ...\n")
     print("\t-l\t\tlist all available devices")
     print("\t-l [num]\tlist all firmware versions for device [num]")
-    print("\t-f [num] [ver]\tfetch firmware version [ver] for device [num]\n")
+    print("\t-f [num] [ver]\tfetch firmware version [ver] for device [num]")
+    print(f"\t-m [dir]\tmirror all firmware versions of all devices (default: {mirror_dir})")
+    print("\t-s [dir]\tsync the mirror, fetching only firmware missing from its manifest\n")
+    print("Options:\n")
+    print(f"\t--server [url]\tfirmware server to use (default: {baseurl})")
+    print("\t--offline\tonly use the cached catalog, never contact the server")
+    print("\t--refresh\tignore the cache age and fetch a new catalog")
+    print(f"\t--ttl [sec]\tmaximum age of the cached catalog (default: {cache_ttl})")
+    print(f"\t--jobs [num]\tparallel downloads when mirroring (default: {jobs})")
+    print(f"\t--host-limit [num]\tparallel downloads per server (default: {host_limit})")
+    print("\t--strict-md5\ttreat an MD5 mismatch against readme.txt as a failed download")
+    print("\t--prune\t\tremove mirrored firmware that is no longer in the catalog")
+    print("\t--priority [num,...]\tmirror these devices first (default: newest firmware first)")
+    print(f"\t--retries [num]\tattempts per file for transient errors (default: {attempts})")
+    print(f"\t--backoff [sec]\tinitial retry delay, doubled on every attempt (default: {backoff})\n")
     exit(0)
 
 
+def write_atomic(path, data):
+    # write to a temporary file next to the target, then rename over it
+    import tempfile
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_index(items):
+    # { "type": { "name": fileName, "versions": { "version": item } } }
+    products = {}
+    for item in items:
+        product = products.setdefault(str(item["type"]), {"name": item["fileName"], "versions": {}})
+        product["versions"][str(item["version"])] = item
+    return products
+
+
+def load_cache():
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("format") != cache_format or cache.get("baseurl") != baseurl:
+        return None
+    return cache
+
+
+def fetch_catalog():
+    import requests, random
+    for attempt in range(attempts):
+        try:
+            response = requests.post(baseurl + "/firmware/select", headers={"Beta": "1"}, timeout=60)
+            response.raise_for_status()
+            result = response.json()
+            break
+        except requests.RequestException as e:
+            if attempt + 1 == attempts or not is_transient(e):
+                raise
+            time.sleep(min(max_backoff, backoff * 2 ** attempt) * random.uniform(0.5, 1.5))
+    cache = {
+        "format": cache_format,
+        "baseurl": baseurl,
+        "fetched": time.time(),
+        "products": build_index(result["list"]),
+    }
+    write_atomic(cache_file, cache)
+    return cache
+
+
+def get_catalog():
+    cache = load_cache()
+
+    if offline:
+        if cache is None:
+            print("... no cached catalog available for offline use.\n")
+            exit(1)
+        return cache["products"]
+
+    if cache is not None and not refresh and time.time() - cache["fetched"] < cache_ttl:
+        return cache["products"]
+
+    import requests
+    try:
+        return fetch_catalog()["products"]
+    except (requests.RequestException, ValueError, KeyError) as e:
+        if cache is None:
+            raise
+        print(f"... catalog update failed ({e}), using cached copy.\n")
+        return cache["products"]
+
+
+def find_version(product, ver):
+    if ver in product["versions"]:
+        return product["versions"][ver]
+    for version, fw in product["versions"].items():
+        if version.startswith(ver):
+            return fw
+    return None
+
+
+def write_readme(path, fw):
+    # same layout as the readme.txt files already present in firmware_downloads/
+    def changelog(text):
+        return "\n".join(line.strip() for line in (text or "").splitlines() if line.strip())
+
+    # written next to the target and renamed over it: the old readme.txt may be a
+    # hard link into a deduplicated store and must not be modified in place
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("固件信息\n")
+        f.write("===================\n\n")
+        f.write(f"设备名称: {fw['fileName']}\n")
+        f.write(f"固件版本: {fw['version']}\n")
+        f.write(f"发布日期: {fw.get('date', '')}\n")
+        f.write(f"文件大小: {fw.get('fileSize', 0)} bytes\n")
+        f.write(f"MD5校验: {fw.get('md5', '')}\n\n")
+        f.write("更新日志 (中文):\n")
+        f.write(changelog(fw.get("readme")) + "\n\n")
+        f.write("更新日志 (English):\n")
+        f.write(changelog(fw.get("readme_en")) + "\n\n")
+        f.write("下载统计:\n")
+        f.write(f"- Windows: {fw.get('winDownload', 0)}\n")
+        f.write(f"- macOS: {fw.get('macDownload', 0)}\n")
+        f.write(f"- Android: {fw.get('androidDownload', 0)}\n")
+        f.write(f"- iOS: {fw.get('iOSDownload', 0)}\n\n")
+        f.write("原始API信息:\n")
+        f.write(json.dumps(fw, indent=2, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+host_locks = {}
+
+
+def host_lock(url):
+    import threading
+    from urllib.parse import urlsplit
+    return host_locks.setdefault(urlsplit(url).netloc, threading.BoundedSemaphore(host_limit))
+
+
+class DownloadError(Exception):
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def readme_md5(folder):
+    import re
+    try:
+        with open(os.path.join(folder, "readme.txt"), encoding="utf-8") as f:
+            match = re.search(r"^MD5校验: *(\w*)", f.read(), re.M)
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+
+def hash_part(part):
+    # hash state of an interrupted download, so resuming continues the digests
+    import hashlib
+    md5sum, sha256sum, offset = hashlib.md5(), hashlib.sha256(), 0
+    if os.path.exists(part):
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                md5sum.update(chunk)
+                sha256sum.update(chunk)
+                offset += len(chunk)
+    return md5sum, sha256sum, offset
+
+
+def download(session, url, file, size=None, md5=None, attempts=3, progress=None):
+    # stream into <file>.part, resuming with a Range request after an interruption;
+    # both digests are computed while writing, so the result is never read back
+    import hashlib, requests
+    part = file + ".part"
+    for attempt in range(attempts):
+        md5sum, sha256sum, offset = hash_part(part)
+        if size is not None and offset >= size:
+            if offset == size:
+                break
+            os.unlink(part)
+            md5sum, sha256sum, offset = hash_part(part)
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with host_lock(url):
+                with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                    if response.status_code == 416:
+                        # the .part file is no longer a prefix of the file on the server
+                        if os.path.exists(part):
+                            os.unlink(part)
+                        md5sum, sha256sum, offset = hashlib.md5(), hashlib.sha256(), 0
+                        continue
+                    response.raise_for_status()
+                    if offset and response.status_code != 206:
+                        # server ignored the range, start over
+                        md5sum, sha256sum, offset = hashlib.md5(), hashlib.sha256(), 0
+                    with open(part, "ab" if offset else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                            md5sum.update(chunk)
+                            sha256sum.update(chunk)
+                            offset += len(chunk)
+                            if progress:
+                                progress(len(chunk))
+                        f.flush()
+                        os.fsync(f.fileno())
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            if attempt == attempts - 1:
+                raise
+    else:
+        # every attempt got 416, so there is nothing left to move into place
+        raise DownloadError("server rejected the resume range on every attempt", transient=True)
+
+    if size is not None and offset != size:
+        raise DownloadError(f"size mismatch: expected {size}, got {offset}", transient=True)
+
+    # the MD5 published by the vendor does not always match the served file,
+    # so a mismatch is only reported unless --strict-md5 is given
+    digest = md5sum.hexdigest()
+    md5_ok = not md5 or digest.upper() == md5.upper()
+    if not md5_ok and strict_md5:
+        os.unlink(part)
+        raise DownloadError(f"MD5 mismatch: expected {md5.upper()}, got {digest.upper()}")
+
+    os.replace(part, file)
+    return {"size": offset, "md5": digest, "sha256": sha256sum.hexdigest(), "md5_ok": md5_ok}
+
+
+def firmware_path(fw, target):
+    folder = os.path.join(target, fw["fileName"], str(fw["version"]))
+    return folder, os.path.join(folder, f"firmware_v{fw['version']}.dat")
+
+
+def mirror_one(session, fw, target, progress=None):
+    folder, file = firmware_path(fw, target)
+    os.makedirs(folder, exist_ok=True)
+
+    # unchanged if the file has the catalog size and readme.txt records the catalog MD5
+    md5 = readme_md5(folder)
+    if os.path.exists(file) and os.path.getsize(file) == fw.get("fileSize") and md5 == fw.get("md5"):
+        return None
+
+    # retries are left to the scheduler, which backs off between attempts
+    result = download(session, baseurl + fw["filePathName"], file, fw.get("fileSize"), md5 or fw.get("md5"),
+                      attempts=1, progress=progress)
+    write_readme(os.path.join(folder, "readme.txt"), fw)
+    return result
+
+
+def is_transient(error):
+    import requests
+    if isinstance(error, DownloadError):
+        return error.transient
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and (error.response.status_code == 429 or error.response.status_code >= 500)
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+def download_priority(fw):
+    # listed products first (in the given order), then the newest release first
+    rank = priority.index(str(fw["type"])) if str(fw["type"]) in priority else len(priority)
+    day = str(fw.get("date") or "")[:10].replace("-", "")
+    return (rank, -int(day) if day.isdigit() else 0, -float(fw["version"]))
+
+
+class Scheduler:
+    # priority queue shared by the download threads; a transient failure goes back
+    # into the queue after a jittered exponential backoff, everything else is final
+
+    def __init__(self, work, jobs, attempts, backoff, max_backoff):
+        import threading
+        self.work = work
+        self.jobs = jobs
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.ready = []
+        self.delayed = []
+        self.seq = 0
+        self.active = 0
+        self.cond = threading.Condition()
+        self.counters = {"done": 0, "failed": 0, "retries": 0, "errors": 0, "bytes": 0}
+        self.started = time.time()
+
+    def _push(self, item, prio, attempt=0, delay=0):
+        self.seq += 1
+        if delay:
+            heapq.heappush(self.delayed, (time.time() + delay, prio, self.seq, item, attempt))
+        else:
+            heapq.heappush(self.ready, (prio, self.seq, item, attempt))
+        self.cond.notify()
+
+    def submit(self, item, prio):
+        with self.cond:
+            self._push(item, prio)
+
+    def progress(self, amount):
+        with self.cond:
+            self.counters["bytes"] += amount
+
+    def status(self):
+        with self.cond:
+            elapsed = max(time.time() - self.started, 1e-6)
+            return dict(self.counters, queued=len(self.ready) + len(self.delayed),
+                        active=self.active, rate=self.counters["bytes"] / elapsed)
+
+    def next(self):
+        with self.cond:
+            while True:
+                now = time.time()
+                while self.delayed and self.delayed[0][0] <= now:
+                    due, prio, seq, item, attempt = heapq.heappop(self.delayed)
+                    heapq.heappush(self.ready, (prio, seq, item, attempt))
+                if self.ready:
+                    self.active += 1
+                    return heapq.heappop(self.ready)
+                if not self.delayed and self.active == 0:
+                    self.cond.notify_all()
+                    return None
+                self.cond.wait(self.delayed[0][0] - now if self.delayed else None)
+
+    def worker(self, done):
+        import random
+        while True:
+            task = self.next()
+            if task is None:
+                return
+            prio, seq, item, attempt = task
+            try:
+                result, error = self.work(item, self.progress), None
+            except Exception as e:
+                result, error = None, e
+            retry = error is not None and is_transient(error) and attempt + 1 < self.attempts
+            with self.cond:
+                self.active -= 1
+                if error is not None:
+                    self.counters["errors"] += 1
+                if retry:
+                    self.counters["retries"] += 1
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+                    self._push(item, prio, attempt + 1, delay)
+                else:
+                    self.counters["failed" if error is not None else "done"] += 1
+                self.cond.notify_all()
+            if not retry:
+                done(item, result, error)
+
+    def run(self, done, report=None):
+        import threading
+        threads = [threading.Thread(target=self.worker, args=(done,), daemon=True) for _ in range(self.jobs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(status_interval)
+                if report:
+                    report(self.status())
+
+
+def load_manifest(target):
+    try:
+        with open(os.path.join(target, manifest_name)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get("entries", {}) if manifest.get("format") == manifest_format else {}
+
+
+def save_manifest(target, entries):
+    write_atomic(os.path.join(target, manifest_name), {
+        "format": manifest_format,
+        "baseurl": baseurl,
+        "updated": time.time(),
+        "entries": entries,
+    })
+
+
+def manifest_key(fw):
+    return f"{fw['type']}/{fw['version']}"
+
+
+def manifest_entry(fw, target, result):
+    return {
+        "product": fw["fileName"],
+        "type": fw["type"],
+        "version": str(fw["version"]),
+        "size": result["size"],
+        "md5": result["md5"],
+        "sha256": result["sha256"],
+        "vendor_md5": fw.get("md5", ""),
+        "source": fw["filePathName"],
+        "path": os.path.relpath(firmware_path(fw, target)[1], target),
+    }
+
+
+def is_current(entry, fw, target):
+    return (entry is not None
+            and entry["source"] == fw["filePathName"]
+            and entry["size"] == fw.get("fileSize")
+            and entry["vendor_md5"] == fw.get("md5", "")
+            and os.path.exists(os.path.join(target, entry["path"])))
+
+
+def hash_existing(file):
+    md5sum, sha256sum, size = hash_part(file)
+    return {"size": size, "md5": md5sum.hexdigest(), "sha256": sha256sum.hexdigest()}
+
+
+def remove_entry(entry, target):
+    # only remove what the mirror created, analysis output next to it is kept
+    path = os.path.join(target, entry["path"])
+    folder = os.path.dirname(path)
+    for file in (path, os.path.join(folder, "readme.txt")):
+        if os.path.exists(file):
+            os.unlink(file)
+    for folder in (folder, os.path.dirname(folder)):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            break
+
+
+def mirror(products, target, incremental=False):
+    import requests, threading
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    entries = load_manifest(target)
+    firmwares = {manifest_key(fw): fw for product in products.values() for fw in product["versions"].values()}
+    pending = [fw for key, fw in firmwares.items()
+               if not (incremental and is_current(entries.get(key), fw, target))]
+    print(f"Mirroring {len(pending)} of {len(firmwares)} firmware files into {target}/:\n")
+
+    # on a terminal the live counters share one status line with the progress messages
+    tty = sys.stderr.isatty()
+    clear = "\r\033[K" if tty else ""
+    lock = threading.Lock()
+    counts = {"fetched": 0, "skipped": 0, "failed": 0, "unverified": 0}
+    saved = [time.time()]
+
+    def done(fw, result, error):
+        key = manifest_key(fw)
+        name = f"{fw['fileName']} {fw['version']}"
+        with lock:
+            if error is not None:
+                counts["failed"] += 1
+                print(f"{clear}Failed: {name} ({error})")
+            elif result is None:
+                counts["skipped"] += 1
+                # already on disk, but not yet known to the manifest
+                if not is_current(entries.get(key), fw, target):
+                    entries[key] = manifest_entry(fw, target, hash_existing(firmware_path(fw, target)[1]))
+            else:
+                entries[key] = manifest_entry(fw, target, result)
+                counts["fetched"] += 1
+                if result["md5_ok"]:
+                    print(f"{clear}Downloaded: " + name)
+                else:
+                    counts["unverified"] += 1
+                    print(f"{clear}Downloaded: {name} (MD5 {result['md5'].upper()} differs from readme.txt)")
+            # keep the manifest close to the disk state so a crash loses little
+            if time.time() - saved[0] > 5:
+                save_manifest(target, entries)
+                saved[0] = time.time()
+
+    def report(status):
+        if tty:
+            sys.stderr.write(f"{clear}[{status['done'] + status['failed']}/{len(pending)} done, "
+                             f"{status['active']} active, {status['queued']} queued, "
+                             f"{status['retries']} retries, {status['errors']} errors, "
+                             f"{status['rate'] / (1024 * 1024):.2f} MB/s]")
+            sys.stderr.flush()
+
+    scheduler = Scheduler(lambda fw, progress: mirror_one(session, fw, target, progress),
+                          jobs, attempts, backoff, max_backoff)
+    for fw in pending:
+        scheduler.submit(fw, download_priority(fw))
+
+    try:
+        scheduler.run(done, report)
+        if tty:
+            sys.stderr.write(clear)
+
+        withdrawn = [key for key in entries if key not in firmwares]
+        if prune:
+            for key in withdrawn:
+                remove_entry(entries.pop(key), target)
+                print(f"Removed: {key}")
+        elif withdrawn:
+            print(f"\n{len(withdrawn)} mirrored firmware files are no longer in the catalog (use --prune to remove).")
+    finally:
+        # after Ctrl-C the workers may still be inside done() updating entries
+        with lock:
+            save_manifest(target, entries)
+
+    status = scheduler.status()
+    print(f"\n{counts['fetched']} downloaded ({counts['unverified']} with MD5 mismatch), "
+          f"{counts['skipped']} already present, {counts['failed']} failed.")
+    print(f"{status['bytes']} bytes at {status['rate'] / (1024 * 1024):.2f} MB/s, "
+          f"{status['errors']} errors, {status['retries']} retries.\n")
+    return counts["failed"] == 0
+
+
 print("8BitDo Firmware Fetcher v0.0.1\n")
 
-if len(sys.argv) == 1 or sys.argv[1] in ["-?", "-h", "--help"]:
+args = []
+argv = iter(sys.argv[1:])
+for arg in argv:
+    if arg == "--offline":
+        offline = True
+    elif arg == "--server":
+        baseurl = next(argv, baseurl).rstrip("/")
+    elif arg == "--refresh":
+        refresh = True
+    elif arg == "--ttl":
+        cache_ttl = int(next(argv, "0"))
+    elif arg == "--jobs":
+        jobs = max(1, int(next(argv, "1")))
+    elif arg == "--host-limit":
+        host_limit = max(1, int(next(argv, "1")))
+    elif arg == "--strict-md5":
+        strict_md5 = True
+    elif arg == "--prune":
+        prune = True
+    elif arg == "--priority":
+        priority = [num.strip() for num in next(argv, "").split(",") if num.strip()]
+    elif arg == "--retries":
+        attempts = max(1, int(next(argv, "1")))
+    elif arg == "--backoff":
+        backoff = float(next(argv, "0"))
+    else:
+        args.append(arg)
+
+if len(args) == 0 or args[0] in ["-?", "-h", "--help"]:
     help()
 
-response = requests.post(baseurl + "/firmware/select", headers={"Beta": "1"})
-result = response.json()
+# a sync always compares against the current catalog
+if args[0] == "-s":
+    refresh = True
 
-for item in result["list"]:
-    num = item["type"]
-    if not num in products:
-        products[num] = []
-    products[num].append(item)
+products = get_catalog()
 
-if sys.argv[1] == "-l":
+if args[0] == "-l":
 
-    if len(sys.argv) == 2:
+    if len(args) == 1:
 
-        for num, item in products.items():
-            print(f"{num}:\t{item[0]["fileName"]}")
+        for num, product in products.items():
+            print(f"{num}:\t{product['name']}")
 
     else:
 
-        num = int(sys.argv[2])
+        num = args[1]
         if num not in products:
             print("... device number not found.\n")
             exit(1)
-        fws = products[num]
+        product = products[num]
 
-        print(f"Firmware versions for {fws[0]["fileName"]} (#{num}):\n")
+        print(f"Firmware versions for {product['name']} (#{num}):\n")
 
-        for fw in fws:
-            ver = str(fw["version"])
+        for ver, fw in product["versions"].items():
             beta = " (beta)" if fw["beta"] != "" else ""
             print(f"{ver[0:4]} (build {ver[4:]})" + beta)
 
     print("")
     exit(0)
 
-if sys.argv[1] == "-f":
+if args[0] == "-m":
+
+    if len(args) > 2:
+        help()
+
+    target = args[1] if len(args) == 2 else mirror_dir
+    exit(0 if mirror(products, target) else 1)
+
+if args[0] == "-s":
 
-    if len(sys.argv) != 4:
+    if len(args) > 2:
         help()
 
-    num = int(sys.argv[2])
-    ver = sys.argv[3]
+    target = args[1] if len(args) == 2 else mirror_dir
+    exit(0 if mirror(products, target, incremental=True) else 1)
 
-    fws = products[num]
+if args[0] == "-f":
 
-    print(f"Fetching firmware {ver} for {fws[0]["fileName"]} (#{num}):\n")
-    for fw in fws:
-        if str(fw["version"]).startswith(ver):
-            url = baseurl + fw["filePathName"]
-            file = os.path.basename(url)
-            print("Downloading: " + url)
-            urllib.request.urlretrieve(url, file)
-            print("Saved firmware to " + file + ".\n")
-            exit(0)
+    if len(args) != 3:
+        help()
+
+    num = args[1]
+    ver = args[2]
+
+    if num not in products:
+        print("... device number not found.\n")
+        exit(1)
+    product = products[num]
+
+    print(f"Fetching firmware {ver} for {product['name']} (#{num}):\n")
+    fw = find_version(product, ver)
+    if fw is not None:
+        url = baseurl + fw["filePathName"]
+        file = os.path.basename(url)
+        print("Downloading: " + url)
+        import requests
+        try:
+            result = download(requests.Session(), url, file, fw.get("fileSize"), fw.get("md5"))
+        except (requests.RequestException, OSError, DownloadError) as e:
+            print(f"... download failed ({e}), run again to resume.\n")
+            exit(1)
+        print(f"MD5: {result['md5'].upper()}" + ("" if result["md5_ok"] else " (differs from catalog)"))
+        print(f"SHA-256: {result['sha256']}")
+        print("Saved firmware to " + file + ".\n")
+        exit(0)
 
     print("... version not found.\n")
     exit(1)
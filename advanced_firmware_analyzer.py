@@ -12,6 +12,8 @@ import binascii
 import hashlib
 from collections import OrderedDict
 
+from crypto_constants import CryptoConstantScanner
+
 class FirmwareAnalyzer:
     def __init__(self, firmware_path):
         self.firmware_path = firmware_path
@@ -186,6 +188,11 @@ class FirmwareAnalyzer:
             if positions:
                 found_patterns[name] = positions
         
+        # 指纹库中的算法常量表
+        for item in CryptoConstantScanner.shared().scan(self.data):
+            name = item['type'] if item['complete'] else '{}(部分)'.format(item['type'])
+            found_patterns.setdefault(name, []).append(item['start'])
+        
         self.analysis_results['加密模式'] = found_patterns
     
     def analyze_sections(self):
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fwupd固件包 (.cab) 构建工具
+纯Python实现releases/<产品>/<版本>/Makefile中 gcab --create --nopath 的功能:
+读取Makefile中的FIRMWARE_FILES和METAINFO_FILES，边写入cab边计算固件的SHA-1/SHA-256，
+再把结果填入metainfo.xml的 <checksum target="content"> 后写入同一个cab。
+所有发布目录用进程池并行构建，不需要安装gcab
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import struct
+import hashlib
+import operator
+import functools
+from array import array
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+# 与gcab相同: 不压缩，每个CFDATA块最多32KB
+CAB_BLOCK_SIZE = 32768
+CAB_HEADER_SIZE = 36
+CAB_FOLDER_SIZE = 8
+CAB_FILE_SIZE = 16
+CAB_DATA_SIZE = 8
+CAB_ATTRIB_ARCH = 0x20
+CAB_ATTRIB_NAME_IS_UTF = 0x80
+
+CHECKSUM_PATTERN = re.compile(
+    r'<checksum\b(?P<attrs>[^>]*?\btarget="content"[^>]*?)(?:/>|>[^<]*</checksum>)')
+
+
+def parse_makefile(path):
+    """读取Makefile中的变量 (支持反斜杠续行、$(VAR) 展开和 $(wildcard ...))"""
+    folder = os.path.dirname(path)
+    with open(path, encoding='utf-8') as f:
+        text = f.read().replace('\\\n', ' ')
+
+    variables = {}
+    for match in re.finditer(r'^([A-Z_]+)\s*=(.*)$', text, re.M):
+        variables[match.group(1)] = match.group(2).strip()
+
+    def expand(value):
+        def replace(match):
+            name = match.group(1)
+            if name.startswith('wildcard '):
+                pattern = expand(name[len('wildcard '):].strip())
+                return ' '.join(sorted(os.path.basename(p) for p in glob.glob(os.path.join(folder, pattern))))
+            return expand(variables.get(name, ''))
+        return re.sub(r'\$\(([^)]+)\)', replace, value)
+
+    return {name: expand(value) for name, value in variables.items()}
+
+
+def release_files(release_dir):
+    """返回 (cab文件名, 固件文件列表, metainfo文件列表)"""
+    variables = parse_makefile(os.path.join(release_dir, 'Makefile'))
+    cab_name = '{}-{}-{}.cab'.format(variables['VENDOR'], variables['PROJECT_NAME'], variables['VERSION'])
+    # 文件名可能含空格以外的特殊字符 (如&)，Makefile中用引号包住
+    firmware = variables.get('FIRMWARE_FILES', '').replace('"', '').split()
+    metainfo = variables.get('METAINFO_FILES', '').replace('"', '').split()
+    return cab_name, firmware, metainfo
+
+
+def find_release_dirs(releases_dir='releases'):
+    return sorted(os.path.dirname(path) for path in glob.glob(os.path.join(releases_dir, '*', '*', 'Makefile')))
+
+
+def cab_checksum(data, seed=0):
+    """CFDATA校验和 (MS-CAB): 按小端32位字异或，末尾不足4字节的部分按高位在前拼接"""
+    words = len(data) // 4
+    block = array('I', data[:words * 4])
+    if sys.byteorder == 'big':
+        block.byteswap()
+    csum = functools.reduce(operator.xor, block, seed)
+    tail = 0
+    for byte in data[words * 4:]:
+        tail = (tail << 8) | byte
+    return csum ^ tail
+
+
+def dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    date = ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    clock = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return date, clock
+
+
+def fill_checksums(xml, hashes):
+    """把 <checksum filename=... target="content"/> 替换为带SHA-1和SHA-256值的元素"""
+    def replace(match):
+        attrs = match.group('attrs')
+        name = re.search(r'\bfilename="([^"]*)"', attrs)
+        name = name.group(1).replace('&amp;', '&') if name else (next(iter(hashes)) if len(hashes) == 1 else None)
+        if name not in hashes:
+            return match.group(0)
+        attrs = re.sub(r'\s*\btype="[^"]*"', '', attrs)
+        indent = re.search(r'[ \t]*$', xml[:match.start()]).group(0)
+        return '<checksum type="sha1"{}>{}</checksum>\n{}<checksum type="sha256"{}>{}</checksum>'.format(
+            attrs, hashes[name]['sha1'], indent, attrs, hashes[name]['sha256'])
+    return CHECKSUM_PATTERN.sub(replace, xml)
+
+
+class CabWriter:
+    """
+    单文件夹、不压缩的cab写入器
+    CFHEADER/CFFOLDER/CFFILE的长度只取决于文件名，先预留位置，数据块写完后再回填大小和块数
+    """
+
+    def __init__(self, path, names):
+        self.path = path
+        self.names = names
+        self.entries = []
+        self.blocks = 0
+        self.offset = 0
+        self.pending = b''
+        self.files_offset = CAB_HEADER_SIZE + CAB_FOLDER_SIZE
+        self.data_offset = self.files_offset + sum(
+            CAB_FILE_SIZE + len(name.encode('utf-8')) + 1 for name in names)
+        self.f = open(path + '.tmp', 'wb')
+        self.f.seek(self.data_offset)
+
+    def _write_block(self, data):
+        sizes = struct.pack('<HH', len(data), len(data))
+        csum = cab_checksum(sizes, cab_checksum(data))
+        self.f.write(struct.pack('<I', csum) + sizes)
+        self.f.write(data)
+        self.blocks += 1
+
+    def write(self, data):
+        """按32KB切块写入，块可以跨文件 (与gcab相同)"""
+        self.pending += data
+        while len(self.pending) >= CAB_BLOCK_SIZE:
+            self._write_block(self.pending[:CAB_BLOCK_SIZE])
+            self.pending = self.pending[CAB_BLOCK_SIZE:]
+        self.offset += len(data)
+
+    def add_stream(self, name, f, mtime, hashers=()):
+        start = self.offset
+        for chunk in iter(lambda: f.read(CAB_BLOCK_SIZE), b''):
+            for hasher in hashers:
+                hasher.update(chunk)
+            self.write(chunk)
+        self.entries.append((name, self.offset - start, start, mtime))
+
+    def add_bytes(self, name, data, mtime):
+        self.entries.append((name, len(data), self.offset, mtime))
+        self.write(data)
+
+    def close(self):
+        if self.pending:
+            self._write_block(self.pending)
+            self.pending = b''
+        size = self.f.tell()
+
+        self.f.seek(0)
+        self.f.write(struct.pack('<4sIIIIIBBHHHHH', b'MSCF', 0, size, 0, self.files_offset, 0,
+                                 3, 1, 1, len(self.entries), 0, 0, 0))
+        self.f.write(struct.pack('<IHH', self.data_offset, self.blocks, 0))
+        for name, length, start, mtime in self.entries:
+            encoded = name.encode('utf-8')
+            attribs = CAB_ATTRIB_ARCH | (CAB_ATTRIB_NAME_IS_UTF if len(encoded) != len(name) else 0)
+            date, clock = dos_datetime(mtime)
+            self.f.write(struct.pack('<IIHHHH', length, start, 0, date, clock, attribs) + encoded + b'\0')
+        self.f.close()
+        os.replace(self.path + '.tmp', self.path)
+        return size
+
+
+def read_cabinet(path):
+    """读取不压缩的cab，校验每个CFDATA块的校验和，返回 {文件名: 内容}"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    (signature, _, size, _, files_offset, _, minor, major, folders, count,
+     flags, _, _) = struct.unpack_from('<4sIIIIIBBHHHHH', data)
+    if signature != b'MSCF' or size != len(data):
+        raise ValueError('不是有效的cab文件: {}'.format(path))
+
+    contents = []
+    for folder in range(folders):
+        data_offset, blocks, compress = struct.unpack_from('<IHH', data, CAB_HEADER_SIZE + folder * CAB_FOLDER_SIZE)
+        if compress != 0:
+            raise ValueError('不支持压缩的cab: {}'.format(path))
+        stream = bytearray()
+        for block in range(blocks):
+            csum, length, uncompressed = struct.unpack_from('<IHH', data, data_offset)
+            chunk = data[data_offset + CAB_DATA_SIZE:data_offset + CAB_DATA_SIZE + length]
+            if csum and csum != cab_checksum(data[data_offset + 4:data_offset + 8], cab_checksum(chunk)):
+                raise ValueError('CFDATA校验和错误: {} 块 {}'.format(path, block))
+            stream += chunk
+            data_offset += CAB_DATA_SIZE + length
+        contents.append(bytes(stream))
+
+    files = {}
+    offset = files_offset
+    for _ in range(count):
+        length, start, folder = struct.unpack_from('<IIH', data, offset)
+        end = data.index(b'\0', offset + CAB_FILE_SIZE)
+        files[data[offset + CAB_FILE_SIZE:end].decode('utf-8')] = contents[folder][start:start + length]
+        offset = end + 1
+    return files
+
+
+def build_release(release_dir, output_dir=None):
+    """构建一个发布目录的cab，返回结果字典 (在工作进程中运行)；失败时error为错误信息"""
+    start_time = time.time()
+    cab_name, firmware, metainfo = release_files(release_dir)
+    cab_path = os.path.join(output_dir or release_dir, cab_name)
+    result = {'release': release_dir, 'cab': cab_path, 'size': 0, 'files': len(firmware) + len(metainfo),
+              'hashes': {}, 'error': None, 'warnings': []}
+
+    # 与make相同: 任何依赖文件缺失时不生成cab
+    missing = [name for name in firmware + metainfo if not os.path.exists(os.path.join(release_dir, name))]
+    if missing:
+        result['error'] = '文件不存在: {}'.format(', '.join(missing))
+        result['elapsed'] = time.time() - start_time
+        return result
+
+    writer = CabWriter(cab_path, firmware + metainfo)
+
+    hashes = {}
+    for name in firmware:
+        path = os.path.join(release_dir, name)
+        sha1, sha256 = hashlib.sha1(), hashlib.sha256()
+        with open(path, 'rb') as f:
+            writer.add_stream(name, f, os.fstat(f.fileno()).st_mtime, (sha1, sha256))
+        hashes[name] = {'sha1': sha1.hexdigest(), 'sha256': sha256.hexdigest()}
+
+    for name in metainfo:
+        path = os.path.join(release_dir, name)
+        with open(path, encoding='utf-8') as f:
+            xml = fill_checksums(f.read(), hashes)
+        # 与 make check 相当的最低限度检查: 必须是格式正确的XML (与gcab相同，不影响打包)
+        try:
+            ET.fromstring(xml.encode('utf-8'))
+        except ET.ParseError as e:
+            result['warnings'].append('{}: {}'.format(name, e))
+        writer.add_bytes(name, xml.encode('utf-8'), os.path.getmtime(path))
+
+    result['size'] = writer.close()
+    result['hashes'] = hashes
+    result['elapsed'] = time.time() - start_time
+    return result
+
+
+def build_all(release_dirs, output_dir=None, jobs=None):
+    """用进程池并行构建所有发布目录"""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return [build_release(release_dir, output_dir) for release_dir in release_dirs]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(build_release, release_dirs, [output_dir] * len(release_dirs)))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("用法: python3 {} [发布目录]... [--output 输出目录] [--jobs N] [--verify]".format(sys.argv[0]))
+        print("  不指定发布目录时构建 releases/*/*/ 下所有带Makefile的目录")
+        sys.exit(1)
+
+    args = sys.argv[1:]
+    output_dir = None
+    jobs = None
+    verify = '--verify' in args
+    if verify:
+        args.remove('--verify')
+    if '--output' in args:
+        index = args.index('--output')
+        output_dir = args[index + 1]
+        del args[index:index + 2]
+    if '--jobs' in args:
+        index = args.index('--jobs')
+        jobs = int(args[index + 1])
+        del args[index:index + 2]
+
+    release_dirs = []
+    for path in args or ['releases']:
+        if os.path.exists(os.path.join(path, 'Makefile')):
+            release_dirs.append(path)
+        else:
+            release_dirs.extend(find_release_dirs(path))
+    if not release_dirs:
+        print("错误: 未找到带Makefile的发布目录")
+        sys.exit(1)
+
+    start_time = time.time()
+    results = build_all(release_dirs, output_dir, jobs)
+    elapsed = time.time() - start_time
+
+    failed = [result for result in results if result['error']]
+    built = [result for result in results if not result['error']]
+    for result in built:
+        print("{} ({} 个文件, {} bytes, {:.3f}s)".format(result['cab'], result['files'], result['size'], result['elapsed']))
+        for warning in result['warnings']:
+            print("  警告: XML格式错误 {}".format(warning))
+    for result in failed:
+        print("✗ {}: {}".format(result['release'], result['error']))
+    total = sum(result['size'] for result in built)
+    print("\n已构建 {} 个cab, 失败 {}, 共 {} bytes, 耗时 {:.3f}s".format(len(built), len(failed), total, elapsed))
+
+    if verify:
+        for result in built:
+            files = read_cabinet(result['cab'])
+            for name, digests in result['hashes'].items():
+                if hashlib.sha256(files[name]).hexdigest() != digests['sha256']:
+                    print("  ✗ {}: {} 内容不一致".format(result['cab'], name))
+                    sys.exit(1)
+        print("校验通过: 所有CFDATA校验和与固件SHA-256一致")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
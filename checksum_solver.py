@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+8BitDo固件校验和字段求解器
+把头部中的每个8/16/32位字段当作候选校验值，测试它是否等于某个载荷区间的
+CRC-8/16/32、累加和或异或和:
+- 累加和/异或和使用前缀数组，任意区间O(1)求值，32位字段用哈希表反查区间端点
+- CRC使用预计算查找表，CRC-32和CCITT系列借助位反转走zlib/binascii的C实现
+- 两个方向: 从头部候选起点向后到任意对齐终点，以及从任意对齐起点到文件末尾
+"""
+
+import os
+import sys
+import time
+import zlib
+import struct
+import binascii
+from itertools import accumulate
+from operator import xor
+
+from crypto_constants import crc_table
+
+
+# CRC变体: (xorout=0时的名称, xorout=全1时的名称, 位宽, 查找表多项式, 是否反射, 初值)
+# 同一个寄存器流同时检查两种输出异或值
+CRC_VARIANTS = [
+    ('CRC-32/JAMCRC', 'CRC-32', 32, 0xEDB88320, True, 0xFFFFFFFF),
+    ('CRC-32/MPEG-2', 'CRC-32/BZIP2', 32, 0x04C11DB7, False, 0xFFFFFFFF),
+    ('CRC-16/CCITT-FALSE', 'CRC-16/GENIBUS', 16, 0x1021, False, 0xFFFF),
+    ('CRC-16/XMODEM', 'CRC-16/GSM', 16, 0x1021, False, 0x0000),
+    ('CRC-16/KERMIT', '~CRC-16/KERMIT', 16, 0x8408, True, 0x0000),
+    ('CRC-16/MODBUS', '~CRC-16/MODBUS', 16, 0xA001, True, 0xFFFF),
+    ('CRC-16/ARC', 'CRC-16/MAXIM', 16, 0xA001, True, 0x0000),
+    ('CRC-8', '~CRC-8', 8, 0x07, False, 0x00),
+    ('CRC-8/MAXIM', '~CRC-8/MAXIM', 8, 0x8C, True, 0x00),
+]
+
+# 字节位反转表: 非反射CRC(x) = 位反转(反射CRC(位反转字节(x)))，可借用zlib/binascii
+BIT_REVERSE = bytes(int('{:08b}'.format(i)[::-1], 2) for i in range(256))
+
+
+def _reflect(value, width):
+    return int('{:0{}b}'.format(value, width)[::-1], 2)
+
+
+# 累加/异或序列: (名称, 单元字节数, 字节序, 运算)
+SUM_SEQUENCES = [
+    ('SUM8', 1, '<', 'sum'),
+    ('SUM16_LE', 2, '<', 'sum'),
+    ('SUM16_BE', 2, '>', 'sum'),
+    ('SUM32_LE', 4, '<', 'sum'),
+    ('SUM32_BE', 4, '>', 'sum'),
+    ('XOR8', 1, '<', 'xor'),
+    ('XOR32_LE', 4, '<', 'xor'),
+    ('XOR32_BE', 4, '>', 'xor'),
+]
+
+
+class ChecksumSolver:
+    def __init__(self, data, header_size=64, align=4, min_length=256):
+        self.data = data
+        self.header_size = min(header_size, len(data))
+        self.align = align
+        self.min_length = min_length
+        self.targets = self._collect_targets()
+        self._prefix_cache = {}
+
+    def _collect_targets(self):
+        """
+        收集头部中的候选校验字段
+        返回 {位宽: [(偏移, 字节序, 值), ...]}
+        """
+        header = self.data[:self.header_size]
+        targets = {8: [], 16: [], 32: []}
+        for offset in range(len(header)):
+            targets[8].append((offset, '-', header[offset]))
+        for offset in range(0, len(header) - 1, 2):
+            for endian in '<>':
+                value = struct.unpack(endian + 'H', header[offset:offset + 2])[0]
+                targets[16].append((offset, endian, value))
+        for offset in range(0, len(header) - 3, 4):
+            for endian in '<>':
+                value = struct.unpack(endian + 'I', header[offset:offset + 4])[0]
+                targets[32].append((offset, endian, value))
+        # 全0/全1字段不可能区分出校验算法，直接忽略
+        for width in targets:
+            mask = (1 << width) - 1
+            targets[width] = [t for t in targets[width] if t[2] not in (0, mask)]
+        return targets
+
+    def candidate_starts(self):
+        """头部区域内的对齐位置，以及头部中看起来像头部长度的32位字段值"""
+        starts = set(range(0, self.header_size + 1, self.align))
+        for offset, endian, value in self.targets[32]:
+            if self.header_size < value < len(self.data) // 2 and value % self.align == 0:
+                starts.add(value)
+        return sorted(starts)
+
+    def natural_ends(self, start, width=16):
+        """
+        8/16位校验随机命中率高，只在自然终点上测试:
+        16位为文件末尾及起点加头部中的32位长度字段，8位只测文件末尾
+        """
+        ends = {len(self.data)}
+        if width == 8:
+            return sorted(ends)
+        for offset, endian, value in self.targets[32]:
+            if start + value <= len(self.data) and value >= self.min_length:
+                ends.add(start + value)
+        return sorted(ends)
+
+    def _range_ok(self, start, end, field_offset, width):
+        """区间长度足够且不覆盖校验字段本身"""
+        if end - start < self.min_length:
+            return False
+        field_end = field_offset + width // 8
+        return end <= field_offset or start >= field_end
+
+    def _prefix(self, unit, endian, op):
+        """返回序列前缀数组，prefix[i]为前i个单元的累加和/异或和"""
+        key = (unit, endian, op)
+        if key not in self._prefix_cache:
+            count = len(self.data) // unit
+            if unit == 1:
+                values = self.data[:count]
+            else:
+                fmt = '{}{}{}'.format(endian, count, 'H' if unit == 2 else 'I')
+                values = struct.unpack(fmt, self.data[:count * unit])
+            func = xor if op == 'xor' else None
+            prefix = [0]
+            prefix.extend(accumulate(values, func) if func else accumulate(values))
+            self._prefix_cache[key] = prefix
+        return self._prefix_cache[key]
+
+    @staticmethod
+    def _forms(value, width, op, unit=None):
+        """
+        校验值的常见存储形式: 原值、取反、(累加和)取负
+        给出unit且单元比字段窄时，去掉不超过单元范围的累加和形式:
+        这样的小值只说明区间内几乎全是0 (填充区)，会命中大量区间
+        """
+        mask = (1 << width) - 1
+        forms = {value: '', value ^ mask: '~'}
+        if op == 'sum':
+            forms.setdefault((-value) & mask, '-')
+            if unit is not None and unit * 8 < width:
+                unit_mask = (1 << (unit * 8)) - 1
+                forms = {stored: form for stored, form in forms.items() if stored > unit_mask}
+        return forms
+
+    def solve_sums(self):
+        """用前缀数组求解累加和/异或和字段"""
+        matches = []
+        starts = self.candidate_starts()
+
+        for name, unit, endian, op in SUM_SEQUENCES:
+            prefix = self._prefix(unit, endian, op)
+            count = len(prefix) - 1
+            combine = (lambda a, b: a ^ b) if op == 'xor' else (lambda a, b: b - a)
+
+            for width in (8, 16, 32):
+                if width < unit * 8:
+                    continue
+                if op == 'xor' and unit * 8 < width:
+                    # 异或和的结果不会超过单元宽度，放进更宽的字段只会让小值随机命中
+                    continue
+                mask = (1 << width) - 1
+
+                if width == 32:
+                    # 32位字段: 前缀值哈希表反查，覆盖所有对齐端点
+                    index = {}
+                    for i in range(0, count + 1, max(1, self.align // unit)):
+                        index.setdefault(prefix[i] & mask, []).append(i)
+                    for field_offset, field_endian, value in self.targets[32]:
+                        for stored, form in self._forms(value, 32, op, unit).items():
+                            # 正向: 起点固定在头部候选位置
+                            for start in starts:
+                                if start % unit:
+                                    continue
+                                s = start // unit
+                                want = (prefix[s] ^ stored) if op == 'xor' else (prefix[s] + stored)
+                                for e in index.get(want & mask, ()):
+                                    if e > s and self._range_ok(start, e * unit, field_offset, 32):
+                                        matches.append(self._match(field_offset, field_endian, 32, value,
+                                                                   form + name, start, e * unit))
+                            # 反向: 终点固定在文件末尾 (按单元截断)
+                            e = count
+                            want = (prefix[e] ^ stored) if op == 'xor' else (prefix[e] - stored)
+                            for s in index.get(want & mask, ()):
+                                start = s * unit
+                                if s < e and start not in starts and \
+                                        self._range_ok(start, e * unit, field_offset, 32):
+                                    matches.append(self._match(field_offset, field_endian, 32, value,
+                                                               form + name, start, e * unit))
+                else:
+                    # 8/16位字段随机命中率高，只测试自然区间
+                    for start in starts:
+                        if start % unit:
+                            continue
+                        for end in self.natural_ends(start, width):
+                            end -= (end - start) % unit
+                            total = combine(prefix[start // unit], prefix[end // unit]) & mask
+                            for field_offset, field_endian, value in self.targets[width]:
+                                forms = self._forms(value, width, op, unit)
+                                if total in forms and self._range_ok(start, end, field_offset, width):
+                                    matches.append(self._match(field_offset, field_endian, width, value,
+                                                               forms[total] + name, start, end))
+        return matches
+
+    def _crc_register_stream(self, table, width, reflected, init, start, end, checkpoints):
+        """从start到end逐字节计算CRC寄存器，在checkpoints位置记录寄存器值"""
+        mask = (1 << width) - 1
+        shift = width - 8
+        crc = init
+        recorded = {}
+        checkpoints = set(checkpoints)
+        pos = start
+        if reflected:
+            for byte in self.data[start:end]:
+                crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+                pos += 1
+                if pos in checkpoints:
+                    recorded[pos] = crc
+        else:
+            for byte in self.data[start:end]:
+                crc = table[((crc >> shift) ^ byte) & 0xFF] ^ ((crc << 8) & mask)
+                pos += 1
+                if pos in checkpoints:
+                    recorded[pos] = crc
+        return recorded
+
+    def _crc32_registers(self, data, start, wanted):
+        """
+        用zlib增量计算CRC-32寄存器，返回落入wanted的 {对齐终点: 寄存器}
+        zlib.crc32的返回值 = 寄存器 ^ 0xFFFFFFFF
+        """
+        registers = {}
+        crc = 0
+        align = self.align
+        for end in range(start + align, len(data) + 1, align):
+            crc = zlib.crc32(data[end - align:end], crc)
+            if crc ^ 0xFFFFFFFF in wanted:
+                registers[end] = crc ^ 0xFFFFFFFF
+        if (len(data) - start) % align:
+            tail = zlib.crc32(data[start:]) ^ 0xFFFFFFFF
+            if tail in wanted:
+                registers[len(data)] = tail
+        return registers
+
+    def solve_crcs(self):
+        """用查找表求解CRC字段 (能借用zlib/binascii的变体走C实现)"""
+        matches = []
+        data = self.data
+        reversed_data = None
+        starts = self.candidate_starts()
+
+        for name_plain, name_inverted, width, poly, reflected, init in CRC_VARIANTS:
+            mask = (1 << width) - 1
+            wanted = {}
+            for field_offset, field_endian, value in self.targets[width]:
+                wanted.setdefault(value, []).append((field_offset, field_endian, value, name_plain))
+                wanted.setdefault(value ^ mask, []).append((field_offset, field_endian, value, name_inverted))
+            if not wanted:
+                continue
+            table = crc_table(width, poly, reflected)
+
+            for start in starts:
+                if start >= len(data):
+                    continue
+                checkpoints = self.natural_ends(start, width)
+
+                if width == 32 and reflected:
+                    registers = self._crc32_registers(data, start, wanted)
+                elif width == 32:
+                    # 非反射CRC-32: 对位反转后的数据计算反射CRC，寄存器再位反转
+                    if reversed_data is None:
+                        reversed_data = data.translate(BIT_REVERSE)
+                    wanted_reflected = {_reflect(v, 32): v for v in wanted}
+                    registers = {end: wanted_reflected[reg] for end, reg in
+                                 self._crc32_registers(reversed_data, start, wanted_reflected).items()}
+                elif width == 16 and not reflected:
+                    registers = {end: binascii.crc_hqx(data[start:end], init) for end in checkpoints}
+                elif width == 16 and poly == 0x8408:
+                    # KERMIT是0x1021的反射形式
+                    if reversed_data is None:
+                        reversed_data = data.translate(BIT_REVERSE)
+                    registers = {end: _reflect(binascii.crc_hqx(reversed_data[start:end], _reflect(init, 16)), 16)
+                                 for end in checkpoints}
+                else:
+                    registers = self._crc_register_stream(table, width, reflected, init,
+                                                          start, max(checkpoints), checkpoints)
+
+                for end, register in registers.items():
+                    if width == 32 and (end - start) % self.align and end != len(data):
+                        continue
+                    for field_offset, field_endian, value, algorithm in wanted.get(register, ()):
+                        if self._range_ok(start, end, field_offset, width):
+                            matches.append(self._match(field_offset, field_endian, width, value,
+                                                       algorithm, start, end))
+        return matches
+
+    @staticmethod
+    def _match(field_offset, endian, width, value, algorithm, start, end):
+        return {
+            'field_offset': field_offset,
+            'width': width,
+            'endian': {'<': 'LE', '>': 'BE'}.get(endian, '-'),
+            'value': value,
+            'algorithm': algorithm,
+            'start': start,
+            'end': end,
+        }
+
+    def solve(self):
+        """求解全部算法，结果按字段位宽 (可信度) 和区间长度排序"""
+        matches = self.solve_sums() + self.solve_crcs()
+        matches.sort(key=lambda m: (-m['width'], -(m['end'] - m['start']), m['field_offset']))
+        return matches
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python3 {} <固件文件> [头部大小]".format(sys.argv[0]))
+        sys.exit(1)
+
+    firmware_path = sys.argv[1]
+    if not os.path.exists(firmware_path):
+        print("错误: 文件不存在 - {}".format(firmware_path))
+        sys.exit(1)
+
+    header_size = int(sys.argv[2], 0) if len(sys.argv) > 2 else 64
+
+    with open(firmware_path, 'rb') as f:
+        data = f.read()
+    print("文件大小: {} bytes, 头部搜索范围: {} bytes".format(len(data), header_size))
+
+    start_time = time.time()
+    solver = ChecksumSolver(data, header_size=header_size)
+    matches = solver.solve()
+    elapsed = time.time() - start_time
+
+    print("\n=== 校验和字段求解结果 (耗时 {:.2f}s) ===".format(elapsed))
+    if not matches:
+        print("未发现匹配的校验字段")
+    elif any(m['width'] == 8 for m in matches):
+        print("注意: 8位字段的匹配约有1/256的随机命中概率，需结合其他样本确认")
+    for m in matches:
+        print("头部偏移 0x{:02x} ({}位 {}) = 0x{:0{}X}: {} 区间 [0x{:x}, 0x{:x})".format(
+            m['field_offset'], m['width'], m['endian'], m['value'], m['width'] // 4,
+            m['algorithm'], m['start'], m['end']))
+
+
+if __name__ == "__main__":
+    main()
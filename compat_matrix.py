@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件 × 固件类型/子类型兼容性位图
+sub_100006CCA的支持检查只读取头部PID和设备信息中的固件类型、子类型，与设备VID/PID无关；
+构建时对镜像中所有固件和所有 (类型, 子类型) 代表值做一次检查，结果按位压缩保存。
+设备VID/PID只决定发送前是否对头部字节重排 (MAGIC_1/MAGIC_2)，查询时由needs_shuffle判断。
+查询时才加载，按配置查固件或按固件查配置都只是一行位图的解包
+"""
+
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from fwupd_ebitdo_parser import find_firmware_files
+from header_batch import (load_headers, header_pids, batch_check_firmware_support, FIRMWARE_TYPE_261,
+                          MAGIC_1, MAGIC_2, SUBTYPE_NONE)
+
+MATRIX_FORMAT = 2
+
+# 支持检查只区分 类型是否为261 和 子类型 (无/0/1/2/大于2)，其他取值归入这些代表值
+FIRMWARE_TYPES = (FIRMWARE_TYPE_261, 0)
+FIRMWARE_SUBTYPES = (SUBTYPE_NONE, 0, 1, 2, 3)
+
+
+def build_profiles():
+    """所有 (固件类型, 子类型) 代表值"""
+    return [(firmware_type, subtype) for firmware_type in FIRMWARE_TYPES for subtype in FIRMWARE_SUBTYPES]
+
+
+def normalize_profile(firmware_type, firmware_subtype):
+    """把任意类型/子类型映射到行为相同的代表值"""
+    firmware_type = FIRMWARE_TYPE_261 if firmware_type == FIRMWARE_TYPE_261 else 0
+    if firmware_subtype is None or firmware_subtype == SUBTYPE_NONE:
+        return firmware_type, SUBTYPE_NONE
+    return firmware_type, min(max(int(firmware_subtype), 0), 3)
+
+
+def build_matrix(files, profiles, output_path):
+    """计算兼容性并保存为.npz (按固件和按配置两个方向的位图)"""
+    headers, valid = load_headers(files)
+    profiles = np.array(profiles, dtype='<i4').reshape(-1, 2)
+    supported = batch_check_firmware_support(header_pids(headers)[:, None], profiles[None, :, 0],
+                                             profiles[None, :, 1])
+    supported &= valid[:, None]
+    tmp = output_path + '.tmp.npz'
+    np.savez(tmp, format=MATRIX_FORMAT, paths=np.array(files), profiles=profiles,
+             by_firmware=np.packbits(supported, axis=1), by_profile=np.packbits(supported.T, axis=1),
+             shape=np.array(supported.shape))
+    os.replace(tmp, output_path)
+    return supported
+
+
+class CompatMatrix:
+    def __init__(self, path='compat_matrix.npz'):
+        self.path = path
+        self._loaded = False
+
+    def _load(self):
+        """第一次查询时加载位图并建立 路径/配置 -> 行号 的字典"""
+        if self._loaded:
+            return
+        data = np.load(self.path)
+        if int(data['format']) != MATRIX_FORMAT:
+            raise ValueError('不支持的兼容性矩阵格式: {}'.format(self.path))
+        self.paths = data['paths'].tolist()
+        self.by_firmware = data['by_firmware']
+        self.by_profile = data['by_profile']
+        self.n_firmware, self.n_profiles = (int(n) for n in data['shape'])
+        self.path_index = {path: i for i, path in enumerate(self.paths)}
+        self.profile_list = [tuple(int(v) for v in profile) for profile in data['profiles'].tolist()]
+        self.profile_index = {profile: j for j, profile in enumerate(self.profile_list)}
+        self._loaded = True
+
+    def profile_column(self, firmware_type, firmware_subtype=None):
+        self._load()
+        return self.profile_index[normalize_profile(firmware_type, firmware_subtype)]
+
+    def firmware_for(self, firmware_type, firmware_subtype=None):
+        """固件类型/子类型 -> 会被接受的固件路径列表 (对所有设备相同)"""
+        j = self.profile_column(firmware_type, firmware_subtype)
+        rows = np.flatnonzero(np.unpackbits(self.by_profile[j], count=self.n_firmware))
+        return [self.paths[i] for i in rows]
+
+    def profiles_for(self, path):
+        """固件 -> 接受它的 (固件类型, 子类型) 列表"""
+        self._load()
+        i = self.path_index[path]
+        columns = np.flatnonzero(np.unpackbits(self.by_firmware[i], count=self.n_profiles))
+        return [self.profile_list[j] for j in columns]
+
+    def is_compatible(self, path, firmware_type, firmware_subtype=None):
+        j = self.profile_column(firmware_type, firmware_subtype)
+        i = self.path_index[path]
+        return bool(self.by_firmware[i, j >> 3] & (0x80 >> (j & 7)))
+
+    @staticmethod
+    def needs_shuffle(vid, pid):
+        return vid == MAGIC_2 and pid == MAGIC_1
+
+
+def main():
+    usage = [
+        "用法: python3 {} build [固件文件或目录]... [--output 矩阵文件]".format(sys.argv[0]),
+        "       python3 {} device <VID:PID> <固件类型> [子类型] [矩阵文件]".format(sys.argv[0]),
+        "       python3 {} firmware <固件文件> [矩阵文件]".format(sys.argv[0]),
+    ]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('build', 'device', 'firmware'):
+        print('\n'.join(usage))
+        sys.exit(1)
+
+    if not HAS_NUMPY:
+        print("错误: 需要安装 numpy")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = sys.argv[2:]
+
+    if command == 'build':
+        output_path = 'compat_matrix.npz'
+        if '--output' in args:
+            index = args.index('--output')
+            output_path = args[index + 1]
+            del args[index:index + 2]
+        files = find_firmware_files(args or ['firmware_downloads', 'releases'])
+        if not files:
+            print("错误: 未找到.dat文件")
+            sys.exit(1)
+        start_time = time.time()
+        profiles = build_profiles()
+        supported = build_matrix(files, profiles, output_path)
+        print("兼容性矩阵已保存: {} ({} 个固件 × {} 个类型/子类型, {} bytes, 耗时 {:.3f}s)".format(
+            output_path, len(files), len(profiles), os.path.getsize(output_path), time.time() - start_time))
+        print("兼容组合: {}/{}".format(int(supported.sum()), supported.size))
+        return
+
+    from metainfo_index import parse_device
+
+    if command == 'device':
+        if len(args) < 2 or parse_device(args[0]) is None:
+            print('\n'.join(usage))
+            sys.exit(1)
+        vid, pid = parse_device(args[0])
+        subtype = int(args[2]) if len(args) > 2 and args[2].lstrip('-').isdigit() else None
+        rest = args[3:] if subtype is not None else args[2:]
+        matrix = CompatMatrix(rest[0] if rest else 'compat_matrix.npz')
+        matrix._load()
+        start_time = time.perf_counter()
+        files = matrix.firmware_for(int(args[1]), subtype)
+        elapsed = time.perf_counter() - start_time
+        print("VID 0x{:04X} PID 0x{:04X} 类型 {} 子类型 {}: {} 个固件 (查询耗时 {:.1f}µs){}".format(
+            vid, pid, args[1], '-' if subtype is None else subtype, len(files), elapsed * 1e6,
+            ' (发送前字节重排)' if matrix.needs_shuffle(vid, pid) else ''))
+        for path in files:
+            print("  {}".format(path))
+        return
+
+    if not args:
+        print('\n'.join(usage))
+        sys.exit(1)
+    matrix = CompatMatrix(args[1] if len(args) > 1 else 'compat_matrix.npz')
+    matrix._load()
+    if args[0] not in matrix.path_index:
+        print("未找到: {} (不在兼容性矩阵中)".format(args[0]))
+        sys.exit(1)
+    start_time = time.perf_counter()
+    profiles = matrix.profiles_for(args[0])
+    elapsed = time.perf_counter() - start_time
+    print("{}: {} 个类型/子类型 (查询耗时 {:.1f}µs，与设备VID/PID无关；发给 {:04X}:{:04X} 前需字节重排)".format(
+        args[0], len(profiles), elapsed * 1e6, MAGIC_2, MAGIC_1))
+    for firmware_type, subtype in profiles:
+        print("  类型 {:>3} 子类型 {}".format(
+            '261' if firmware_type == FIRMWARE_TYPE_261 else '其他', '-' if subtype == SUBTYPE_NONE else subtype))
+
+
+if __name__ == "__main__":
+    main()
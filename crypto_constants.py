@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+加密常量指纹库
+收录AES S盒/T表、CRC表、SHA-1/SHA-256/MD5轮常量、TEA/XTEA/XXTEA delta、
+ChaCha/Salsa常量和RC4初始化表，按大小端和常见表布局展开，
+全部指纹编译为一个Aho-Corasick自动机，单次扫描即可匹配整个库
+"""
+
+import os
+import sys
+import math
+import struct
+from array import array
+from collections import deque
+
+# 指纹库版本，库内容变化时递增
+DATABASE_VERSION = 1
+
+# 自动机使用的指纹长度，命中后再校验完整常量
+FINGERPRINT_LEN = 16
+
+
+def _xtime(value):
+    """GF(2^8)上乘以x"""
+    value <<= 1
+    return (value ^ 0x11B) & 0xFF if value & 0x100 else value
+
+
+def _gf_mul(a, b):
+    """GF(2^8)乘法"""
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        a = _xtime(a)
+        b >>= 1
+    return result
+
+
+def _aes_sbox():
+    """计算AES S盒和逆S盒"""
+    sbox = [0] * 256
+    inv_sbox = [0] * 256
+    for x in range(256):
+        # 乘法逆元 (0映射到0)
+        inv = 0
+        if x:
+            inv = next(y for y in range(1, 256) if _gf_mul(x, y) == 1)
+        s = inv
+        for shift in range(1, 5):
+            s ^= ((inv << shift) | (inv >> (8 - shift))) & 0xFF
+        s ^= 0x63
+        sbox[x] = s
+        inv_sbox[s] = x
+    return sbox, inv_sbox
+
+
+def _aes_tables(sbox, inv_sbox):
+    """计算AES加密T表Te0和解密T表Td0 (Te1-3/Td1-3为其字节旋转)"""
+    te0 = []
+    td0 = []
+    for x in range(256):
+        s = sbox[x]
+        te0.append((_gf_mul(s, 2) << 24) | (s << 16) | (s << 8) | _gf_mul(s, 3))
+        s = inv_sbox[x]
+        td0.append((_gf_mul(s, 14) << 24) | (_gf_mul(s, 9) << 16) |
+                   (_gf_mul(s, 13) << 8) | _gf_mul(s, 11))
+    return te0, td0
+
+
+def _rotr32(value, shift):
+    return ((value >> shift) | (value << (32 - shift))) & 0xFFFFFFFF
+
+
+def crc_table(width, poly, reflected, entries=256):
+    """计算CRC查找表，entries=16时为半字节表"""
+    bits = 8 if entries == 256 else 4
+    mask = (1 << width) - 1
+    table = []
+    for i in range(entries):
+        if reflected:
+            crc = i
+            for _ in range(bits):
+                crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        else:
+            crc = i << (width - bits)
+            for _ in range(bits):
+                crc = ((crc << 1) ^ poly) if crc & (1 << (width - 1)) else crc << 1
+        table.append(crc & mask)
+    return table
+
+
+def _reflect(value, width):
+    result = 0
+    for _ in range(width):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+
+def _integer_root(value, n):
+    """整数n次方根 (向下取整)"""
+    lo, hi = 0, 1 << (value.bit_length() // n + 1)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if mid ** n <= value:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _primes(count):
+    primes = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def _sha256_constants():
+    """SHA-256轮常量K (素数立方根小数部分) 和初始哈希值H (素数平方根小数部分)"""
+    k = [_integer_root(p << 96, 3) & 0xFFFFFFFF for p in _primes(64)]
+    h = [_integer_root(p << 64, 2) & 0xFFFFFFFF for p in _primes(8)]
+    return k, h
+
+
+def _md5_constants():
+    """MD5轮常量T[i] = floor(|sin(i+1)| * 2^32)"""
+    return [int(abs(math.sin(i + 1)) * 2 ** 32) & 0xFFFFFFFF for i in range(64)]
+
+
+def _pack_words(words, size, endian):
+    fmt = {2: 'H', 4: 'I'}[size]
+    return struct.pack('{}{}{}'.format(endian, len(words), fmt), *words)
+
+
+def _add_word_table(entries, name, category, words, size):
+    """按小端和大端两种布局添加一个字表"""
+    entries.append({'name': name + '_LE', 'category': category,
+                    'pattern': _pack_words(words, size, '<')})
+    entries.append({'name': name + '_BE', 'category': category,
+                    'pattern': _pack_words(words, size, '>')})
+
+
+def build_database():
+    """
+    生成完整指纹库
+    每个条目: name, category, pattern (完整常量字节)
+    """
+    entries = []
+
+    # AES
+    sbox, inv_sbox = _aes_sbox()
+    entries.append({'name': 'AES_SBOX', 'category': 'AES', 'pattern': bytes(sbox)})
+    entries.append({'name': 'AES_INV_SBOX', 'category': 'AES', 'pattern': bytes(inv_sbox)})
+    te0, td0 = _aes_tables(sbox, inv_sbox)
+    for i in range(4):
+        _add_word_table(entries, 'AES_TE{}'.format(i), 'AES', [_rotr32(w, 8 * i) for w in te0], 4)
+        _add_word_table(entries, 'AES_TD{}'.format(i), 'AES', [_rotr32(w, 8 * i) for w in td0], 4)
+    rcon = [0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1B, 0x36]
+    entries.append({'name': 'AES_RCON', 'category': 'AES', 'pattern': bytes(rcon)})
+    _add_word_table(entries, 'AES_RCON_WORDS', 'AES', [r << 24 for r in rcon], 4)
+
+    # CRC查找表 (256项及嵌入式常用的16项半字节表)
+    crc_variants = [
+        ('CRC32', 32, 0xEDB88320, True),
+        ('CRC32_MSB', 32, 0x04C11DB7, False),
+        ('CRC16_CCITT', 16, 0x1021, False),
+        ('CRC16_ARC', 16, 0xA001, True),
+        ('CRC16_KERMIT', 16, _reflect(0x1021, 16), True),
+    ]
+    for name, width, poly, reflected in crc_variants:
+        size = width // 8
+        _add_word_table(entries, name + '_TABLE', 'CRC', crc_table(width, poly, reflected), size)
+        _add_word_table(entries, name + '_NIBBLE_TABLE', 'CRC',
+                        crc_table(width, poly, reflected, entries=16), size)
+    entries.append({'name': 'CRC8_TABLE', 'category': 'CRC',
+                    'pattern': bytes(crc_table(8, 0x07, False))})
+    entries.append({'name': 'CRC8_MAXIM_TABLE', 'category': 'CRC',
+                    'pattern': bytes(crc_table(8, 0x8C, True))})
+
+    # 哈希函数
+    sha256_k, sha256_h = _sha256_constants()
+    _add_word_table(entries, 'SHA256_K', 'SHA-256', sha256_k, 4)
+    _add_word_table(entries, 'SHA256_INIT', 'SHA-256', sha256_h, 4)
+    _add_word_table(entries, 'SHA1_INIT', 'SHA-1',
+                    [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0], 4)
+    _add_word_table(entries, 'SHA1_K', 'SHA-1', [0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xCA62C1D6], 4)
+    _add_word_table(entries, 'MD5_T', 'MD5', _md5_constants(), 4)
+
+    # TEA系列: delta及32轮解密初值
+    _add_word_table(entries, 'TEA_DELTA', 'TEA', [0x9E3779B9], 4)
+    _add_word_table(entries, 'TEA_DELTA_NEG', 'TEA', [0x61C88647], 4)
+    _add_word_table(entries, 'TEA_DECRYPT_SUM', 'TEA', [0xC6EF3720], 4)
+
+    # ChaCha/Salsa20
+    entries.append({'name': 'CHACHA_SIGMA', 'category': 'ChaCha', 'pattern': b'expand 32-byte k'})
+    entries.append({'name': 'CHACHA_TAU', 'category': 'ChaCha', 'pattern': b'expand 16-byte k'})
+
+    # RC4初始化 (S[i] = i)
+    entries.append({'name': 'RC4_INIT_IDENTITY', 'category': 'RC4', 'pattern': bytes(range(256))})
+
+    return entries
+
+
+class AhoCorasick:
+    """
+    多模式字节串匹配自动机
+    转移表展开为 状态数x256 的平坦数组，扫描时每字节一次查表
+    """
+
+    def __init__(self, patterns):
+        # 构建字典树
+        goto = [{}]
+        outputs = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for byte in pattern:
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][byte] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # 广度优先计算失败链接并展开为完整转移表
+        count = len(goto)
+        delta = array('i', [0]) * (count * 256)
+        fail = [0] * count
+        for byte, nxt in goto[0].items():
+            delta[byte] = nxt
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            base = state << 8
+            fail_base = fail[state] << 8
+            for byte in range(256):
+                nxt = goto[state].get(byte)
+                if nxt is None:
+                    delta[base + byte] = delta[fail_base + byte]
+                else:
+                    fail[nxt] = delta[fail_base + byte]
+                    outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+                    delta[base + byte] = nxt
+                    queue.append(nxt)
+
+        self.patterns = patterns
+        self.delta = delta
+        self.outputs = [tuple(out) if out else None for out in outputs]
+        self.state_count = count
+
+    def iter_matches(self, data):
+        """逐字节扫描，产出 (模式结束位置+1, 模式索引)"""
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        for pos, byte in enumerate(data):
+            state = delta[(state << 8) | byte]
+            out = outputs[state]
+            if out is not None:
+                for index in out:
+                    yield pos + 1, index
+
+
+class CryptoConstantScanner:
+    """
+    基于指纹库的加密常量扫描器
+    每个常量取开头和中间各一段指纹放入同一自动机，命中后校验完整常量，
+    因此截断或部分覆盖的表也能被报告
+    """
+
+    _shared = None
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else build_database()
+        self.version = DATABASE_VERSION
+        fingerprints = []
+        self._fingerprint_info = []
+        for entry_index, entry in enumerate(self.entries):
+            pattern = entry['pattern']
+            offsets = [0]
+            if len(pattern) >= 4 * FINGERPRINT_LEN:
+                offsets.append((len(pattern) // 2) & ~3)
+            for offset in offsets:
+                fingerprints.append(pattern[offset:offset + FINGERPRINT_LEN])
+                self._fingerprint_info.append((entry_index, offset))
+        self.automaton = AhoCorasick(fingerprints)
+
+    @classmethod
+    def shared(cls):
+        """返回使用内置指纹库的共享实例 (自动机只构建一次)"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def scan(self, data):
+        """
+        扫描数据，返回按位置排序的匹配列表
+        每项: type, category, start, size (实际匹配长度), complete, data
+        """
+        results = {}
+        for end, fp_index in self.automaton.iter_matches(data):
+            entry_index, offset = self._fingerprint_info[fp_index]
+            entry = self.entries[entry_index]
+            pattern = entry['pattern']
+            fp_len = len(self.automaton.patterns[fp_index])
+            table_start = end - fp_len - offset
+            if (table_start, entry_index) in results:
+                continue
+
+            # 以指纹位置为中心向两侧扩展，求实际连续匹配的范围
+            match_start = end - fp_len
+            while match_start > max(table_start, 0) and \
+                    data[match_start - 1] == pattern[match_start - 1 - table_start]:
+                match_start -= 1
+            match_end = end
+            limit = min(table_start + len(pattern), len(data))
+            while match_end < limit and data[match_end] == pattern[match_end - table_start]:
+                match_end += 1
+
+            results[(table_start, entry_index)] = {
+                'type': entry['name'],
+                'category': entry['category'],
+                'start': match_start,
+                'size': match_end - match_start,
+                'complete': match_end - match_start == len(pattern),
+                'data': data[match_start:match_end]
+            }
+
+        return sorted(results.values(), key=lambda item: (item['start'], item['type']))
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("用法: python3 {} <文件路径>".format(sys.argv[0]))
+        sys.exit(1)
+
+    file_path = sys.argv[1]
+    if not os.path.exists(file_path):
+        print("错误: 文件不存在 - {}".format(file_path))
+        sys.exit(1)
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    scanner = CryptoConstantScanner.shared()
+    print("指纹库版本: {}, 常量: {} 个, 自动机状态: {} 个".format(
+        scanner.version, len(scanner.entries), scanner.automaton.state_count))
+    print("文件大小: {} bytes\n".format(len(data)))
+
+    matches = scanner.scan(data)
+    for item in matches:
+        print("✓ 发现 {} ({}): 位置 0x{:08x}, 大小 {} bytes{}".format(
+            item['type'], item['category'], item['start'], item['size'],
+            '' if item['complete'] else ' (部分)'))
+
+    if not matches:
+        print("未发现已知加密常量")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ import binascii
 from collections import Counter
 import math
 
+from checksum_solver import ChecksumSolver
+
 def calculate_entropy(data):
     """计算数据的熵值"""
     if not data:
@@ -275,6 +277,17 @@ def main():
                 print(f"  ✓ 长度字段匹配(BE)")
         print()
     
+    # 求解头部中的校验和字段
+    print("=== 校验和字段求解 ===")
+    checksum_matches = [m for m in ChecksumSolver(data).solve() if m['width'] > 8]
+    if checksum_matches:
+        for m in checksum_matches[:10]:
+            print(f"头部偏移 0x{m['field_offset']:02x} ({m['width']}位 {m['endian']}): "
+                  f"{m['algorithm']} 区间 [0x{m['start']:x}, 0x{m['end']:x})")
+    else:
+        print("未发现16/32位校验和字段")
+    print()
+    
     # 分析块结构
     print("=== 块结构分析 ===")
     blocks = analyze_block_structure(data)
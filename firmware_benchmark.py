@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件下载基准测试工具
+在本地固件服务器上运行8bitdo-firmware.py，分别测量目录获取 (联网/缓存)、
+单个文件下载和完整镜像的耗时与吞吐量
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+from firmware_server import FirmwareServer, parse_options
+
+FETCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '8bitdo-firmware.py')
+
+
+class FirmwareBenchmark:
+    def __init__(self, server, jobs=8, rounds=3):
+        self.server = server
+        self.jobs = jobs
+        self.rounds = rounds
+        self.work_dir = tempfile.mkdtemp(prefix='8bitdo-bench-')
+        self.env = dict(os.environ, XDG_CACHE_HOME=os.path.join(self.work_dir, 'cache'))
+        self.results = []
+
+    def run_fetcher(self, args, cwd=None):
+        """运行一次抓取工具，返回 (耗时, 退出码)"""
+        command = [sys.executable, FETCHER, '--server', self.server.url] + args
+        start = time.perf_counter()
+        process = subprocess.run(command, cwd=cwd or self.work_dir, env=self.env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start, process.returncode
+
+    def measure(self, name, args, size=0, prepare=None):
+        """多次运行取最快值，size为本次传输的字节数"""
+        times = []
+        failures = 0
+        for _ in range(self.rounds):
+            if prepare:
+                prepare()
+            elapsed, code = self.run_fetcher(args)
+            times.append(elapsed)
+            failures += code != 0
+        best = min(times)
+        self.results.append({
+            'name': name,
+            'best': best,
+            'mean': sum(times) / len(times),
+            'throughput': size / best / (1024 * 1024) if size else 0.0,
+            'failures': failures,
+        })
+
+    def run(self):
+        items = self.server.items
+        total = sum(item['fileSize'] for item in items)
+        largest = max(items, key=lambda item: item['fileSize'])
+        mirror_dir = os.path.join(self.work_dir, 'mirror')
+        single = os.path.join(self.work_dir, os.path.basename(largest['filePathName']))
+
+        def clear_mirror():
+            shutil.rmtree(mirror_dir, ignore_errors=True)
+
+        def clear_single():
+            if os.path.exists(single):
+                os.unlink(single)
+
+        self.measure('目录获取 (联网)', ['--refresh', '-l'])
+        self.measure('目录获取 (缓存)', ['-l'])
+        self.measure('单个文件 ({} bytes)'.format(largest['fileSize']),
+                     ['-f', str(largest['type']), str(largest['version'])],
+                     largest['fileSize'], clear_single)
+        self.measure('完整镜像 ({} 个文件)'.format(len(items)),
+                     ['--jobs', str(self.jobs), '-m', mirror_dir], total, clear_mirror)
+        self.measure('增量同步 (无变化)', ['-s', mirror_dir])
+
+        return self.results
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def main():
+    options = {'latency': 0.0, 'bandwidth': 0.0, 'error_rate': 0.0,
+               'truncate_rate': 0.0, 'seed': 0, 'jobs': 8, 'rounds': 3}
+    try:
+        positional = parse_options(sys.argv[1:], options)
+    except (StopIteration, ValueError):
+        positional = ['-h']
+
+    if positional and positional[0] in ('-h', '--help'):
+        print("用法: python3 {} [固件目录] [--latency 毫秒] [--bandwidth KB/s] [--error-rate 概率]".format(sys.argv[0]))
+        print("       [--truncate-rate 概率] [--seed 种子] [--jobs 并发数] [--rounds 次数]")
+        sys.exit(1)
+
+    firmware_dir = positional[0] if positional else 'firmware_downloads'
+    if not os.path.isdir(firmware_dir):
+        print("错误: 目录不存在 - {}".format(firmware_dir))
+        sys.exit(1)
+
+    server = FirmwareServer(
+        firmware_dir, port=0,
+        latency=options['latency'] / 1000.0,
+        bandwidth=options['bandwidth'] * 1024,
+        error_rate=options['error_rate'],
+        truncate_rate=options['truncate_rate'],
+        seed=options['seed'])
+    if not server.items:
+        print("错误: 目录中没有带原始API信息的readme.txt - {}".format(firmware_dir))
+        sys.exit(1)
+
+    server.start()
+    benchmark = FirmwareBenchmark(server, jobs=options['jobs'], rounds=options['rounds'])
+    print("本地服务器: {} ({} 个固件, {} bytes)".format(
+        server.url, len(server.items), sum(item['fileSize'] for item in server.items)))
+    print("延迟: {:.0f}ms, 带宽: {}, 错误率: {:.1%}, 截断率: {:.1%}, 并发: {}, 轮数: {}\n".format(
+        options['latency'],
+        '{:.0f} KB/s'.format(options['bandwidth']) if options['bandwidth'] else '不限',
+        options['error_rate'], options['truncate_rate'], options['jobs'], options['rounds']))
+
+    try:
+        results = benchmark.run()
+    finally:
+        benchmark.cleanup()
+        server.stop()
+
+    print("=== 基准测试结果 ===")
+    print("{:<28} {:>10} {:>10} {:>10} {:>6}".format('测试项', '最快(s)', '平均(s)', 'MB/s', '失败'))
+    for item in results:
+        print("{:<28} {:>10.3f} {:>10.3f} {:>10} {:>6}".format(
+            item['name'], item['best'], item['mean'],
+            '{:.2f}'.format(item['throughput']) if item['throughput'] else '-', item['failures']))
+
+    print("\n服务器统计: 请求 {requests}, 发送 {bytes_sent} bytes, 注入错误 {errors_injected}, 截断 {truncated}".format(
+        **server.stats))
+
+
+if __name__ == "__main__":
+    main()
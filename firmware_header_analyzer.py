@@ -90,6 +90,13 @@ class FirmwareHeaderAnalyzer:
         # 返回重排后的前16字节 + 原始的剩余字节
         return bytes(shuffled) + header[16:]
     
+    def apply_byte_shuffle_batch(self, headers):
+        """
+        apply_byte_shuffle的批量版本: 对 (N × 28) 头部矩阵一次完成重排 (需要numpy)
+        """
+        from header_batch import batch_byte_shuffle
+        return batch_byte_shuffle(headers, self.shuffle_pattern)
+    
     def check_firmware_support(self, header, firmware_type=None, firmware_subtype=None):
         """
         检查固件是否支持
@@ -118,6 +125,14 @@ class FirmwareHeaderAnalyzer:
         
         return True, "固件支持检查通过"
     
+    def check_firmware_support_batch(self, pids, firmware_types, firmware_subtypes):
+        """
+        check_firmware_support的批量版本: PID/类型/子类型为可广播的数组，返回布尔数组 (需要numpy)
+        子类型None用header_batch.SUBTYPE_NONE表示
+        """
+        from header_batch import batch_check_firmware_support
+        return batch_check_firmware_support(pids, firmware_types, firmware_subtypes)
+    
     def check_magic_numbers(self, device_vid, device_pid):
         """
         检查设备的VID/PID魔术数字
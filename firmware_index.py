@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件清单索引工具
+把firmware_downloads/中每个固件 (readme.txt + .dat) 记录为SQLite中的一行:
+规范版本号、原始版本号、产品类型、路径、大小、哈希、发布日期和头部字段，
+按产品和版本查找或查询某产品的最新版本都走索引，无需遍历目录
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import struct
+import sqlite3
+import hashlib
+
+API_MARKER = '原始API信息:'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS firmware (
+    id INTEGER PRIMARY KEY,
+    product TEXT NOT NULL,
+    product_type INTEGER,
+    version TEXT NOT NULL,
+    raw_version TEXT NOT NULL,
+    version_number REAL NOT NULL,
+    beta INTEGER NOT NULL DEFAULT 0,
+    release_date TEXT,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    md5 TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    vendor_md5 TEXT,
+    source TEXT,
+    header_len INTEGER,
+    dest_addr INTEGER,
+    payload_len INTEGER,
+    reserved INTEGER
+);
+CREATE INDEX IF NOT EXISTS firmware_product_version ON firmware (product, version);
+CREATE INDEX IF NOT EXISTS firmware_type_version ON firmware (product_type, version);
+CREATE INDEX IF NOT EXISTS firmware_product_latest ON firmware (product, version_number);
+CREATE INDEX IF NOT EXISTS firmware_type_latest ON firmware (product_type, version_number);
+CREATE INDEX IF NOT EXISTS firmware_raw_version ON firmware (raw_version);
+CREATE INDEX IF NOT EXISTS firmware_sha256 ON firmware (sha256);
+"""
+
+COLUMNS = ['product', 'product_type', 'version', 'raw_version', 'version_number', 'beta',
+           'release_date', 'path', 'size', 'mtime', 'md5', 'sha256', 'vendor_md5', 'source',
+           'header_len', 'dest_addr', 'payload_len', 'reserved']
+
+
+def canonical_version(raw):
+    """
+    还原float32误差前的版本号
+    服务器以float32保存版本，5.1 会变成 5.099999904632568；
+    取能还原出同一个float32的最短小数 (至少两位小数，与官方 V5.10 写法一致)
+    """
+    value = float(raw)
+    packed = struct.pack('<f', value)
+    for digits in range(2, 10):
+        text = '{:.{}f}'.format(value, digits)
+        if struct.pack('<f', float(text)) == packed:
+            return text
+    return repr(value)
+
+
+def parse_readme(path):
+    """解析readme.txt，返回字段字典，原始API信息放在'api'中"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+
+    info = {'api': None}
+    marker = text.find(API_MARKER)
+    if marker >= 0:
+        try:
+            info['api'] = json.loads(text[marker + len(API_MARKER):])
+        except ValueError:
+            pass
+        text = text[:marker]
+
+    fields = {'设备名称': 'device_name', '固件版本': 'version', '发布日期': 'release_date',
+              '文件大小': 'size', 'MD5校验': 'md5'}
+    for key, name in fields.items():
+        match = re.search(r'^{}: *(.*)$'.format(key), text, re.M)
+        info[name] = match.group(1).strip() if match else ''
+    info['size'] = int(info['size'].split()[0]) if info['size'] else None
+
+    def section(title):
+        match = re.search(r'^{}\n(.*?)(?:\n\n|\Z)'.format(re.escape(title)), text, re.M | re.S)
+        return match.group(1).strip() if match else ''
+
+    info['changelog_zh'] = section('更新日志 (中文):')
+    info['changelog_en'] = section('更新日志 (English):')
+
+    downloads = {}
+    for platform, count in re.findall(r'^- (\w+): (\d+)$', section('下载统计:'), re.M):
+        downloads[platform] = int(count)
+    info['downloads'] = downloads
+    return info
+
+
+def find_firmware_dirs(firmware_dir):
+    """遍历固件目录，返回 (readme路径, dat路径) 列表"""
+    pairs = []
+    for root, dirs, names in os.walk(firmware_dir):
+        dirs.sort()
+        if 'readme.txt' not in names:
+            continue
+        dat_files = sorted(name for name in names if name.endswith('.dat'))
+        if not dat_files:
+            continue
+        preferred = 'firmware_v{}.dat'.format(os.path.basename(root))
+        dat = preferred if preferred in dat_files else dat_files[0]
+        pairs.append((os.path.join(root, 'readme.txt'), os.path.join(root, dat)))
+    return pairs
+
+
+def hash_firmware(path, chunk_size=1024 * 1024):
+    """一次读取同时计算MD5/SHA-256，并解析头部前16字节 (header_len, dest_addr, payload_len, reserved)"""
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    header = b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            if len(header) < 16:
+                header += chunk[:16 - len(header)]
+            md5.update(chunk)
+            sha256.update(chunk)
+    fields = struct.unpack('<IIII', header) if len(header) == 16 else (None,) * 4
+    return md5.hexdigest(), sha256.hexdigest(), fields
+
+
+class FirmwareIndex:
+    def __init__(self, db_path='firmware_index.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def build(self, firmware_dir='firmware_downloads', prune=True):
+        """
+        增量构建索引: 路径、大小和修改时间都未变化的文件不再重新计算哈希
+        prune为True时删除已不存在的文件对应的行
+        """
+        known = {row['path']: (row['size'], row['mtime'])
+                 for row in self.conn.execute('SELECT path, size, mtime FROM firmware')}
+        seen = set()
+        added = updated = 0
+
+        for readme_path, dat_path in find_firmware_dirs(firmware_dir):
+            path = os.path.relpath(dat_path, firmware_dir)
+            seen.add(path)
+            stat = os.stat(dat_path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+
+            info = parse_readme(readme_path)
+            api = info['api'] or {}
+            raw_version = str(api.get('version', info['version'] or os.path.basename(os.path.dirname(dat_path))))
+            md5, sha256, header = hash_firmware(dat_path)
+
+            row = {
+                'product': api.get('fileName') or info['device_name'] or os.path.dirname(os.path.dirname(path)),
+                'product_type': api.get('type'),
+                'version': canonical_version(raw_version),
+                'raw_version': raw_version,
+                'version_number': float(raw_version),
+                'beta': 1 if api.get('beta') else 0,
+                'release_date': api.get('date') or info['release_date'],
+                'path': path,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'md5': md5,
+                'sha256': sha256,
+                'vendor_md5': api.get('md5') or info['md5'],
+                'source': api.get('filePathName'),
+                'header_len': header[0],
+                'dest_addr': header[1],
+                'payload_len': header[2],
+                'reserved': header[3],
+            }
+            self.conn.execute(
+                'INSERT OR REPLACE INTO firmware ({}) VALUES ({})'.format(
+                    ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))),
+                [row[column] for column in COLUMNS])
+            if path in known:
+                updated += 1
+            else:
+                added += 1
+
+        removed = 0
+        if prune:
+            for path in set(known) - seen:
+                self.conn.execute('DELETE FROM firmware WHERE path = ?', (path,))
+                removed += 1
+
+        self.conn.commit()
+        return added, updated, removed
+
+    def _product_clause(self, product):
+        """产品可以是名称或类型编号"""
+        if str(product).isdigit():
+            return 'product_type = ?', int(product)
+        return 'product = ?', product
+
+    def find(self, product, version):
+        """按产品和版本查找，版本可以是规范写法 (5.10)、5.1 或原始写法 (5.099999904632568)"""
+        clause, value = self._product_clause(product)
+        try:
+            version = canonical_version(version)
+        except ValueError:
+            return None
+        return self.conn.execute(
+            'SELECT * FROM firmware WHERE {} AND version = ? LIMIT 1'.format(clause),
+            (value, version)).fetchone()
+
+    def latest(self, product, include_beta=True):
+        """某产品的最新版本"""
+        clause, value = self._product_clause(product)
+        beta = '' if include_beta else ' AND beta = 0'
+        return self.conn.execute(
+            'SELECT * FROM firmware WHERE {}{} ORDER BY version_number DESC LIMIT 1'.format(clause, beta),
+            (value,)).fetchone()
+
+    def versions(self, product):
+        clause, value = self._product_clause(product)
+        return self.conn.execute(
+            'SELECT * FROM firmware WHERE {} ORDER BY version_number'.format(clause), (value,)).fetchall()
+
+    def products(self):
+        return self.conn.execute(
+            'SELECT product, product_type, COUNT(*) AS count, MAX(version_number) AS latest '
+            'FROM firmware GROUP BY product ORDER BY product_type, product').fetchall()
+
+
+def print_row(row, firmware_dir):
+    print("{} (#{}) {}{}".format(row['product'], row['product_type'], row['version'],
+                                 ' (beta)' if row['beta'] else ''))
+    print("  原始版本: {}".format(row['raw_version']))
+    print("  发布日期: {}".format(row['release_date']))
+    print("  文件: {}".format(os.path.join(firmware_dir, row['path'])))
+    print("  大小: {} bytes".format(row['size']))
+    print("  MD5: {}  SHA-256: {}".format(row['md5'], row['sha256']))
+    if row['header_len'] is not None:
+        print("  头部: header_len={}, dest_addr=0x{:08X}, payload_len={}, reserved=0x{:08X}".format(
+            row['header_len'], row['dest_addr'], row['payload_len'], row['reserved']))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python3 {} build [固件目录] [数据库]".format(sys.argv[0]))
+        print("       python3 {} list [数据库]".format(sys.argv[0]))
+        print("       python3 {} find <产品名称|类型编号> <版本> [数据库]".format(sys.argv[0]))
+        print("       python3 {} latest <产品名称|类型编号> [数据库]".format(sys.argv[0]))
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = sys.argv[2:]
+    firmware_dir = 'firmware_downloads'
+
+    if command == 'build':
+        firmware_dir = args[0] if args else firmware_dir
+        db_path = args[1] if len(args) > 1 else 'firmware_index.db'
+        if not os.path.isdir(firmware_dir):
+            print("错误: 目录不存在 - {}".format(firmware_dir))
+            sys.exit(1)
+        start_time = time.time()
+        index = FirmwareIndex(db_path)
+        added, updated, removed = index.build(firmware_dir)
+        total = index.conn.execute('SELECT COUNT(*) FROM firmware').fetchone()[0]
+        index.close()
+        print("索引已更新: {} (新增 {}, 更新 {}, 删除 {}, 共 {} 个固件, 耗时 {:.3f}s)".format(
+            db_path, added, updated, removed, total, time.time() - start_time))
+        return
+
+    required = {'list': 0, 'find': 2, 'latest': 1}
+    if command not in required or len(args) < required[command]:
+        print("错误: 未知命令或参数不足 - {}".format(command))
+        sys.exit(1)
+
+    db_path = args[required[command]] if len(args) > required[command] else 'firmware_index.db'
+    if not os.path.exists(db_path):
+        print("错误: 索引不存在，请先运行 build - {}".format(db_path))
+        sys.exit(1)
+    index = FirmwareIndex(db_path)
+
+    if command == 'list':
+        for row in index.products():
+            print("{:>4}: {} ({} 个版本, 最新 {})".format(
+                row['product_type'], row['product'], row['count'], canonical_version(row['latest'])))
+    elif command == 'find':
+        row = index.find(args[0], args[1])
+        if row is None:
+            print("未找到: {} {}".format(args[0], args[1]))
+            sys.exit(1)
+        print_row(row, firmware_dir)
+    elif command == 'latest':
+        row = index.latest(args[0])
+        if row is None:
+            print("未找到: {}".format(args[0]))
+            sys.exit(1)
+        print_row(row, firmware_dir)
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
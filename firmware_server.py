@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地固件服务器
+用firmware_downloads/中readme.txt记录的原始API信息和固件文件模拟8BitDo固件服务器，
+提供 /firmware/select 目录接口和固件下载 (支持Range请求)，
+可配置延迟、带宽限制和故障注入，用于离线测试和基准测试8bitdo-firmware.py
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_MARKER = '原始API信息:'
+
+
+def load_catalog(firmware_dir):
+    """
+    扫描固件目录中的readme.txt，返回 (目录列表, 下载路径 -> 本地文件)
+    fileSize以本地文件实际大小为准
+    """
+    items = []
+    files = {}
+    for root, dirs, names in os.walk(firmware_dir):
+        dirs.sort()
+        if 'readme.txt' not in names:
+            continue
+        with open(os.path.join(root, 'readme.txt'), encoding='utf-8') as f:
+            text = f.read()
+        marker = text.find(API_MARKER)
+        if marker < 0:
+            continue
+        try:
+            item = json.loads(text[marker + len(API_MARKER):])
+        except ValueError:
+            continue
+
+        dat_files = sorted(name for name in names if name.endswith('.dat'))
+        preferred = 'firmware_v{}.dat'.format(item.get('version'))
+        if preferred in dat_files:
+            dat_files.insert(0, preferred)
+        if not dat_files or 'filePathName' not in item:
+            continue
+
+        path = os.path.join(root, dat_files[0])
+        item['fileSize'] = os.path.getsize(path)
+        items.append(item)
+        files[item['filePathName']] = path
+
+    items.sort(key=lambda item: (item.get('type', 0), item.get('version', 0)))
+    return items, files
+
+
+class FirmwareRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.firmware.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        firmware = self.server.firmware
+        self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        firmware.count('requests')
+        firmware.delay()
+        if self.path != '/firmware/select':
+            self.send_error(404)
+            return
+        if firmware.inject_error(self):
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(firmware.catalog_body)))
+        self.end_headers()
+        firmware.send_body(self, firmware.catalog_body)
+
+    def do_GET(self):
+        firmware = self.server.firmware
+        firmware.count('requests')
+        firmware.delay()
+        path = firmware.files.get(self.path)
+        if path is None:
+            self.send_error(404)
+            return
+        if firmware.inject_error(self):
+            return
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        requested = self.headers.get('Range', '')
+        if requested.startswith('bytes='):
+            first, _, last = requested[6:].partition('-')
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{}'.format(size))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+
+        self.send_response(206 if requested else 200)
+        if requested:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, size))
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        firmware.send_body(self, data)
+
+
+class FirmwareServer:
+    def __init__(self, firmware_dir='firmware_downloads', host='127.0.0.1', port=8080,
+                 latency=0.0, bandwidth=0, error_rate=0.0, truncate_rate=0.0,
+                 seed=None, verbose=False):
+        self.firmware_dir = firmware_dir
+        self.host = host
+        self.port = port
+        self.latency = latency              # 每个请求的附加延迟 (秒)
+        self.bandwidth = bandwidth          # 每个连接的带宽上限 (字节/秒)，0表示不限制
+        self.error_rate = error_rate        # 返回503的概率
+        self.truncate_rate = truncate_rate  # 响应中途断开连接的概率
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.items, self.files = load_catalog(firmware_dir)
+        self.catalog_body = json.dumps({'list': self.items}, ensure_ascii=False).encode('utf-8')
+        self.stats = {'requests': 0, 'bytes_sent': 0, 'errors_injected': 0, 'truncated': 0}
+        self._stats_lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def delay(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def inject_error(self, handler):
+        """按error_rate返回503，返回True表示已注入故障"""
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            self.count('errors_injected')
+            handler.send_error(503)
+            return True
+        return False
+
+    def send_body(self, handler, data):
+        """按带宽上限分块发送，按truncate_rate在随机位置断开连接"""
+        limit = len(data)
+        if self.truncate_rate > 0 and len(data) > 1 and self.random.random() < self.truncate_rate:
+            limit = self.random.randrange(1, len(data))
+            self.count('truncated')
+
+        block = 16 * 1024
+        started = time.time()
+        sent = 0
+        try:
+            while sent < limit:
+                chunk = data[sent:min(sent + block, limit)]
+                handler.wfile.write(chunk)
+                sent += len(chunk)
+                if self.bandwidth > 0:
+                    ahead = sent / self.bandwidth - (time.time() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            handler.close_connection = True
+        self.count('bytes_sent', sent)
+        if limit < len(data):
+            handler.close_connection = True
+
+    def start(self):
+        """在后台线程中启动服务器，port为0时自动选择空闲端口，返回服务器URL"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), FirmwareRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.firmware = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+def parse_options(argv, options):
+    """解析 --名称 值 形式的选项，其余参数作为位置参数返回"""
+    positional = []
+    argv = iter(argv)
+    for arg in argv:
+        name = arg[2:].replace('-', '_')
+        if arg.startswith('--') and name in options:
+            options[name] = type(options[name])(next(argv))
+        else:
+            positional.append(arg)
+    return positional
+
+
+def main():
+    options = {'port': 8080, 'latency': 0.0, 'bandwidth': 0.0,
+               'error_rate': 0.0, 'truncate_rate': 0.0, 'seed': -1}
+    try:
+        positional = parse_options(sys.argv[1:], options)
+    except (StopIteration, ValueError):
+        positional = ['-h']
+
+    if positional and positional[0] in ('-h', '--help'):
+        print("用法: python3 {} [固件目录] [--port 端口] [--latency 毫秒] [--bandwidth KB/s]".format(sys.argv[0]))
+        print("       [--error-rate 概率] [--truncate-rate 概率] [--seed 种子]")
+        print("示例: python3 8bitdo-firmware.py --server http://127.0.0.1:8080 -l")
+        sys.exit(1)
+
+    firmware_dir = positional[0] if positional else 'firmware_downloads'
+    if not os.path.isdir(firmware_dir):
+        print("错误: 目录不存在 - {}".format(firmware_dir))
+        sys.exit(1)
+
+    server = FirmwareServer(
+        firmware_dir, port=options['port'],
+        latency=options['latency'] / 1000.0,
+        bandwidth=options['bandwidth'] * 1024,
+        error_rate=options['error_rate'],
+        truncate_rate=options['truncate_rate'],
+        seed=None if options['seed'] < 0 else options['seed'],
+        verbose=True)
+
+    url = server.start()
+    print("本地固件服务器已启动: {}".format(url))
+    print("固件目录: {} ({} 个固件)".format(firmware_dir, len(server.items)))
+    print("延迟: {:.0f}ms, 带宽: {}, 错误率: {:.1%}, 截断率: {:.1%}".format(
+        options['latency'],
+        '{:.0f} KB/s'.format(options['bandwidth']) if options['bandwidth'] else '不限',
+        options['error_rate'], options['truncate_rate']))
+    print("按 Ctrl+C 停止\n")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+
+    print("\n=== 统计 ===")
+    for key, value in server.stats.items():
+        print("{}: {}".format(key, value))
+
+
+if __name__ == "__main__":
+    main()
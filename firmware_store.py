@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址固件存储工具
+固件文件按SHA-256只在对象库中保存一份，熟悉的 产品/版本/ 目录结构
+通过硬链接 (不支持时尝试reflink，最后才复制) 指向对象，
+多个产品名下相同的固件只占一份磁盘空间，备份量随唯一固件数增长
+对象与原文件共享inode (不改权限)，原地修改原文件会改变对象内容: verify重新计算摘要，checkout跳过不符的对象
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import hashlib
+
+from firmware_index import find_firmware_dirs
+
+# Linux FICLONE ioctl，用于btrfs/xfs等支持reflink的文件系统
+FICLONE = 0x40049409
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def reflink(src, dst):
+    """尝试用FICLONE克隆文件，失败时抛出OSError"""
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+
+
+def link_or_clone(src, dst):
+    """
+    在dst处创建指向src的硬链接，跨文件系统或不支持硬链接时尝试reflink，最后复制
+    先写到临时名再原子替换，返回使用的方式
+    """
+    tmp = dst + '.store-tmp'
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+    try:
+        os.link(src, tmp)
+        method = 'hardlink'
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        try:
+            reflink(src, tmp)
+            method = 'reflink'
+        except (OSError, ImportError):
+            shutil.copy2(src, tmp)
+            method = 'copy'
+    os.replace(tmp, dst)
+    return method
+
+
+class FirmwareStore:
+    def __init__(self, store_dir='firmware_store'):
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, 'objects')
+        self.refs_path = os.path.join(store_dir, 'refs.json')
+        self.refs = self._load_refs()
+
+    def _load_refs(self):
+        """refs.json: 视图中的相对路径 -> SHA-256"""
+        try:
+            with open(self.refs_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_refs(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = self.refs_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.refs, f, indent=1, sort_keys=True, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.refs_path)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def add(self, path):
+        """把文件加入对象库 (已存在则复用)，返回 (SHA-256, 是否新对象)"""
+        digest = sha256_file(path)
+        target = self.object_path(digest)
+        if os.path.exists(target):
+            return digest, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 不修改权限: 硬链接与原文件共享inode，chmod会把固件目录中的原文件也改成只读
+        link_or_clone(path, target)
+        return digest, True
+
+    def dedup(self, firmware_dir='firmware_downloads'):
+        """
+        把固件目录中的.dat和readme.txt收入对象库，并把原文件替换为指向对象的链接
+        已经与对象共享inode的文件直接跳过
+        """
+        stats = {'files': 0, 'new_objects': 0, 'linked': 0, 'already_linked': 0,
+                 'saved_bytes': 0, 'methods': {}}
+        for readme_path, dat_path in find_firmware_dirs(firmware_dir):
+            for path in (dat_path, readme_path):
+                rel = os.path.relpath(path, firmware_dir)
+                stats['files'] += 1
+
+                digest = self.refs.get(rel)
+                if digest and os.path.exists(self.object_path(digest)) \
+                        and os.path.samefile(path, self.object_path(digest)):
+                    stats['already_linked'] += 1
+                    continue
+
+                digest, created = self.add(path)
+                self.refs[rel] = digest
+                if created:
+                    stats['new_objects'] += 1
+                    continue
+
+                # 对象已存在: 这是一个重复文件，改为链接到对象
+                target = self.object_path(digest)
+                if os.path.samefile(path, target):
+                    stats['already_linked'] += 1
+                    continue
+                size = os.path.getsize(path)
+                method = link_or_clone(target, path)
+                stats['linked'] += 1
+                stats['methods'][method] = stats['methods'].get(method, 0) + 1
+                if method != 'copy':
+                    stats['saved_bytes'] += size
+
+        self.save_refs()
+        return stats
+
+    def verify(self):
+        """
+        重新计算被引用对象的SHA-256
+        对象与固件目录中的原文件共享inode，原文件被原地修改时对象内容也随之改变
+        返回 {摘要: 'missing' | 'corrupt'}
+        """
+        problems = {}
+        for digest in sorted(set(self.refs.values())):
+            path = self.object_path(digest)
+            if not os.path.exists(path):
+                problems[digest] = 'missing'
+            elif sha256_file(path) != digest:
+                problems[digest] = 'corrupt'
+        return problems
+
+    def checkout(self, target_dir):
+        """按refs.json在target_dir中重建 产品/版本/ 视图，内容与摘要不符的对象不会被检出"""
+        methods = {}
+        checked = {}
+        for rel, digest in sorted(self.refs.items()):
+            source = self.object_path(digest)
+            if not os.path.exists(source):
+                print("警告: 对象缺失 {} ({})".format(rel, digest))
+                continue
+            if digest not in checked:
+                checked[digest] = sha256_file(source) == digest
+            if not checked[digest]:
+                print("警告: 对象内容与摘要不符 {} ({})".format(rel, digest))
+                continue
+            dst = os.path.join(target_dir, rel)
+            if os.path.exists(dst) and os.path.samefile(source, dst):
+                continue
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            method = link_or_clone(source, dst)
+            methods[method] = methods.get(method, 0) + 1
+        return methods
+
+    def gc(self):
+        """删除refs.json不再引用的对象"""
+        referenced = set(self.refs.values())
+        removed = freed = 0
+        if not os.path.isdir(self.objects_dir):
+            return removed, freed
+        for prefix in os.listdir(self.objects_dir):
+            folder = os.path.join(self.objects_dir, prefix)
+            for digest in os.listdir(folder):
+                if digest not in referenced:
+                    path = os.path.join(folder, digest)
+                    freed += os.path.getsize(path)
+                    os.unlink(path)
+                    removed += 1
+        return removed, freed
+
+    def usage(self):
+        """返回 (引用的文件数, 引用的总字节数, 唯一对象数, 唯一对象字节数)"""
+        sizes = {}
+        total = 0
+        for digest in self.refs.values():
+            path = self.object_path(digest)
+            if digest not in sizes and os.path.exists(path):
+                sizes[digest] = os.path.getsize(path)
+            total += sizes.get(digest, 0)
+        return len(self.refs), total, len(sizes), sum(sizes.values())
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('dedup', 'checkout', 'gc', 'verify', 'stats'):
+        print("用法: python3 {} dedup [固件目录] [对象库目录]".format(sys.argv[0]))
+        print("       python3 {} checkout <目标目录> [对象库目录]".format(sys.argv[0]))
+        print("       python3 {} gc [对象库目录]".format(sys.argv[0]))
+        print("       python3 {} verify [对象库目录]".format(sys.argv[0]))
+        print("       python3 {} stats [对象库目录]".format(sys.argv[0]))
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = sys.argv[2:]
+    start_time = time.time()
+
+    if command == 'dedup':
+        firmware_dir = args[0] if args else 'firmware_downloads'
+        store = FirmwareStore(args[1] if len(args) > 1 else 'firmware_store')
+        if not os.path.isdir(firmware_dir):
+            print("错误: 目录不存在 - {}".format(firmware_dir))
+            sys.exit(1)
+        stats = store.dedup(firmware_dir)
+        print("=== 去重结果 (耗时 {:.3f}s) ===".format(time.time() - start_time))
+        print("文件数: {}".format(stats['files']))
+        print("新对象: {}".format(stats['new_objects']))
+        print("改为链接的重复文件: {} {}".format(stats['linked'], stats['methods'] or ''))
+        print("已经是链接: {}".format(stats['already_linked']))
+        print("节省空间: {} bytes".format(stats['saved_bytes']))
+
+    elif command == 'checkout':
+        if not args:
+            print("错误: 需要目标目录")
+            sys.exit(1)
+        store = FirmwareStore(args[1] if len(args) > 1 else 'firmware_store')
+        methods = store.checkout(args[0])
+        print("视图已重建: {} {} (耗时 {:.3f}s)".format(args[0], methods or '(无变化)', time.time() - start_time))
+
+    elif command == 'gc':
+        store = FirmwareStore(args[0] if args else 'firmware_store')
+        removed, freed = store.gc()
+        print("已删除 {} 个未引用对象，释放 {} bytes".format(removed, freed))
+
+    elif command == 'verify':
+        store = FirmwareStore(args[0] if args else 'firmware_store')
+        problems = store.verify()
+        for digest, problem in sorted(problems.items()):
+            rels = sorted(rel for rel, ref in store.refs.items() if ref == digest)
+            print("✗ {} {}: {}".format({'missing': '缺失', 'corrupt': '内容与摘要不符'}[problem], digest, ', '.join(rels)))
+        print("已校验 {} 个对象，异常 {} 个 (耗时 {:.3f}s)".format(
+            len(set(store.refs.values())), len(problems), time.time() - start_time))
+        if problems:
+            sys.exit(1)
+
+    else:
+        store = FirmwareStore(args[0] if args else 'firmware_store')
+
+    files, total, objects, unique = store.usage()
+    print("\n引用文件: {} ({} bytes)，唯一对象: {} ({} bytes)".format(files, total, objects, unique))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预编译的升级任务
+把升级前的准备工作 (读取28字节头部、兼容性检查、2DC8:3206的字节重排、负载长度检查、
+按块切分并打包成64字节报告) 提前做完，保存为任务文件；升级时状态机只按帧序号取出
+已经准备好的报告发送，设备等待期间不再读文件、解析头部或组帧
+
+任务文件格式:
+  '<4sHI' 魔数 'EBFJ'、格式版本、元数据长度
+  元数据 (JSON, UTF-8)
+  帧表: 每帧 '<IHHI' 首个报告序号、报告数、负载字节数、CRC32 (头部帧、数据帧、结束帧)
+  报告: 报告数 × 64字节
+只有校验码 (sub_100006B20) 依赖设备ID，在收到设备信息时计算一次
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import hashlib
+
+from fwupd_ebitdo_parser import find_firmware_files
+from hid_simulator import (FlashSession, FlashSimulator, VirtualBootloader, frame_reports,
+                           header_for_device, firmware_compatible, verify_code, is_magic, report_payload_size,
+                           max_report_payload, CHUNK_SIZE, MAX_FRAME_DATA, HEADER_SIZE, REPORT_SIZE,
+                           FLAG_HEADER, FLAG_DATA, FLAG_END, FLAG_VERIFY)
+
+JOB_MAGIC = b'EBFJ'
+JOB_FORMAT = 1
+JOB_HEADER = struct.Struct('<4sHI')
+FRAME_ENTRY = struct.Struct('<IHHI')
+# 加载和运行任务时用到的元数据
+META_KEYS = ('name', 'source', 'source_sha256', 'vid', 'pid', 'magic', 'firmware_type', 'firmware_subtype',
+             'header_pid', 'chunk_size', 'step', 'payload_len', 'sent', 'image_sha256', 'reports', 'compiled')
+# 不给--output时任务文件的目录，不写进固件目录
+DEFAULT_OUTPUT = 'flash_jobs'
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FlashJob:
+    def __init__(self, meta, frames, reports):
+        """frames: [(首个报告序号, 报告数, 负载字节数, CRC32)]，reports: 所有报告连续存放"""
+        self.meta = meta
+        self.frames = frames
+        self.reports = reports
+        self._index()
+
+    def _index(self):
+        """每帧的报告切片 (memoryview，不复制)"""
+        view = memoryview(self.reports)
+        self.frame_reports = [[view[(first + i) * REPORT_SIZE:(first + i + 1) * REPORT_SIZE] for i in range(count)]
+                              for first, count, _, _ in self.frames]
+        self.frame_bytes = [size for _, _, size, _ in self.frames]
+
+    @property
+    def name(self):
+        return self.meta['name']
+
+    @property
+    def vid(self):
+        return self.meta['vid']
+
+    @property
+    def pid(self):
+        return self.meta['pid']
+
+    @property
+    def data_frames(self):
+        return len(self.frames) - 2
+
+    @classmethod
+    def compile(cls, path, vid, pid, firmware_type=None, firmware_subtype=None, chunk_size=CHUNK_SIZE,
+                report_payload=None):
+        """
+        读取并检查固件，生成发送给 vid:pid 的全部报告
+        给出固件类型/子类型时提前做sub_100006CCA的兼容性检查，不兼容时抛出ValueError
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER_SIZE:
+            raise ValueError('头部长度不足28字节: {}'.format(path))
+        if not 0 < chunk_size <= MAX_FRAME_DATA:
+            raise ValueError('块大小必须在1到{}之间: {}'.format(MAX_FRAME_DATA, chunk_size))
+        magic = is_magic(vid, pid)
+        header = data[:HEADER_SIZE]
+        header_pid = struct.unpack('<H', header[0:2])[0]
+        payload_len = struct.unpack('<I', header[8:12])[0]
+        available = len(data) - HEADER_SIZE
+        if payload_len == 0 or payload_len > available:
+            raise ValueError('负载长度无效: 头部 {}，文件中 {} ({})'.format(payload_len, available, path))
+        if firmware_type is not None and not firmware_compatible(header_pid, firmware_type, firmware_subtype or 0):
+            raise ValueError('固件不支持 (类型{}, 子类型{}, PID 0x{:04X}): {}'.format(
+                firmware_type, firmware_subtype, header_pid, path))
+        step = min(report_payload or report_payload_size(magic), max_report_payload(magic))
+
+        # 与sub_100006F09相同: 按块大小读取直到已发送字节数不小于头部中的长度
+        frames = [(FLAG_HEADER, header_for_device(header, magic), 0)]
+        offset = HEADER_SIZE
+        sent = 0
+        while sent < payload_len:
+            chunk = data[offset:offset + chunk_size]
+            offset += len(chunk)
+            sent += len(chunk)
+            frames.append((FLAG_DATA, chunk, len(chunk)))
+        frames.append((FLAG_END, b'', 0))
+
+        table = []
+        blob = bytearray()
+        for flag, payload, size in frames:
+            encoded = b''.join(frame_reports(flag, payload, magic, step))
+            table.append((len(blob) // REPORT_SIZE, len(encoded) // REPORT_SIZE, size, zlib.crc32(encoded)))
+            blob += encoded
+
+        meta = {
+            'name': os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(path)))) or path,
+            'source': os.path.abspath(path), 'source_sha256': hashlib.sha256(data).hexdigest(),
+            'vid': vid, 'pid': pid, 'magic': magic, 'firmware_type': firmware_type,
+            'firmware_subtype': firmware_subtype, 'header_pid': header_pid, 'chunk_size': chunk_size, 'step': step,
+            'payload_len': payload_len, 'sent': sent,
+            'image_sha256': hashlib.sha256(data[HEADER_SIZE:HEADER_SIZE + payload_len]).hexdigest(),
+            'reports': len(blob) // REPORT_SIZE, 'compiled': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        return cls(meta, table, bytes(blob))
+
+    def save(self, path):
+        meta = json.dumps(self.meta, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(JOB_HEADER.pack(JOB_MAGIC, JOB_FORMAT, len(meta)))
+            f.write(meta)
+            f.write(struct.pack('<I', len(self.frames)))
+            for entry in self.frames:
+                f.write(FRAME_ENTRY.pack(*entry))
+            f.write(self.reports)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, verify=True):
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            magic, version, meta_len = JOB_HEADER.unpack_from(data, 0)
+            if magic != JOB_MAGIC or version != JOB_FORMAT:
+                raise ValueError('不支持的升级任务文件: {}'.format(path))
+            offset = JOB_HEADER.size
+            if len(data) < offset + meta_len:
+                raise ValueError('升级任务文件不完整: {}'.format(path))
+            meta = json.loads(data[offset:offset + meta_len].decode('utf-8'))
+            offset += meta_len
+            count = struct.unpack_from('<I', data, offset)[0]
+            offset += 4
+            frames = [FRAME_ENTRY.unpack_from(data, offset + i * FRAME_ENTRY.size) for i in range(count)]
+            offset += count * FRAME_ENTRY.size
+        except struct.error:
+            raise ValueError('升级任务文件不完整: {}'.format(path))
+        if not isinstance(meta, dict) or any(key not in meta for key in META_KEYS):
+            raise ValueError('升级任务文件元数据不完整: {}'.format(path))
+        reports = data[offset:]
+        if len(reports) != meta['reports'] * REPORT_SIZE:
+            raise ValueError('升级任务文件不完整: {}'.format(path))
+        job = cls(meta, frames, reports)
+        if verify:
+            bad = job.verify()
+            if bad:
+                raise ValueError('升级任务文件CRC错误 (帧 {}): {}'.format(', '.join(map(str, bad[:10])), path))
+        return job
+
+    def verify(self):
+        """CRC32不一致的帧序号"""
+        return [i for i, (first, count, _, crc) in enumerate(self.frames)
+                if zlib.crc32(self.reports[first * REPORT_SIZE:(first + count) * REPORT_SIZE]) != crc]
+
+    def is_stale(self):
+        """源固件在编译之后被修改或删除"""
+        source = self.meta['source']
+        return not os.path.exists(source) or sha256_file(source) != self.meta['source_sha256']
+
+    def session(self, max_retries=3):
+        return CompiledFlashSession(self, max_retries)
+
+
+class CompiledFlashSession(FlashSession):
+    """
+    与FlashSession相同的状态机，但所有帧都来自FlashJob:
+    收到设备信息时检查兼容性并算出校验码，之后每次就绪只取下一帧的报告列表
+    """
+
+    def __init__(self, job, max_retries=3):
+        super().__init__(b'', job.vid, job.pid, job.meta['chunk_size'], max_retries, name=job.name,
+                         report_payload=job.meta['step'])
+        self.job = job
+        self.frame = 0
+        self.final = None
+        self.end = None
+
+    def check_image(self, image):
+        return hashlib.sha256(bytes(image)).hexdigest() == self.job.meta['image_sha256']
+
+    def end_reports(self):
+        return self.end
+
+    def handle_info(self, body):
+        if self.state != 0 or not self.accept_info(body, self.job.meta['header_pid']):
+            return []
+        self.total = self.job.meta['payload_len']
+        # 最后一个数据帧和校验码一起发送
+        last = self.job.data_frames
+        self.final = self.job.frame_reports[last] + frame_reports(FLAG_VERIFY, verify_code(self.ids), self.magic)
+        self.end = self.job.frame_reports[last + 1]
+        self.state = 1
+        return self.send_reports(self.job.frame_reports[0])
+
+    def send_chunk(self):
+        self.frame += 1
+        self.sent += self.job.frame_bytes[self.frame]
+        if self.frame < self.job.data_frames:
+            return self.send_reports(self.job.frame_reports[self.frame])
+        self.state = 3
+        return self.send_reports(self.final, 2)
+
+
+def timed_session(session):
+    """统计状态机处理回应所用的主机时间 (设备等待主机的时间)"""
+    spent = {'host': 0.0, 'calls': 0}
+    handle = session.handle
+
+    def wrapper(report):
+        start = time.perf_counter()
+        try:
+            return handle(report)
+        finally:
+            spent['host'] += time.perf_counter() - start
+            spent['calls'] += 1
+
+    session.handle = wrapper
+    return spent
+
+
+def main():
+    options = {'--device': '2DC8:AB11', '--type': None, '--subtype': None, '--chunk-size': str(CHUNK_SIZE),
+               '--report-payload': None, '--output': None, '--nak-rate': '0', '--timeout-rate': '0',
+               '--seed': '0', '--runs': '5'}
+    args = []
+    argv = sys.argv[1:]
+    while argv:
+        arg = argv.pop(0)
+        if arg in options and argv:
+            options[arg] = argv.pop(0)
+        elif arg.startswith('-'):
+            args = None
+            break
+        else:
+            args.append(arg)
+
+    if not args or len(args) < 2 or args[0] not in ('compile', 'info', 'run'):
+        print("用法: python3 {} compile <固件文件或目录>... [--device VID:PID] [--type 类型] [--subtype 子类型]".format(
+            sys.argv[0]))
+        print("       [--chunk-size 字节] [--report-payload 字节] [--output 任务文件或目录 (默认{}/)]".format(DEFAULT_OUTPUT))
+        print("       python3 {} info <任务文件>".format(sys.argv[0]))
+        print("       python3 {} run <任务文件> [--nak-rate 概率] [--timeout-rate 概率] [--seed 种子] [--runs 次数]".format(
+            sys.argv[0]))
+        sys.exit(1)
+
+    command = args[0]
+
+    if command == 'compile':
+        from metainfo_index import parse_device
+        device_id = parse_device(options['--device'])
+        if device_id is None:
+            print("错误: 无效的设备 - {}".format(options['--device']))
+            sys.exit(1)
+        files = find_firmware_files(args[1:])
+        if not files:
+            print("错误: 未找到.dat文件")
+            sys.exit(1)
+        output = options['--output'] or DEFAULT_OUTPUT
+        # 多个固件、默认输出或已有目录时按 产品_文件名.flashjob 写入目录，否则为单个任务文件
+        to_dir = len(files) > 1 or options['--output'] is None or os.path.isdir(output)
+        if to_dir:
+            os.makedirs(output, exist_ok=True)
+        firmware_type = int(options['--type']) if options['--type'] is not None else None
+        firmware_subtype = int(options['--subtype']) if options['--subtype'] is not None else None
+        failed = 0
+        start_time = time.time()
+        for path in files:
+            if to_dir:
+                job_path = os.path.join(output, '{}_{}.flashjob'.format(
+                    os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(path)))).replace(' ', '_'),
+                    os.path.splitext(os.path.basename(path))[0]))
+            else:
+                job_path = output
+            try:
+                job = FlashJob.compile(path, *device_id, firmware_type=firmware_type, firmware_subtype=firmware_subtype,
+                                       chunk_size=int(options['--chunk-size']),
+                                       report_payload=int(options['--report-payload'] or 0) or None)
+            except ValueError as e:
+                print("✗ {}".format(e))
+                failed += 1
+                continue
+            job.save(job_path)
+            print("✓ {} -> {} ({} 帧, {} 个报告, {} bytes)".format(
+                path, job_path, job.data_frames, job.meta['reports'], os.path.getsize(job_path)))
+        print("\n编译 {}/{}，耗时 {:.3f}s".format(len(files) - failed, len(files), time.time() - start_time))
+        if failed:
+            sys.exit(1)
+        return
+
+    try:
+        start_time = time.perf_counter()
+        job = FlashJob.load(args[1])
+        load_time = time.perf_counter() - start_time
+    except (OSError, ValueError) as e:
+        print("错误: {}".format(e))
+        sys.exit(1)
+    meta = job.meta
+
+    if command == 'info':
+        print("=== 升级任务: {} ===".format(args[1]))
+        print("源固件: {}{}".format(meta['source'], ' (已修改或不存在，需要重新编译)' if job.is_stale() else ''))
+        print("设备: VID 0x{:04X} PID 0x{:04X}{}".format(meta['vid'], meta['pid'], ' (字节重排)' if meta['magic'] else ''))
+        if meta['firmware_type'] is not None:
+            print("兼容性预检: 类型 {} 子类型 {}".format(
+                meta['firmware_type'], '-' if meta['firmware_subtype'] is None else meta['firmware_subtype']))
+        print("头部PID: 0x{:04X}，负载 {} bytes (发送 {})".format(meta['header_pid'], meta['payload_len'], meta['sent']))
+        print("块大小 {}，每报告 {} 字节，{} 个数据帧，{} 个报告".format(
+            meta['chunk_size'], meta['step'], job.data_frames, meta['reports']))
+        print("镜像SHA-256: {}".format(meta['image_sha256']))
+        print("编译时间: {}，加载并校验CRC耗时 {:.3f}ms".format(meta['compiled'], load_time * 1000))
+        return
+
+    device_id = (meta['vid'], meta['pid'])
+    nak_rate = float(options['--nak-rate'])
+    timeout_rate = float(options['--timeout-rate'])
+    runs = int(options['--runs'])
+    firmware_type = meta['firmware_type'] if meta['firmware_type'] is not None else 0
+    firmware_subtype = meta['firmware_subtype'] or 0
+    if job.is_stale():
+        print("错误: 源固件已修改或不存在，需要重新编译 - {}".format(meta['source']))
+        sys.exit(1)
+
+    print("=== 升级任务模拟: {} ({} 次) ===".format(args[1], runs))
+    totals = {}
+    for label in ('逐帧准备', '预编译'):
+        host = calls = elapsed = 0.0
+        succeeded = 0
+        for run in range(runs):
+            device = VirtualBootloader(*device_id, firmware_type=firmware_type, firmware_subtype=firmware_subtype,
+                                       nak_rate=nak_rate, timeout_rate=timeout_rate, seed=int(options['--seed']) + run)
+            if label == '预编译':
+                session = job.session()
+            else:
+                session = FlashSession(meta['source'], *device_id, chunk_size=meta['chunk_size'],
+                                       report_payload=meta['step'])
+            spent = timed_session(session)
+            result = FlashSimulator(device, session).run()
+            succeeded += result['success']
+            host += spent['host']
+            calls += spent['calls']
+            elapsed += result['elapsed']
+        totals[label] = host
+        print("{}: 成功 {}/{}，主机处理 {:.3f}ms (每次回应 {:.2f}µs)，虚拟耗时 {:.3f}s".format(
+            label, succeeded, runs, host * 1000 / runs, host / calls * 1e6, elapsed / runs))
+        if succeeded != runs:
+            sys.exit(1)
+    print("主机处理时间减少 {:.1f}%".format((1 - totals['预编译'] / totals['逐帧准备']) * 100))
+
+
+if __name__ == "__main__":
+    main()
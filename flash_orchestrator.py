@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多设备并发升级
+用asyncio同时驱动N个设备句柄上的主机状态机 (hid_simulator.FlashSession，
+即 sub_1000076C6 / sub_100006F09 / sub_100006CCA 的流程)，每个设备独立处理
+回应超时、NAK重发和整体重试，等待设备时不阻塞其他设备，
+总耗时接近最慢的一个设备而不是所有设备之和
+"""
+
+import sys
+import time
+import asyncio
+
+from fwupd_ebitdo_parser import find_firmware_files
+from hid_simulator import VirtualBootloader, FlashSession, CHUNK_SIZE
+from flash_job import FlashJob
+
+
+class SimulatedHandle:
+    """
+    VirtualBootloader的异步句柄: 写入报告后按虚拟耗时 × time_scale 真实等待，
+    回应放入队列，由read()带超时读取
+    """
+
+    # 小于该值的等待累积起来一起等，避免每个报告都受事件循环计时精度 (约1ms) 影响
+    MIN_SLEEP = 0.002
+
+    def __init__(self, device, time_scale=1.0, name=None):
+        self.device = device
+        self.time_scale = time_scale
+        self.name = name or '{:04X}:{:04X}'.format(device.vid, device.pid)
+        self.inbox = None
+        self.clock = None
+
+    @property
+    def vid(self):
+        return self.device.vid
+
+    @property
+    def pid(self):
+        return self.device.pid
+
+    async def attach(self):
+        self.inbox = asyncio.Queue()
+        self.clock = asyncio.get_running_loop().time()
+        self.inbox.put_nowait(self.device.attach())
+
+    async def write(self, reports):
+        """返回这次传输的虚拟耗时"""
+        responses, busy = self.device.transfer(reports)
+        loop = asyncio.get_running_loop()
+        self.clock = max(self.clock, loop.time()) + busy * self.time_scale
+        delay = self.clock - loop.time()
+        await asyncio.sleep(delay if delay >= self.MIN_SLEEP else 0)
+        for report in responses:
+            self.inbox.put_nowait(report)
+        return busy
+
+    async def read(self, timeout):
+        return await asyncio.wait_for(self.inbox.get(), timeout * self.time_scale)
+
+    def verify(self, session):
+        """设备中的镜像是否与固件一致"""
+        return self.device.flashed and session.check_image(self.device.image)
+
+
+class FlashOrchestrator:
+    """
+    ack_timeout: 等待每个回应的时间 (虚拟秒)
+    device_timeout: 单个设备一次升级的总时限 (虚拟秒)，None为不限
+    attempts: 通信失败 (NAK或超时次数用完、总时限到) 后重新连接整体重试的总次数
+    concurrency: 同时升级的设备数，None为全部
+    on_progress(名称, 状态, 进度百分比): 百分比变化时调用 (与lastProgress相同的节流)
+    """
+
+    def __init__(self, ack_timeout=0.1, device_timeout=None, attempts=2, max_retries=3, chunk_size=CHUNK_SIZE,
+                 concurrency=None, on_progress=None):
+        if attempts < 1:
+            raise ValueError('attempts必须至少为1: {}'.format(attempts))
+        self.ack_timeout = ack_timeout
+        self.device_timeout = device_timeout
+        self.attempts = attempts
+        self.max_retries = max_retries
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+        self.progress = {}
+
+    def report_progress(self, name, state, percent):
+        if self.progress.get(name) == (state, percent):
+            return
+        self.progress[name] = (state, percent)
+        if self.on_progress:
+            self.on_progress(name, state, percent)
+
+    async def run_session(self, handle, session):
+        """一次完整的升级，返回虚拟耗时；device_timeout按虚拟耗时计算"""
+        elapsed = 0.0
+        await handle.attach()
+        while not session.finished:
+            if self.device_timeout is not None and elapsed >= self.device_timeout:
+                session.fail('升级超时 ({}s)'.format(self.device_timeout), retryable=True)
+                break
+            try:
+                outgoing = session.handle(await handle.read(self.ack_timeout))
+            except asyncio.TimeoutError:
+                elapsed += self.ack_timeout
+                outgoing = session.timeout()
+            if outgoing:
+                elapsed += await handle.write(outgoing)
+            self.report_progress(handle.name, session.state, int(session.progress * 100))
+        return elapsed
+
+    async def flash_device(self, handle, firmware):
+        source = firmware.meta['source'] if isinstance(firmware, FlashJob) else firmware
+        result = {'name': handle.name, 'firmware': source, 'success': False, 'error': None, 'attempts': 0,
+                  'elapsed': 0.0, 'wall': 0.0, 'bytes': 0, 'retries': 0}
+        if isinstance(firmware, FlashJob) and (firmware.vid, firmware.pid) != (handle.vid, handle.pid):
+            # 报告已按编译时的设备做过 (或没做) 字节重排，不能发给其他设备；只让这一个设备失败
+            result['error'] = '升级任务是为 {:04X}:{:04X} 编译的，设备为 {:04X}:{:04X}'.format(
+                firmware.vid, firmware.pid, handle.vid, handle.pid)
+            self.report_progress(handle.name, 'failed', 0)
+            return result
+        start_time = time.perf_counter()
+        for attempt in range(1, self.attempts + 1):
+            result['attempts'] = attempt
+            if isinstance(firmware, FlashJob):
+                session = firmware.session(self.max_retries)
+            else:
+                session = FlashSession(firmware, handle.vid, handle.pid, self.chunk_size, self.max_retries)
+            result['elapsed'] += await self.run_session(handle, session)
+            result['retries'] += session.stats['retries']
+            result['bytes'] = session.sent
+            result['error'] = session.error
+            if session.error is None and not handle.verify(session):
+                result['error'] = '设备镜像与固件不一致'
+            if result['error'] is None:
+                result['success'] = True
+                break
+            if not session.retryable:
+                break
+        result['wall'] = time.perf_counter() - start_time
+        self.report_progress(handle.name, 'done' if result['success'] else 'failed',
+                             100 if result['success'] else int(session.progress * 100))
+        return result
+
+    async def flash(self, jobs):
+        """jobs: [(句柄, 固件路径、数据或FlashJob)]，结果顺序与jobs相同"""
+        semaphore = asyncio.Semaphore(self.concurrency or max(len(jobs), 1))
+
+        async def limited(handle, firmware):
+            async with semaphore:
+                return await self.flash_device(handle, firmware)
+
+        return await asyncio.gather(*(limited(handle, firmware) for handle, firmware in jobs))
+
+    def run(self, jobs):
+        return asyncio.run(self.flash(jobs))
+
+
+def main():
+    options = {'--devices': '8', '--device': '2DC8:AB11', '--type': '0', '--subtype': '1', '--nak-rate': '0',
+               '--timeout-rate': '0', '--seed': '0', '--retries': '3', '--attempts': '2', '--ack-timeout': '0.1',
+               '--device-timeout': '0', '--time-scale': '0.05', '--concurrency': '0'}
+    args = []
+    compile_jobs = False
+    argv = sys.argv[1:]
+    while argv:
+        arg = argv.pop(0)
+        if arg in options and argv:
+            options[arg] = argv.pop(0)
+        elif arg == '--compile':
+            compile_jobs = True
+        elif arg.startswith('-'):
+            args = None
+            break
+        else:
+            args.append(arg)
+
+    if args is None:
+        print("用法: python3 {} [固件文件或目录]... [--devices N] [--device VID:PID] [--type 类型] [--subtype 子类型]"
+              .format(sys.argv[0]))
+        print("       [--nak-rate 概率] [--timeout-rate 概率] [--seed 种子] [--retries 次数] [--attempts 次数]")
+        print("       [--ack-timeout 秒] [--device-timeout 秒] [--time-scale 倍率] [--concurrency N] [--compile]")
+        sys.exit(1)
+
+    from metainfo_index import parse_device
+    device_id = parse_device(options['--device'])
+    if device_id is None:
+        print("错误: 无效的设备 - {}".format(options['--device']))
+        sys.exit(1)
+
+    files = find_firmware_files(args or ['firmware_downloads'])
+    if not files:
+        print("错误: 未找到.dat文件")
+        sys.exit(1)
+
+    count = int(options['--devices'])
+    time_scale = float(options['--time-scale'])
+    if compile_jobs:
+        # 所有设备的VID/PID相同，每个固件只需编译一次
+        start_time = time.perf_counter()
+        try:
+            files = [FlashJob.compile(path, *device_id) for path in files[:count]]
+        except ValueError as e:
+            print("错误: {}".format(e))
+            sys.exit(1)
+        print("预编译 {} 个升级任务，耗时 {:.3f}s".format(len(files), time.perf_counter() - start_time))
+    jobs = []
+    for i in range(count):
+        device = VirtualBootloader(*device_id, firmware_type=int(options['--type']),
+                                   firmware_subtype=int(options['--subtype']),
+                                   nak_rate=float(options['--nak-rate']), timeout_rate=float(options['--timeout-rate']),
+                                   seed=int(options['--seed']) + i)
+        jobs.append((SimulatedHandle(device, time_scale, name='dev{:02d}'.format(i)), files[i % len(files)]))
+
+    def on_progress(name, state, percent):
+        if state in ('done', 'failed') or (state == 2 and percent % 25 == 0 and percent):
+            print("  {} {:>3}% {}".format(name, percent, {'done': '完成', 'failed': '失败'}.get(state, '')))
+
+    try:
+        orchestrator = FlashOrchestrator(ack_timeout=float(options['--ack-timeout']),
+                                         device_timeout=float(options['--device-timeout']) or None,
+                                         attempts=int(options['--attempts']), max_retries=int(options['--retries']),
+                                         concurrency=int(options['--concurrency']) or None, on_progress=on_progress)
+    except ValueError as e:
+        print("错误: {}".format(e))
+        sys.exit(1)
+    print("=== 并发升级 {} 个设备 (时间倍率 {}) ===".format(count, time_scale))
+    start_time = time.perf_counter()
+    results = orchestrator.run(jobs)
+    wall = time.perf_counter() - start_time
+
+    print("\n设备     结果  尝试  重试  虚拟耗时  实际耗时  固件")
+    for result in results:
+        print("{:<8} {:<4} {:>4} {:>5} {:>8.3f}s {:>8.3f}s  {}{}".format(
+            result['name'], '成功' if result['success'] else '失败', result['attempts'], result['retries'],
+            result['elapsed'], result['wall'], result['firmware'],
+            '' if result['success'] else ' ({})'.format(result['error'])))
+
+    succeeded = sum(1 for result in results if result['success'])
+    slowest = max(result['wall'] for result in results)
+    total = sum(result['wall'] for result in results)
+    print("\n成功 {}/{}，总耗时 {:.3f}s，最慢设备 {:.3f}s，逐个升级合计 {:.3f}s".format(
+        succeeded, len(results), wall, slowest, total))
+    if succeeded != len(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
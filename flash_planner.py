@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HID报告切分规划
+按延迟模型 (每个报告的传输时间、每次回应的ACK延迟、擦写时间、NAK/超时概率) 计算
+升级流程的耗时，在主机能选择的块大小 (1..1017) 和每报告携带字节数 (flashfirmware的
+v7|0x20 或整个64字节报告) 中找出预计最快的方案，生成逐批时间表，
+并用hid_simulator的虚拟设备检查公式与模拟是否一致
+
+主机协议本身是停等式的: 每帧发送后等待设备就绪，帧内的多个报告连续发送。
+先回应再写入 (设备端双缓冲，写入与下一帧的传输重叠) 需要改设备固件，主机无法开启，
+这类方案只作为假设单独列出，不参与最优方案的选择。
+真实bootloader只见过flashfirmware的 32字节块 + v7|0x20 切分，其他块大小和每报告字节数
+只在虚拟设备上跑通过，结果中verified为False，输出时标记为未验证
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import struct
+
+from fwupd_ebitdo_parser import find_firmware_files
+from hid_simulator import (VirtualBootloader, simulate_flash, is_magic, DEFAULT_TIMING, CHUNK_SIZE, MAX_FRAME_DATA,
+                           FRAME_HEADER_SIZE, HEADER_SIZE, REPORT_SIZE, report_payload_size, max_report_payload)
+
+# 等待回应的超时 (与FlashSimulator的默认值相同)
+ACK_TIMEOUT = 0.1
+
+
+def frame_report_count(size, magic, step):
+    """size字节的数据帧需要的报告数"""
+    return math.ceil((FRAME_HEADER_SIZE + size + (1 if magic else 0)) / step)
+
+
+def batch_overhead(reports, frames, timing, nak_rate, timeout_rate, ack_timeout):
+    """
+    一批帧 (NAK或超时时整批重发) 因故障增加的期望耗时
+    每帧独立地以nak_rate/timeout_rate出错，重发次数服从几何分布
+    """
+    fault_rate = nak_rate + timeout_rate
+    if not fault_rate:
+        return 0.0
+    success = (1 - fault_rate) ** frames
+    failed_attempt = (reports * timing['report_time'] +
+                      (timeout_rate * ack_timeout + nak_rate * timing['ack_time']) / fault_rate)
+    return (1 / success - 1) * failed_attempt
+
+
+def report_capacity(magic, report_size=REPORT_SIZE):
+    """一个报告去掉计数字节 (和0x81前缀) 后能携带的帧字节数"""
+    return max_report_payload(magic) + report_size - REPORT_SIZE
+
+
+def plan(payload_len, chunk_size, timing=None, magic=False, step=None, early_ack=False,
+         nak_rate=0.0, timeout_rate=0.0, ack_timeout=ACK_TIMEOUT, report_size=REPORT_SIZE, available=None):
+    """
+    一种方案的预计耗时，各部分与FlashSimulator的虚拟时钟一致:
+    请求信息 + 头部 (擦除) + (n-1)个数据帧 + 最后一块和校验码 + 结束帧
+    available: 文件中头部之后的字节数，主机最后一次仍按块大小读取，超出负载长度的部分照样发送
+    elapsed为无故障时的耗时，expected加上NAK/超时重发的期望
+    verified: 与主机程序 (sub_100006F09 / flashfirmware) 实际使用的方式相同，已知真实bootloader接受
+    """
+    if payload_len <= 0:
+        raise ValueError('负载长度必须大于0: {}'.format(payload_len))
+    timing = dict(DEFAULT_TIMING, **(timing or {}))
+    step = min(step or report_payload_size(magic), report_capacity(magic, report_size))
+    rt, ack = timing['report_time'], timing['ack_time']
+    write = timing['write_time_per_byte']
+
+    frames = math.ceil(payload_len / chunk_size)
+    middle = frames - 1
+    last_size = payload_len - middle * chunk_size
+    last_read = min(chunk_size, max(available or payload_len, payload_len) - middle * chunk_size)
+    reports = frame_report_count(chunk_size, magic, step)
+    last_reports = frame_report_count(last_read, magic, step)
+
+    if early_ack:
+        # 回应前只需等待上一帧的写入在 ACK + 本帧传输 期间没有完成的部分
+        first_wait = 0.0
+        frame_wait = max(0.0, chunk_size * write - ack - reports * rt)
+        last_wait = max(0.0, chunk_size * write - ack - last_reports * rt) if middle else 0.0
+        verify_wait = max(0.0, last_size * write - rt)
+    else:
+        first_wait = frame_wait = chunk_size * write
+        last_wait = last_size * write
+        verify_wait = 0.0
+
+    result = {
+        'payload_len': payload_len, 'chunk_size': chunk_size, 'step': step, 'magic': magic,
+        'early_ack': early_ack,
+        'verified': chunk_size == CHUNK_SIZE and step == report_payload_size(magic) and not early_ack
+                    and report_size == REPORT_SIZE,
+        'frames': frames, 'reports_per_frame': reports, 'last_size': last_read,
+        'last_reports': last_reports, 'reports': 2 + middle * reports + last_reports + 2,
+        'fill': payload_len / float((middle * reports + last_reports) * report_size),
+        'setup': rt + ack,
+        'header': rt + payload_len / 1024.0 * timing['erase_time_per_kb'] + ack,
+        'first_frame': reports * rt + first_wait + ack,
+        'frame': reports * rt + frame_wait + ack,
+        'final': (last_reports + 1) * rt + last_wait + verify_wait + ack,
+        'end': rt,
+    }
+    data = result['first_frame'] + (middle - 1) * result['frame'] if middle else 0.0
+    result['elapsed'] = result['setup'] + result['header'] + data + result['final'] + result['end']
+    result['expected'] = result['elapsed'] + (
+        batch_overhead(1, 1, timing, nak_rate, timeout_rate, ack_timeout) +
+        middle * batch_overhead(reports, 1, timing, nak_rate, timeout_rate, ack_timeout) +
+        batch_overhead(last_reports + 1, 2, timing, nak_rate, timeout_rate, ack_timeout))
+    return result
+
+
+def schedule(result):
+    """逐批时间表 (无故障): [{批次, 内容, 偏移, 大小, 报告数, 开始, 结束}]"""
+    rows = []
+    clock = 0.0
+
+    def add(kind, offset, size, reports, duration):
+        nonlocal clock
+        rows.append({'batch': len(rows), 'kind': kind, 'offset': offset, 'size': size, 'reports': reports,
+                     'start': round(clock, 9), 'end': round(clock + duration, 9)})
+        clock += duration
+
+    chunk = result['chunk_size']
+    add('info', 0, 0, 1, result['setup'])
+    add('header', 0, HEADER_SIZE, 1, result['header'])
+    for i in range(result['frames'] - 1):
+        add('data', i * chunk, chunk, result['reports_per_frame'], result['frame'] if i else result['first_frame'])
+    add('data+verify', (result['frames'] - 1) * chunk, result['last_size'], result['last_reports'] + 1,
+        result['final'])
+    add('end', 0, 0, 1, result['end'])
+    return rows
+
+
+def candidate_steps(magic, report_size=REPORT_SIZE):
+    """flashfirmware的切分方式，以及把整个报告填满"""
+    steps = [min(report_payload_size(magic), report_capacity(magic, report_size))]
+    if report_capacity(magic, report_size) not in steps:
+        steps.append(report_capacity(magic, report_size))
+    return steps
+
+
+def optimize(payload_len, timing=None, magic=False, nak_rate=0.0, timeout_rate=0.0, ack_timeout=ACK_TIMEOUT,
+             report_size=REPORT_SIZE, available=None, chunk_sizes=None, ack_modes=(False,)):
+    """
+    每种 (每报告字节数, 回应方式) 组合下期望耗时最小的块大小，按期望耗时排序
+    ack_modes默认只有现有bootloader的写入后回应；(True,) 计算假设设备先回应再写入的方案
+    """
+    chunk_sizes = chunk_sizes or range(1, MAX_FRAME_DATA + 1)
+    best = []
+    for step in candidate_steps(magic, report_size):
+        for early_ack in ack_modes:
+            plans = (plan(payload_len, size, timing, magic, step, early_ack, nak_rate, timeout_rate, ack_timeout,
+                          report_size, available) for size in chunk_sizes)
+            best.append(min(plans, key=lambda result: (result['expected'], result['chunk_size'])))
+    return sorted(best, key=lambda result: result['expected'])
+
+
+def validate(path, result, timing=None, vid=0x2DC8, pid=0xAB11, nak_rate=0.0, timeout_rate=0.0,
+             ack_timeout=ACK_TIMEOUT, runs=1, seed=0):
+    """用虚拟设备实际跑一遍 (有故障时跑多次取平均)，返回 (平均虚拟耗时, 成功次数)"""
+    elapsed = []
+    for run in range(runs):
+        device = VirtualBootloader(vid, pid, firmware_type=0, timing=timing, early_ack=result['early_ack'],
+                                   nak_rate=nak_rate, timeout_rate=timeout_rate, seed=seed + run)
+        outcome = simulate_flash(path, device, max_retries=100, ack_timeout=ack_timeout,
+                                 chunk_size=result['chunk_size'], report_payload=result['step'])
+        if outcome['success']:
+            elapsed.append(outcome['elapsed'])
+    return (sum(elapsed) / len(elapsed) if elapsed else None), len(elapsed)
+
+
+def describe(result):
+    return "{}字节/报告, {}{}".format(result['step'], '先回应再写入' if result['early_ack'] else '写入后回应',
+                                  '' if result['verified'] else ' *')
+
+
+def main():
+    options = {'--device': '2DC8:AB11', '--report-size': str(REPORT_SIZE), '--report-time': None,
+               '--ack-latency': None, '--write-time': None, '--erase-time': None, '--nak-rate': '0',
+               '--timeout-rate': '0', '--ack-timeout': str(ACK_TIMEOUT), '--runs': '5', '--seed': '0',
+               '--schedule': None}
+    args = []
+    argv = sys.argv[1:]
+    while argv:
+        arg = argv.pop(0)
+        if arg in options and argv:
+            options[arg] = argv.pop(0)
+        elif arg.startswith('-'):
+            args = None
+            break
+        else:
+            args.append(arg)
+
+    if not args:
+        print("用法: python3 {} <负载长度|固件文件> [--device VID:PID] [--report-size 字节]".format(sys.argv[0]))
+        print("       [--report-time 秒] [--ack-latency 秒] [--write-time 秒/字节] [--erase-time 秒/KB]")
+        print("       [--nak-rate 概率] [--timeout-rate 概率] [--ack-timeout 秒] [--runs 次数] [--seed 种子]")
+        print("       [--schedule 时间表.json]")
+        sys.exit(1)
+
+    from metainfo_index import parse_device
+    device_id = parse_device(options['--device'])
+    if device_id is None:
+        print("错误: 无效的设备 - {}".format(options['--device']))
+        sys.exit(1)
+    magic = is_magic(*device_id)
+
+    timing = dict(DEFAULT_TIMING)
+    for option, key in (('--report-time', 'report_time'), ('--ack-latency', 'ack_time'),
+                        ('--write-time', 'write_time_per_byte'), ('--erase-time', 'erase_time_per_kb')):
+        if options[option] is not None:
+            timing[key] = float(options[option])
+    nak_rate = float(options['--nak-rate'])
+    timeout_rate = float(options['--timeout-rate'])
+    ack_timeout = float(options['--ack-timeout'])
+
+    path = None
+    available = None
+    if args[0].isdigit():
+        payload_len = int(args[0])
+    else:
+        files = find_firmware_files(args[:1])
+        if not files:
+            print("错误: 未找到.dat文件 - {}".format(args[0]))
+            sys.exit(1)
+        path = files[0]
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        payload_len = struct.unpack('<I', header[8:12])[0]
+        available = os.path.getsize(path) - HEADER_SIZE
+    if payload_len <= 0:
+        print("错误: 负载长度必须大于0 - {}".format(args[0]))
+        sys.exit(1)
+
+    report_size = int(options['--report-size'])
+    if report_size != REPORT_SIZE:
+        print("注意: 虚拟设备只支持{}字节报告，{}字节报告的方案不做验证".format(REPORT_SIZE, report_size))
+        path = None
+
+    print("=== 升级计划: 负载 {} bytes, 报告传输 {:.3f}ms, ACK {:.3f}ms, 写入 {:.2f}µs/字节, NAK {}, 超时 {} ===".format(
+        payload_len, timing['report_time'] * 1000, timing['ack_time'] * 1000, timing['write_time_per_byte'] * 1e6,
+        nak_rate, timeout_rate))
+
+    start_time = time.perf_counter()
+    current = plan(payload_len, CHUNK_SIZE, timing, magic, None, False, nak_rate, timeout_rate, ack_timeout,
+                   report_size, available)
+    best = optimize(payload_len, timing, magic, nak_rate, timeout_rate, ack_timeout, report_size, available)
+    hypothetical = optimize(payload_len, timing, magic, nak_rate, timeout_rate, ack_timeout, report_size, available,
+                            ack_modes=(True,))
+    search_time = time.perf_counter() - start_time
+
+    def print_plans(rows):
+        print("\n{:<24} {:>6} {:>6} {:>8} {:>7} {:>10} {:>10} {:>6}".format(
+            '方案', '块大小', '帧数', '报告数', '填充率', '无故障', '期望', '加速'))
+        for label, result in rows:
+            print("{:<24} {:>6} {:>6} {:>8} {:>6.1%} {:>9.3f}s {:>9.3f}s {:>5.2f}x".format(
+                label, result['chunk_size'], result['frames'], result['reports'], result['fill'], result['elapsed'],
+                result['expected'], current['expected'] / result['expected']))
+
+    print_plans([('当前 (sub_100006F09)', current)] + [(describe(result), result) for result in best])
+    print("\n假设设备先回应再写入 (需要修改设备固件，主机无法开启，仅供参考):", end='')
+    print_plans([(describe(result), result) for result in hypothetical])
+    print("(搜索 {} 种方案耗时 {:.3f}s)".format((len(best) + len(hypothetical)) * MAX_FRAME_DATA, search_time))
+    print("* 未在真实bootloader上验证: 主机程序只使用{}字节块和每报告{}字节，其他取值只在虚拟设备上跑通过".format(
+        CHUNK_SIZE, report_payload_size(magic)))
+
+    chosen = best[0]
+    print("\n最优 (主机可设置，现有bootloader的回应方式): 块大小 {}，{}，每帧 {} 个报告，每帧往返 {:.3f}ms，预计 {:.3f}s{}".format(
+        chosen['chunk_size'], describe(chosen), chosen['reports_per_frame'], chosen['frame'] * 1000,
+        chosen['expected'], '' if chosen['verified'] else ' (未在真实bootloader上验证)'))
+
+    if options['--schedule']:
+        with open(options['--schedule'], 'w', encoding='utf-8') as f:
+            json.dump({'plan': chosen, 'timing': timing, 'schedule': schedule(chosen)}, f, indent=1)
+        print("时间表已保存: {}".format(options['--schedule']))
+
+    if path is None:
+        return
+    runs = int(options['--runs']) if nak_rate or timeout_rate else 1
+    # 公式和虚拟设备使用同一个时间模型 (DEFAULT_TIMING及上面的覆盖值)，这里只检查二者是否一致，
+    # 不能说明真实硬件上的耗时
+    print("\n模型一致性检查 (公式 vs 虚拟设备，同一时间模型，不代表真实硬件; {}, {} 次):".format(path, runs))
+    failed = False
+    for label, result in (('当前', current), ('最优', chosen)):
+        simulated, succeeded = validate(path, result, timing, device_id[0], device_id[1], nak_rate, timeout_rate,
+                                        ack_timeout, runs, int(options['--seed']))
+        if simulated is None:
+            print("  {}: 模拟失败".format(label))
+            failed = True
+            continue
+        error = (result['expected'] - simulated) / simulated
+        print("  {}: 公式 {:.3f}s，模拟 {:.3f}s (成功 {}/{})，差异 {:+.2%}".format(
+            label, result['expected'], simulated, succeeded, runs, error))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,18 @@ import sys
 import struct
 import binascii
 import hashlib
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Iterable
+
+# 载荷实际大小与头部记录的payload_len允许的最大差异 (可能是填充或对齐)
+MAX_PAYLOAD_DIFF = 200
+
+# 批量校验时每个文件只读取的开头字节数 (覆盖最长的头部格式)
+HEADER_READ_SIZE = 128
+
+
+def _silent(*args, **kwargs):
+    pass
+
 
 class EbitdoHeader:
     """
@@ -62,17 +73,23 @@ class EbitdoHeader:
         self.format_info = None
     
     @classmethod
-    def parse_from_stream(cls, data: bytes, offset: int = 0) -> Optional['EbitdoHeader']:
+    def parse_from_stream(cls, data: bytes, offset: int = 0, verbose: bool = True,
+                          stream_size: Optional[int] = None) -> Optional['EbitdoHeader']:
         """
         从数据流解析ebitdo头部
         模拟fwupd的fu_struct_ebitdo_hdr_parse_stream函数
+        verbose为False时不输出任何信息；data只包含文件开头时用stream_size给出完整大小
         """
+        log = print if verbose else _silent
+        if stream_size is None:
+            stream_size = len(data)
         if len(data) < offset + 16:
-            print(f"数据不足，需要至少16字节")
+            log(f"数据不足，需要至少16字节")
             return None
         
-        print(f"数据前32字节: {data[offset:offset+32].hex()}")
-        print(f"数据前16字节解析为小端32位整数: {struct.unpack('<IIII', data[offset:offset+16])}")
+        if verbose:
+            log(f"数据前32字节: {data[offset:offset+32].hex()}")
+            log(f"数据前16字节解析为小端32位整数: {struct.unpack('<IIII', data[offset:offset+16])}")
         
         header = cls()
         
@@ -84,12 +101,12 @@ class EbitdoHeader:
             try:
                 header_data = data[offset:offset + fmt_info['size']]
                 values = struct.unpack(fmt_info['format'], header_data)
-                print(f"尝试格式 {cls.HEADER_FORMATS.index(fmt_info)+1}: {fmt_info['fields']} = {values}")
-                print(f"  原始字节: {header_data.hex()}")
+                log(f"尝试格式 {cls.HEADER_FORMATS.index(fmt_info)+1}: {fmt_info['fields']} = {values}")
+                log(f"  原始字节: {header_data.hex()}")
                 
                 # 基本验证
-                validation_result = cls._validate_header_values(values, fmt_info)
-                print(f"  验证结果: {validation_result}")
+                validation_result = cls._validate_header_values(values, fmt_info, verbose)
+                log(f"  验证结果: {validation_result}")
                 if validation_result:
                     header.size = fmt_info['size']
                     header.raw_data = header_data
@@ -99,7 +116,7 @@ class EbitdoHeader:
                     for i, field in enumerate(fmt_info['fields']):
                         if field == 'header_len':
                             # 使用header_len作为实际头部大小
-                            if values[i] > 0 and values[i] <= len(data):
+                            if values[i] > 0 and values[i] <= stream_size:
                                 header.size = values[i]
                         elif field == 'payload_len':
                             header.destination_len = values[i]
@@ -111,39 +128,70 @@ class EbitdoHeader:
                     
                     return header
             except struct.error as e:
-                print(f"格式 {cls.HEADER_FORMATS.index(fmt_info)+1} 解包失败: {e}")
-                print(f"  需要 {fmt_info['size']} 字节，可用 {len(data)-offset} 字节")
+                log(f"格式 {cls.HEADER_FORMATS.index(fmt_info)+1} 解包失败: {e}")
+                log(f"  需要 {fmt_info['size']} 字节，可用 {len(data)-offset} 字节")
                 continue
         
         return None
+
+    @classmethod
+    def parse_with_layout(cls, data: bytes, layout: Dict[str, Any],
+                          stream_size: Optional[int] = None) -> Optional['EbitdoHeader']:
+        """
+        按header_layout.py推断出的产品布局直接读取字段，不再逐个尝试HEADER_FORMATS
+        layout中的字段为 [偏移, struct格式]；payload_len为None表示载荷一直到文件末尾 (大小无法校验)
+        """
+        if stream_size is None:
+            stream_size = len(data)
+        header_size = layout['header_size']
+        if len(data) < min(header_size, HEADER_READ_SIZE) or header_size > stream_size:
+            return None
+
+        def field(name, default=0):
+            if not layout.get(name):
+                return default
+            offset, fmt = layout[name]
+            if len(data) < offset + struct.calcsize(fmt):
+                return default
+            return struct.unpack_from(fmt, data, offset)[0]
+
+        header = cls()
+        header.size = header_size
+        header.raw_data = bytes(data[:header_size])
+        header.format_info = layout
+        header.version = field('version')
+        header.destination_addr = field('dest_addr')
+        header.destination_len = field('payload_len', stream_size - header_size)
+        return header
     
     @staticmethod
-    def _validate_header_values(values: tuple, fmt_info: dict) -> bool:
+    def _validate_header_values(values: tuple, fmt_info: dict, verbose: bool = True) -> bool:
         """
         验证头部值的合理性
         基于实际固件文件的观察结果
         """
+        log = print if verbose else _silent
         if len(values) < 4:
             return False
         
         header_len, dest_addr, payload_len, reserved = values[:4]
         
-        print(f"    验证值: header_len={header_len}, dest_addr=0x{dest_addr:08X}, payload_len={payload_len}, reserved={reserved}")
+        log(f"    验证值: header_len={header_len}, dest_addr=0x{dest_addr:08X}, payload_len={payload_len}, reserved={reserved}")
         
         # 基于实际观察的验证
         # header_len = 125 (0x7d) 看起来合理
         if header_len < 16 or header_len > 1024:
-            print(f"    header_len {header_len} 超出范围 [16, 1024]")
+            log(f"    header_len {header_len} 超出范围 [16, 1024]")
             return False
         
         # payload_len = 64512 (0xfc00) 对于64540字节的文件来说合理
         # 64540 - 125 = 64415, 接近64512
         if payload_len < 1000 or payload_len > 100000:
-            print(f"    payload_len {payload_len} 超出范围 [1000, 100000]")
+            log(f"    payload_len {payload_len} 超出范围 [1000, 100000]")
             return False
         
         # dest_addr_high 可能是一个大的地址值，不需要严格限制
-        print(f"    验证通过")
+        log(f"    验证通过")
         return True
     
     def get_version(self) -> int:
@@ -162,6 +210,136 @@ class EbitdoHeader:
         return (f"EbitdoHeader(size={self.size}, version=0x{self.version:04X}, "
                 f"dest_len={self.destination_len}, dest_addr=0x{self.destination_addr:08X})")
 
+class EbitdoParseResult:
+    """
+    无副作用解析的结果
+    payload是原始数据的memoryview (不复制)，头部解析失败或批量校验时为None
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.file_size = 0
+        self.header: Optional[EbitdoHeader] = None
+        self.payload: Optional[memoryview] = None
+        self.payload_offset = 0
+        self.payload_len = 0
+        self.expected_payload_len = 0
+        self.size_diff = 0
+        self.size_checked = True
+        self.valid = False
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'file_size': self.file_size,
+            'valid': self.valid,
+            'size_checked': self.size_checked,
+            'error': self.error,
+            'header_size': self.header.size if self.header else None,
+            'dest_addr': self.header.destination_addr if self.header else None,
+            'payload_offset': self.payload_offset,
+            'payload_len': self.payload_len,
+            'expected_payload_len': self.expected_payload_len,
+            'size_diff': self.size_diff,
+        }
+
+    @property
+    def status(self) -> str:
+        """有效 / 未验证 (布局没有载荷长度字段，无法校验文件大小) / 无效"""
+        if self.valid:
+            return '有效'
+        return '未验证' if not self.size_checked else '无效'
+
+    def __repr__(self) -> str:
+        status = '有效' if self.valid else '{}: {}'.format(self.status, self.error)
+        return f"EbitdoParseResult({self.path}, {status}, header={self.header})"
+
+
+def parse_firmware_data(data: bytes, file_size: Optional[int] = None, path: Optional[str] = None,
+                        with_payload: bool = True, layout: Optional[Dict[str, Any]] = None) -> EbitdoParseResult:
+    """
+    与FwupdEbitdoParser.parse_firmware相同的头部解析和大小校验，但不输出、不写文件
+    data可以只是文件开头 (至少HEADER_READ_SIZE字节)，此时file_size给出完整大小
+    给出layout (产品的推断布局) 时直接按布局解析
+    """
+    result = EbitdoParseResult(path)
+    result.file_size = len(data) if file_size is None else file_size
+
+    if layout is not None:
+        header = EbitdoHeader.parse_with_layout(data, layout, stream_size=result.file_size)
+    else:
+        header = EbitdoHeader.parse_from_stream(data, 0, verbose=False, stream_size=result.file_size)
+    if header is None:
+        result.error = '无法解析ebitdo头部结构'
+        return result
+    result.header = header
+
+    result.payload_offset = header.size
+    result.payload_len = result.file_size - header.size
+    result.expected_payload_len = header.get_destination_len()
+    result.size_diff = abs(result.payload_len - result.expected_payload_len)
+    if with_payload and len(data) >= result.file_size:
+        result.payload = memoryview(data)[header.size:result.file_size]
+
+    if layout is not None and not layout.get('payload_len'):
+        # 回退布局的载荷长度就是按文件大小算出来的，大小校验恒成立，不能算作有效
+        result.size_checked = False
+        result.error = '布局中没有载荷长度字段，无法校验文件大小'
+        return result
+    if result.size_diff > MAX_PAYLOAD_DIFF:
+        result.error = '文件大小差异过大 ({} bytes)'.format(result.size_diff)
+        return result
+    result.valid = True
+    return result
+
+
+def parse_file(path: str, with_payload: bool = False,
+               layout: Optional[Dict[str, Any]] = None) -> EbitdoParseResult:
+    """解析单个文件；with_payload为False时只读取开头HEADER_READ_SIZE字节"""
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            data = f.read() if with_payload else f.read(HEADER_READ_SIZE)
+    except OSError as e:
+        result = EbitdoParseResult(path)
+        result.error = str(e)
+        return result
+    return parse_firmware_data(data, size, path, with_payload, layout)
+
+
+def parse_many(paths: Iterable[str], with_payload: bool = False, jobs: int = 1,
+               layout_for=None) -> List[EbitdoParseResult]:
+    """
+    批量解析，用于整个固件库的校验
+    默认每个文件只读取头部和文件大小；jobs大于1时用线程池并行读取
+    layout_for(path) 返回文件所属产品的布局 (如HeaderLayoutIndex.layout_for)，返回None的文件仍逐个尝试固定格式
+    """
+    paths = list(paths)
+
+    def parse(path):
+        return parse_file(path, with_payload, layout_for(path) if layout_for else None)
+
+    if jobs > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(parse, paths))
+    return [parse(path) for path in paths]
+
+
+def find_firmware_files(paths: Iterable[str]) -> List[str]:
+    """展开目录，返回其中所有.dat文件；不存在的路径直接跳过 (调用方按“未找到.dat文件”处理)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.dat'))
+        elif os.path.exists(path):
+            files.append(path)
+    return files
+
+
 class FwupdEbitdoParser:
     """
     基于fwupd逻辑的8BitDo固件解析器
@@ -175,6 +353,20 @@ class FwupdEbitdoParser:
         self.payload_data = b''
         self.output_dir = os.path.join(os.path.dirname(firmware_path), 'fwupd_parsed')
     
+    def parse(self) -> EbitdoParseResult:
+        """无副作用的解析: 不输出、不创建目录，返回结构化结果"""
+        try:
+            with open(self.firmware_path, 'rb') as f:
+                self.data = f.read()
+        except OSError as e:
+            result = EbitdoParseResult(self.firmware_path)
+            result.error = str(e)
+            return result
+        result = parse_firmware_data(self.data, path=self.firmware_path)
+        self.header = result.header
+        self.payload_data = result.payload
+        return result
+
     def load_firmware(self) -> bool:
         """
         加载固件文件
@@ -220,7 +412,7 @@ class FwupdEbitdoParser:
         print(f"  差异: {abs(payload_len - expected_len)} bytes")
         
         # 允许一定的差异（可能是填充或对齐）
-        if abs(payload_len - expected_len) > 200:
+        if abs(payload_len - expected_len) > MAX_PAYLOAD_DIFF:
             print(f"错误: 文件大小差异过大")
             return False
         
@@ -387,9 +579,29 @@ class FwupdEbitdoParser:
         except Exception as e:
             print(f"生成报告失败: {e}")
 
+def check_main(paths: List[str]):
+    """批量校验模式: 只解析头部并验证大小，不写任何文件"""
+    import time
+    files = find_firmware_files(paths)
+    start_time = time.time()
+    results = parse_many(files)
+    elapsed = time.time() - start_time
+
+    invalid = [result for result in results if not result.valid]
+    print(f"已校验 {len(results)} 个固件文件，耗时 {elapsed:.3f}s ({len(results) / max(elapsed, 1e-9):.0f} 个/秒)")
+    print(f"有效: {len(results) - len(invalid)}，无效: {len(invalid)}")
+    for result in invalid:
+        print(f"  ✗ {result.path}: {result.error}")
+    sys.exit(1 if invalid else 0)
+
+
 def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == '--check':
+        check_main(sys.argv[2:])
+
     if len(sys.argv) != 2:
         print(f"用法: python3 {sys.argv[0]} <固件文件路径>")
+        print(f"       python3 {sys.argv[0]} --check <固件文件或目录>...")
         print(f"")
         print(f"基于fwupd ebitdo插件的8BitDo固件解析器")
         print(f"实现与fwupd相同的解析逻辑")
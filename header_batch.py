@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件头部批量处理
+把 FirmwareHeaderAnalyzer / Sub100006CCAAnalyzer 中逐字节、逐个头部的逻辑改为对
+(文件数 × 28) 头部矩阵的数组运算:
+1. xmmword_10002F030 字节重排 (_mm_shuffle_epi8) 用花式索引一次作用于所有行
+2. check_firmware_support 对PID、固件类型、子类型向量整体求值
+3. 所有固件 × 所有设备配置的兼容性一次调用得到
+"""
+
+import sys
+import time
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from firmware_header_analyzer import FirmwareHeaderAnalyzer
+from fwupd_ebitdo_parser import find_firmware_files
+
+HEADER_SIZE = 28
+
+_analyzer = FirmwareHeaderAnalyzer()
+SHUFFLE_PATTERN = _analyzer.shuffle_pattern
+FIRMWARE_TYPE_261 = _analyzer.FIRMWARE_TYPE_261
+PID_THRESHOLD_LOW = _analyzer.PID_THRESHOLD_LOW
+PID_THRESHOLD_HIGH = _analyzer.PID_THRESHOLD_HIGH
+PID_SPECIAL = _analyzer.PID_SPECIAL
+MAGIC_1 = _analyzer.MAGIC_1
+MAGIC_2 = _analyzer.MAGIC_2
+
+# 子类型未知 (check_firmware_support的firmware_subtype=None) 在向量中用-1表示
+SUBTYPE_NONE = -1
+
+
+def load_headers(paths):
+    """把每个文件的前28字节读入 (N × 28) uint8矩阵，不足28字节的行在valid中为False"""
+    headers = np.zeros((len(paths), HEADER_SIZE), dtype=np.uint8)
+    valid = np.zeros(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            valid[i] = f.readinto(memoryview(headers[i])) == HEADER_SIZE
+    return headers, valid
+
+
+def batch_byte_shuffle(headers, pattern=SHUFFLE_PATTERN):
+    """
+    对每行的前16字节应用pshufb重排，其余字节不变
+    与_mm_shuffle_epi8相同: 索引最高位为1的位置清零，否则取低4位
+    """
+    headers = np.asarray(headers, dtype=np.uint8)
+    pattern = np.frombuffer(bytes(pattern), dtype=np.uint8)
+    shuffled = headers.copy()
+    lanes = headers[:, :16][:, pattern & 0x0F]
+    lanes[:, (pattern & 0x80) != 0] = 0
+    shuffled[:, :16] = lanes
+    return shuffled
+
+
+def header_pids(headers):
+    """parse_header_fields的PID: 每行字节0-1 (小端)"""
+    headers = np.asarray(headers, dtype=np.uint8)
+    return headers[:, 0].astype(np.int64) | (headers[:, 1].astype(np.int64) << 8)
+
+
+def batch_check_firmware_support(pid, firmware_type, firmware_subtype):
+    """
+    check_firmware_support的向量版本，参数可以是标量或可广播的数组
+    firmware_subtype为SUBTYPE_NONE的位置与传入None相同 (不做子类型检查)
+    返回布尔数组
+    """
+    pid = np.asarray(pid, dtype=np.int64)
+    firmware_type = np.asarray(firmware_type, dtype=np.int64)
+    firmware_subtype = np.asarray(firmware_subtype, dtype=np.int64)
+
+    checked = (firmware_type == FIRMWARE_TYPE_261) & (firmware_subtype != SUBTYPE_NONE)
+    # 子类型2: PID >= 0x1F6 (pid != 502 or pid < 0x10000 对16位PID恒为真，保留与原逻辑一致)
+    subtype_2_ok = (firmware_subtype == 2) & (pid >= PID_THRESHOLD_HIGH) & ((pid != PID_SPECIAL) | (pid < 0x10000))
+    high_subtype = firmware_subtype > 1
+    rejected = checked & np.where(high_subtype, ~subtype_2_ok, pid <= PID_THRESHOLD_LOW)
+    return ~rejected
+
+
+def magic_mask(device_vid, device_pid):
+    """check_magic_numbers的向量版本: 需要字节重排的设备"""
+    return (np.asarray(device_pid) == MAGIC_1) & (np.asarray(device_vid) == MAGIC_2)
+
+
+def profile_array(profiles):
+    """设备配置列表 [(vid, pid, 固件类型, 子类型)] -> 结构化数组，子类型None记为SUBTYPE_NONE"""
+    dtype = np.dtype([('vid', '<u2'), ('pid', '<u2'), ('firmware_type', '<i4'), ('firmware_subtype', '<i4')])
+    return np.array([(vid, pid, firmware_type, SUBTYPE_NONE if subtype is None else subtype)
+                     for vid, pid, firmware_type, subtype in profiles], dtype=dtype)
+
+
+def compatibility_matrix(headers, profiles, valid=None):
+    """
+    所有固件 × 所有设备配置的兼容性，一次广播计算
+    返回 (supported[N, M], shuffle[M])；shuffle为True的配置在发送前对头部做字节重排
+    (兼容性检查在重排之前进行，与sub_100006CCA的顺序一致)
+    """
+    profiles = profiles if isinstance(profiles, np.ndarray) else profile_array(profiles)
+    pid = header_pids(headers)[:, None]
+    supported = batch_check_firmware_support(pid, profiles['firmware_type'][None, :],
+                                             profiles['firmware_subtype'][None, :])
+    if valid is not None:
+        supported &= np.asarray(valid, dtype=bool)[:, None]
+    return supported, magic_mask(profiles['vid'], profiles['pid'])
+
+
+def default_profiles():
+    """分析脚本中使用的测试设备，再对每个设备组合所有固件类型/子类型"""
+    devices = [(MAGIC_2, MAGIC_1), (1234, 5678)]
+    profiles = []
+    for vid, pid in devices:
+        for firmware_type in (FIRMWARE_TYPE_261, 100):
+            for subtype in (None, 0, 1, 2, 3):
+                profiles.append((vid, pid, firmware_type, subtype))
+    return profiles
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("用法: python3 {} [固件文件或目录]...".format(sys.argv[0]))
+        sys.exit(1)
+
+    if not HAS_NUMPY:
+        print("错误: 需要安装 numpy")
+        sys.exit(1)
+
+    files = find_firmware_files(sys.argv[1:] or ['firmware_downloads', 'releases'])
+    if not files:
+        print("错误: 未找到.dat文件")
+        sys.exit(1)
+
+    start_time = time.time()
+    headers, valid = load_headers(files)
+    load_time = time.time() - start_time
+
+    profiles = profile_array(default_profiles())
+    start_time = time.perf_counter()
+    shuffled = batch_byte_shuffle(headers)
+    supported, shuffle = compatibility_matrix(headers, profiles, valid)
+    batch_time = time.perf_counter() - start_time
+
+    # 与逐个调用的原实现比较
+    start_time = time.perf_counter()
+    mismatches = 0
+    for i in range(len(files)):
+        header = headers[i].tobytes()
+        if _analyzer.apply_byte_shuffle(header) != shuffled[i].tobytes():
+            mismatches += 1
+        for j, profile in enumerate(profiles):
+            subtype = None if profile['firmware_subtype'] == SUBTYPE_NONE else int(profile['firmware_subtype'])
+            ok = _analyzer.check_firmware_support(header, int(profile['firmware_type']), subtype)[0]
+            if ok != bool(supported[i, j]) and valid[i]:
+                mismatches += 1
+    scalar_time = time.perf_counter() - start_time
+
+    print("=== 头部批量处理 ===")
+    print("文件数: {} (读取耗时 {:.3f}s)，设备配置: {}".format(len(files), load_time, len(profiles)))
+    print("批量重排 + 兼容性矩阵: {:.3f}ms".format(batch_time * 1000))
+    print("逐个调用原实现: {:.3f}ms (不一致 {})".format(scalar_time * 1000, mismatches))
+    print("\n每个设备配置支持的固件数:")
+    for j, profile in enumerate(profiles):
+        subtype = '-' if profile['firmware_subtype'] == SUBTYPE_NONE else profile['firmware_subtype']
+        print("  VID 0x{:04X} PID 0x{:04X} 类型 {:>3} 子类型 {}: {:>4}/{}{}".format(
+            profile['vid'], profile['pid'], profile['firmware_type'], subtype,
+            int(supported[:, j].sum()), len(files), ' (字节重排)' if shuffle[j] else ''))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按产品推断固件头部布局
+对每个产品目录的所有版本做统计: 哪个字段加上固定头部长度恰好等于文件大小 (载荷长度)、
+哪个字段等于版本号×100、哪个字段在各版本间保持不变 (目标地址)。
+推断结果缓存在一个小的JSON索引中，之后解析直接按布局读取，不再逐个尝试固定格式
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+from collections import defaultdict
+
+from fwupd_ebitdo_parser import parse_many, find_firmware_files
+
+INDEX_FORMAT = 1
+
+# 候选字段: 偏移 0..60 (4字节对齐)，小端/大端32位
+FIELD_FORMATS = ('<I', '>I')
+FIELD_OFFSETS = range(0, 64, 4)
+SAMPLE_SIZE = 64
+
+# 头部长度的合理范围
+MAX_HEADER_SIZE = 1024
+
+
+def read_samples(files):
+    """读取每个文件的开头和大小"""
+    samples = []
+    for path in files:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(SAMPLE_SIZE)
+        version = os.path.basename(os.path.dirname(path))
+        samples.append({'path': path, 'size': size, 'head': head, 'version': version})
+    return samples
+
+
+def field_value(head, offset, fmt):
+    if len(head) < offset + struct.calcsize(fmt):
+        return None
+    return struct.unpack_from(fmt, head, offset)[0]
+
+
+def version_number(name):
+    """目录名 -> 版本号×100 (5.099999904632568 -> 510)"""
+    try:
+        return int(round(float(name) * 100))
+    except ValueError:
+        return None
+
+
+def length_candidates(samples):
+    """所有版本都满足 文件大小 - 字段值 = 同一个头部长度 的 (偏移, 格式, 头部长度)"""
+    candidates = []
+    for offset in FIELD_OFFSETS:
+        for fmt in FIELD_FORMATS:
+            diffs = set()
+            for sample in samples:
+                value = field_value(sample['head'], offset, fmt)
+                diffs.add(None if value is None else sample['size'] - value)
+                if len(diffs) > 1:
+                    break
+            if len(diffs) == 1:
+                diff = diffs.pop()
+                if diff is not None and offset + 4 <= diff <= MAX_HEADER_SIZE:
+                    candidates.append((offset, fmt, diff))
+    return candidates
+
+
+def matching_fields(samples, expected):
+    """所有版本中值都等于expected(sample)的 (偏移, 格式)"""
+    matches = []
+    for offset in FIELD_OFFSETS:
+        for fmt in FIELD_FORMATS:
+            if all(expected(sample) is not None and field_value(sample['head'], offset, fmt) == expected(sample)
+                   for sample in samples):
+                matches.append((offset, fmt))
+    return matches
+
+
+def constant_fields(samples):
+    """各版本间保持不变的非零字段"""
+    fields = []
+    for offset in FIELD_OFFSETS:
+        values = {field_value(sample['head'], offset, '<I') for sample in samples}
+        if len(values) == 1 and values.pop() not in (None, 0):
+            fields.append(offset)
+    return fields
+
+
+class HeaderLayoutIndex:
+    def __init__(self, index_path='header_layouts.json'):
+        self.index_path = index_path
+        self.root = None
+        self.layouts = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('format') == INDEX_FORMAT:
+            self.root = index.get('root')
+            self.layouts = index.get('layouts', {})
+
+    def save(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'format': INDEX_FORMAT, 'root': self.root, 'layouts': self.layouts},
+                      f, indent=1, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+
+    @staticmethod
+    def product_of(path, root):
+        """产品目录 = 固件文件的上两级目录 (产品/版本/文件.dat)，相对于固件根目录"""
+        return os.path.relpath(os.path.dirname(os.path.dirname(os.path.abspath(path))), os.path.abspath(root))
+
+    @staticmethod
+    def signature(samples):
+        """版本目录和文件大小的摘要，产品新增或替换版本后重新推断"""
+        return sorted('{}:{}'.format(sample['version'], sample['size']) for sample in samples)
+
+    def build(self, firmware_dir='firmware_downloads'):
+        """推断所有产品的布局，只重新计算签名有变化的产品"""
+        self.root = os.path.abspath(firmware_dir)
+        groups = defaultdict(list)
+        for path in find_firmware_files([firmware_dir]):
+            groups[self.product_of(path, firmware_dir)].append(path)
+
+        samples = {product: read_samples(files) for product, files in groups.items()}
+        changed = [product for product in samples
+                   if self.layouts.get(product, {}).get('signature') != self.signature(samples[product])]
+
+        # 先统计多版本产品的候选，作为只有一个版本的产品的先验
+        support = defaultdict(int)
+        per_product = {product: length_candidates(group) for product, group in samples.items()}
+        for product, candidates in per_product.items():
+            if len(samples[product]) > 1:
+                for candidate in candidates:
+                    support[candidate] += 1
+
+        for product in changed:
+            self.layouts[product] = self.infer(samples[product], per_product[product], support)
+        for product in set(self.layouts) - set(samples):
+            del self.layouts[product]
+        return changed
+
+    def infer(self, samples, candidates, support):
+        layout = {'signature': self.signature(samples), 'versions': len(samples)}
+
+        if candidates:
+            # 优先选多版本产品中最常见的，其次偏移最小的
+            offset, fmt, header_size = max(candidates, key=lambda c: (support.get(c, 0), -c[0], c[1] == '<I'))
+            layout['payload_len'] = [offset, fmt]
+            layout['header_size'] = header_size
+            layout['confidence'] = 'consistent' if len(samples) > 1 else ('prior' if support.get(
+                (offset, fmt, header_size)) else 'single')
+        else:
+            # 没有字段能解释文件大小: 取最常见的头部长度，载荷到文件末尾
+            # 这种布局无法校验文件大小，解析结果标记为未验证
+            common = max(support, key=support.get) if support else (8, '<I', 28)
+            layout['payload_len'] = None
+            layout['header_size'] = common[2]
+            layout['confidence'] = 'fallback'
+
+        versions = matching_fields(samples, lambda sample: version_number(sample['version']))
+        layout['version'] = list(versions[0]) if versions else None
+
+        used = {layout['payload_len'][0] if layout['payload_len'] else None,
+                layout['version'][0] if layout['version'] else None}
+        addresses = [offset for offset in constant_fields(samples)
+                     if offset not in used and offset < layout['header_size']]
+        layout['dest_addr'] = [addresses[0], '<I'] if addresses else None
+        return layout
+
+    def layout_for(self, path):
+        """按文件路径返回缓存的布局 (不在索引中时返回None)"""
+        if self.root is None:
+            return None
+        return self.layouts.get(self.product_of(path, self.root))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('build', 'show', 'check'):
+        print("用法: python3 {} build [固件目录] [索引文件]".format(sys.argv[0]))
+        print("       python3 {} show [索引文件]".format(sys.argv[0]))
+        print("       python3 {} check [固件目录] [索引文件]".format(sys.argv[0]))
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = sys.argv[2:]
+
+    if command == 'show':
+        index = HeaderLayoutIndex(args[0] if args else 'header_layouts.json')
+        for product, layout in sorted(index.layouts.items()):
+            print("{:<32} 头部 {:>4} 字节, 载荷长度 {}, 版本 {}, 目标地址 {} ({}, {} 个版本)".format(
+                product, layout['header_size'], layout['payload_len'] or '未知 (未验证)', layout['version'],
+                layout['dest_addr'], layout['confidence'], layout['versions']))
+        return
+
+    firmware_dir = args[0] if args else 'firmware_downloads'
+    index = HeaderLayoutIndex(args[1] if len(args) > 1 else 'header_layouts.json')
+    if not os.path.isdir(firmware_dir):
+        print("错误: 目录不存在 - {}".format(firmware_dir))
+        sys.exit(1)
+
+    if command == 'build':
+        start_time = time.time()
+        changed = index.build(firmware_dir)
+        index.save()
+        counts = defaultdict(int)
+        for layout in index.layouts.values():
+            counts[layout['confidence']] += 1
+        print("布局索引已更新: {} ({} 个产品, 重新推断 {}, 耗时 {:.3f}s)".format(
+            index.index_path, len(index.layouts), len(changed), time.time() - start_time))
+        print("置信度: {}".format(dict(counts)))
+        return
+
+    # check: 对比固定格式逐个尝试与按推断布局解析的结果
+    if not index.layouts:
+        print("错误: 索引为空，请先运行 build - {}".format(index.index_path))
+        sys.exit(1)
+    files = find_firmware_files([firmware_dir])
+    start_time = time.time()
+    fixed = parse_many(files)
+    fixed_time = time.time() - start_time
+    start_time = time.time()
+    learned = parse_many(files, layout_for=index.layout_for)
+    learned_time = time.time() - start_time
+
+    print("固定格式: {}/{} 有效 ({:.3f}s)".format(sum(r.valid for r in fixed), len(files), fixed_time))
+    unchecked = [r for r in learned if not r.size_checked]
+    print("推断布局: {}/{} 有效, {} 未验证 ({:.3f}s)".format(
+        sum(r.valid for r in learned), len(files), len(unchecked), learned_time))
+    for result in learned:
+        if not result.valid:
+            print("  {} {}: {}".format('?' if not result.size_checked else '✗', result.path, result.error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件头部列式表
+把所有固件的前N字节读入一个连续的 (文件数 × N) 数组，用NumPy结构化dtype
+(字段带偏移、itemsize等于行长度) 零拷贝地一次解码所有头部布局，
+得到header_len、dest_addr、payload_len、pid等列，整个固件库的查询都变成数组运算
+"""
+
+import os
+import re
+import sys
+import time
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from fwupd_ebitdo_parser import EbitdoHeader, MAX_PAYLOAD_DIFF, find_firmware_files
+
+# 每个文件读取的开头字节数，覆盖最长的头部格式 (125字节)
+ROW_SIZE = 128
+
+# struct格式字符 -> NumPy类型
+STRUCT_TO_NUMPY = {'B': 'u1', 'H': 'u2', 'I': 'u4', 'Q': 'u8', 'b': 'i1', 'h': 'i2', 'i': 'i4', 'q': 'i8'}
+
+# FirmwareHeaderAnalyzer.parse_header_fields 的字段 (名称, 偏移, 类型)
+ANALYZER_FIELDS = [
+    ('pid', 0, '<u2'),
+    ('bytes_2_3', 2, '<u2'),
+    ('bytes_4_7', 4, '<u4'),
+    ('bytes_8_11', 8, '<u4'),
+    ('bytes_12_15', 12, '<u4'),
+]
+
+
+def struct_fields(fmt, names):
+    """把struct格式 (如 '<IIII109s') 转换为 (名称, 偏移, NumPy类型) 列表"""
+    order = '>' if fmt[0] in '>!' else '<'
+    fields = []
+    offset = 0
+    for (count, code), name in zip(re.findall(r'(\d*)([a-zA-Z])', fmt.lstrip('<>!=@')), names):
+        if code == 's':
+            size = int(count or 1)
+            fields.append((name, offset, 'S{}'.format(size)))
+        else:
+            dtype = np.dtype(order + STRUCT_TO_NUMPY[code])
+            size = dtype.itemsize * int(count or 1)
+            fields.append((name, offset, dtype.str if not count else (dtype.str, int(count))))
+        offset += size
+    return fields
+
+
+def layout_dtype(fields, row_size=ROW_SIZE):
+    """
+    构造itemsize等于行长度的结构化dtype，可以直接覆盖在 (N × row_size) 的缓冲区上
+    允许字段重叠 (如header_len与pid都从偏移0开始)
+    """
+    return np.dtype({
+        'names': [name for name, offset, dtype in fields],
+        'formats': [dtype for name, offset, dtype in fields],
+        'offsets': [offset for name, offset, dtype in fields],
+        'itemsize': row_size,
+    })
+
+
+def corpus_layouts(row_size=ROW_SIZE):
+    """EbitdoHeader.HEADER_FORMATS中的每种布局加上分析器的PID布局，各自对应一个dtype"""
+    layouts = {}
+    for index, fmt_info in enumerate(EbitdoHeader.HEADER_FORMATS):
+        fields = struct_fields(fmt_info['format'], fmt_info['fields'])
+        layouts['ebitdo_{}'.format(index + 1)] = layout_dtype(fields, row_size)
+    layouts['analyzer'] = layout_dtype(ANALYZER_FIELDS, row_size)
+    return layouts
+
+
+class HeaderTable:
+    def __init__(self, paths, row_size=ROW_SIZE):
+        self.paths = list(paths)
+        self.row_size = row_size
+        self.buffer = np.zeros((len(self.paths), row_size), dtype=np.uint8)
+        self.file_size = np.zeros(len(self.paths), dtype=np.int64)
+        self.read_size = np.zeros(len(self.paths), dtype=np.int32)
+        self.columns = {}
+
+    def load(self):
+        """把每个文件的开头直接读入共享缓冲区的对应行 (readinto，无中间bytes对象)"""
+        for i, path in enumerate(self.paths):
+            with open(path, 'rb') as f:
+                self.file_size[i] = os.fstat(f.fileno()).st_size
+                self.read_size[i] = f.readinto(memoryview(self.buffer[i]))
+        self.decode()
+        return self
+
+    def decode(self):
+        """用所有布局的dtype覆盖同一缓冲区，每个字段成为一列"""
+        records = {}
+        for name, dtype in corpus_layouts(self.row_size).items():
+            records[name] = self.buffer.reshape(-1).view(dtype)
+
+        # 所有ebitdo布局的前4个字段相同，取格式1即可；格式2的扩展字段单独成列
+        base = records['ebitdo_1']
+        columns = {
+            'header_len': base['header_len'],
+            'dest_addr': base['dest_addr'],
+            'payload_len': base['payload_len'],
+            'reserved': base['reserved'],
+        }
+        for field in records['ebitdo_2'].dtype.names[4:]:
+            columns[field] = records['ebitdo_2'][field]
+        for field in records['analyzer'].dtype.names:
+            columns[field] = records['analyzer'][field]
+
+        columns['file_size'] = self.file_size
+        # 与EbitdoHeader._validate_header_values和大小校验相同的规则，一次作用于整列
+        header_len = columns['header_len'].astype(np.int64)
+        payload_len = columns['payload_len'].astype(np.int64)
+        columns['header_ok'] = ((header_len >= 16) & (header_len <= 1024)
+                                & (payload_len >= 1000) & (payload_len <= 100000)
+                                & (self.read_size >= 16))
+        effective_header = np.where((header_len > 0) & (header_len <= self.file_size), header_len, 16)
+        columns['size_diff'] = np.abs(self.file_size - effective_header - payload_len)
+        columns['valid'] = columns['header_ok'] & (columns['size_diff'] <= MAX_PAYLOAD_DIFF)
+
+        self.records = records
+        self.columns = columns
+        return columns
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def select(self, mask):
+        """返回mask为真的文件路径"""
+        return [self.paths[i] for i in np.flatnonzero(mask)]
+
+    def value_counts(self, name, top=10):
+        """某列的取值分布，按次数降序"""
+        values, counts = np.unique(self.columns[name], return_counts=True)
+        order = np.argsort(-counts, kind='stable')[:top]
+        return [(values[i].item(), int(counts[i])) for i in order]
+
+    def save(self, path):
+        """保存为.npz (列 + 路径)"""
+        np.savez_compressed(path, paths=np.array(self.paths), raw=self.buffer,
+                            file_size=self.file_size, read_size=self.read_size)
+
+    @classmethod
+    def open(cls, path):
+        data = np.load(path)
+        table = cls(data['paths'].tolist(), data['raw'].shape[1])
+        table.buffer = np.ascontiguousarray(data['raw'])
+        table.file_size = data['file_size']
+        table.read_size = data['read_size']
+        table.decode()
+        return table
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("用法: python3 {} [固件文件或目录]... [--save 表格.npz]".format(sys.argv[0]))
+        sys.exit(1)
+
+    if not HAS_NUMPY:
+        print("错误: 需要安装 numpy")
+        sys.exit(1)
+
+    args = sys.argv[1:]
+    save_path = None
+    if '--save' in args:
+        index = args.index('--save')
+        save_path = args[index + 1] if index + 1 < len(args) else 'header_table.npz'
+        del args[index:index + 2]
+
+    files = find_firmware_files(args or ['firmware_downloads', 'releases'])
+    if not files:
+        print("错误: 未找到.dat文件")
+        sys.exit(1)
+
+    start_time = time.time()
+    table = HeaderTable(files).load()
+    elapsed = time.time() - start_time
+
+    print("=== 固件头部列式表 ===")
+    print("文件数: {}，每行 {} 字节，加载+解码耗时 {:.3f}s".format(len(table), table.row_size, elapsed))
+    print("头部格式校验通过: {}/{}".format(int(table['header_ok'].sum()), len(table)))
+    print("大小校验通过: {}/{}".format(int(table['valid'].sum()), len(table)))
+
+    for name, fmt in (('header_len', '{}'), ('dest_addr', '0x{:08X}'), ('payload_len', '{}'), ('pid', '0x{:04X}')):
+        print("\n{} 分布 (前10):".format(name))
+        for value, count in table.value_counts(name):
+            print("  {:<12} {} 个文件".format(fmt.format(value), count))
+
+    if save_path:
+        table.save(save_path)
+        print("\n表格已保存: {}".format(save_path))
+
+
+if __name__ == "__main__":
+    main()
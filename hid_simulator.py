@@ -0,0 +1,640 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+8BitDo bootloader HID设备模拟器
+在进程内模拟升级模式下的控制器 (VirtualBootloader)，并按反编译出的主机端逻辑
+(sub_1000076C6 / sub_100006F09 / sub_100006CCA / flashfirmware) 驱动完整的升级流程:
+
+  设备: 版本报告 (状态4)          主机: setReport3206(151, 26, 0)
+  设备: 信息报告 (25, ID和固件类型)  主机: sub_100006CCA 兼容性检查 + 28字节头部 (标志1)
+  设备: 就绪 (状态20)              主机: 32字节数据帧 (标志0)，每收到一次就绪发送下一块
+  ...                             主机: 最后一块之后立即发送校验码 (标志6)
+  设备: 就绪 (状态20)              主机: 结束 (标志2)
+
+设备可以按概率或按帧序号注入NAK (状态21) 和超时 (丢弃整帧不回应)，
+时间使用虚拟时钟 (每个报告的传输时间、设备擦写时间)，不需要硬件也不需要真实等待
+"""
+
+import sys
+import time
+import struct
+import random
+
+from fwupd_ebitdo_parser import find_firmware_files
+from sub_100006CCA_analysis import Sub100006CCAAnalyzer
+
+REPORT_SIZE = 64
+REPORT_ID = 151            # flashfirmware和setReport3206只处理 a2 == 151 (-105)
+MAGIC_PREFIX = 0x81        # 2DC8:3206 的报告整体后移一字节，首字节为0x81 (-127)
+FRAME_MARK = 0x16          # 帧头 00 16 (v26 = 5632)
+FRAME_HEADER_SIZE = 7      # 00 16 长度+3(2字节) 标志 长度(2字节)
+MAX_FRAME_DATA = 1017      # __memcpy_chk(&v31, data, len, 1017)
+HEADER_SIZE = 28
+CHUNK_SIZE = 32            # sub_100006F09 每次read:maxLength:的长度
+
+# flashfirmware的标志 (a3)
+FLAG_DATA = 0
+FLAG_HEADER = 1
+FLAG_END = 2
+FLAG_VERIFY = 6
+
+# setReport3206的命令 (a3)
+CMD_GET_INFO = 26
+
+# 设备输入报告: 00 <类别> ... ，类别22为状态 (sub_100006F09)，25为设备信息 (sub_100006BBC)
+REPORT_STATUS = 22
+REPORT_INFO = 25
+STATUS_VERSION = 4
+STATUS_READY = 20
+STATUS_NAK = 21
+STATUS_FAILED = 24
+
+# sub_100006B20使用的校验表: dword_100049E40[0..3] 以及紧随其后的12个双字
+# (xmmword_100049E50 在 +[SHIDBoot load] 中被替换为 xmmword_10002F020)
+VERIFY_TABLE = (
+    0x186976E5, 0xCAC67ACD, 0x38F27FEE, 0x0A4948F1,
+    0xB75B7753, 0x1F8FFA5C, 0xBFF8CF43, 0xC4936167,
+    0x92BD03F0, 0x5573C6ED, 0x57D8845B, 0x827197AC,
+    0xB91901C9, 0x3917EDFE, 0xBCD6344F, 0xCF9E23B5,
+)
+
+# 设备信息中固件种类 (dword_10004A3AC) 的允许值，2DC8:3206 固定为200
+FIRMWARE_KINDS = (200, 1)
+
+# 虚拟时钟参数 (秒)
+DEFAULT_TIMING = {
+    'report_time': 0.001,           # 每个64字节输出报告 (全速中断端点, bInterval=1)
+    'ack_time': 0.001,              # 设备回应在下一次IN轮询到达
+    'erase_time_per_kb': 0.002,     # 收到头部后按固件长度擦除
+    'write_time_per_byte': 0.000005,
+}
+
+_analyzer = Sub100006CCAAnalyzer()
+MAGIC_VID = _analyzer.MAGIC_VID
+MAGIC_PID = _analyzer.MAGIC_PID
+SHUFFLE_PATTERN = _analyzer.xmmword_10002F030
+
+
+def is_magic(vid, pid):
+    """checkPIDVIDIS3206"""
+    return vid == MAGIC_VID and pid == MAGIC_PID
+
+
+def pad_report(data, magic):
+    """补齐为64字节报告；2DC8:3206 在前面加0x81，原报告最后一个字节被挤掉"""
+    data = bytes(data)
+    if magic:
+        data = bytes([MAGIC_PREFIX]) + data
+    return data[:REPORT_SIZE].ljust(REPORT_SIZE, b'\x00')
+
+
+def strip_report(report, magic):
+    return report[1:] if magic else report
+
+
+def encode_frame(flag, data, magic):
+    """flashfirmware中v26开始的帧: 00 16 (len+3) flag len data，2DC8:3206 多发送一个字节"""
+    if not data:
+        return bytes([0x00, FRAME_MARK, 1, 0, flag])
+    if len(data) > MAX_FRAME_DATA:
+        raise ValueError('帧数据超过{}字节: {}'.format(MAX_FRAME_DATA, len(data)))
+    size = len(data) + 3
+    frame = bytes([0x00, FRAME_MARK, size & 0xFF, size >> 8, flag]) + struct.pack('<H', len(data)) + bytes(data)
+    return frame + b'\x00' if magic else frame
+
+
+def frame_size(field, magic):
+    """由帧头中的 len+3 字段得到整帧长度 (v11)"""
+    return field + 4 + (1 if magic and field > 1 else 0)
+
+
+def report_payload_size(magic):
+    """数据帧每个报告最多携带 v7 | 0x20 字节"""
+    return (FRAME_HEADER_SIZE + (1 if magic else 0)) | 0x20
+
+
+def max_report_payload(magic):
+    """64字节报告去掉计数字节 (和0x81前缀) 后最多能携带的帧字节数"""
+    return REPORT_SIZE - 1 - (1 if magic else 0)
+
+
+def frame_reports(flag, data, magic, step=None):
+    """
+    flashfirmware: 标志非0时整帧放在一个报告中 (最多63字节)，
+    标志0时按 v7|0x20 字节切分为多个报告，每个报告首字节为本报告携带的字节数
+    step: 数据帧每个报告携带的字节数，默认与flashfirmware相同
+    """
+    frame = encode_frame(flag, data, magic)
+    if flag != FLAG_DATA:
+        return [pad_report(bytes([len(frame)]) + frame[:REPORT_SIZE - 1], magic)]
+    step = min(step or report_payload_size(magic), max_report_payload(magic))
+    return [pad_report(bytes([len(frame[offset:offset + step])]) + frame[offset:offset + step], magic)
+            for offset in range(0, len(frame), step)]
+
+
+def command_report(cmd, arg=0, vid=0, pid=0):
+    """setReport3206(a1, 151, cmd, arg): [6, 0, cmd, 01 00, arg]，2DC8:9018 首字节为5"""
+    first = 5 if (vid, pid) == (MAGIC_VID, 0x9018) else 6
+    return pad_report(bytes([first, 0, cmd, 1, 0, arg]), is_magic(vid, pid))
+
+
+def input_report(kind, body, magic):
+    return pad_report(bytes([0x00, kind]) + struct.pack('<H', len(body)) + bytes(body), magic)
+
+
+def status_report(code, body=b'', magic=False):
+    return input_report(REPORT_STATUS, bytes([code]) + bytes(body), magic)
+
+
+def version_report(version, beta=0, magic=False):
+    """a3[0] = 4，a3[3..4] 为版本号 (×100)，a3[5] 为beta"""
+    return status_report(STATUS_VERSION, b'\x00\x00' + struct.pack('<HB', version, beta), magic)
+
+
+def info_report(ids, firmware_type, firmware_subtype, kind, magic=False):
+    """sub_100006BBC: a2[0..11] 为设备ID，a2+36 的双字为 类型<<16 | 子类型<<8 | 种类"""
+    word = ((firmware_type & 0xFFFF) << 16) | ((firmware_subtype & 0xFF) << 8) | (kind & 0xFF)
+    return input_report(REPORT_INFO, bytes(ids).ljust(36, b'\x00') + struct.pack('<I', word), magic)
+
+
+def parse_input(report, magic):
+    """sub_1000076C6: 返回 (类别, 内容)，内容从 v3[v6+4] 开始；不是00开头的报告返回None"""
+    report = strip_report(report, magic)
+    if report[0] != 0:
+        return None
+    return report[1], report[4:]
+
+
+def verify_code(ids):
+    """sub_100006B20: 三个ID双字分别与 VERIFY_TABLE[该双字最低字节 & 0xF] 异或"""
+    words = struct.unpack('<3I', bytes(ids[:12]))
+    return struct.pack('<3I', *(VERIFY_TABLE[word & 0x0F] ^ word for word in words))
+
+
+def firmware_compatible(pid, firmware_type, firmware_subtype):
+    """sub_100006CCA的兼容性检查 (check_firmware_compatibility，不输出)，False对应LABEL_14"""
+    if firmware_type != _analyzer.FIRMWARE_TYPE_261:
+        return True
+    if firmware_subtype > 1:
+        if firmware_subtype != 2:
+            return True
+        return pid >= _analyzer.PID_THRESHOLD_HIGH and (pid != _analyzer.PID_SPECIAL or pid < 0x10000)
+    return pid > _analyzer.PID_THRESHOLD_LOW
+
+
+def header_for_device(header, magic):
+    """
+    sub_100006CCA实际发送的28字节:
+    2DC8:3206 为前16字节按xmmword_10002F030重排 + 原始字节16-27；
+    其他设备为 xmmword_10004A350 还原出的字节0-11 (版本、地址、长度)，其余16字节是未初始化的栈 (这里为0)
+    """
+    header = bytes(header[:HEADER_SIZE])
+    if magic:
+        return bytes(header[i] for i in SHUFFLE_PATTERN) + header[16:]
+    return header[:12] + bytes(16)
+
+
+class VirtualBootloader:
+    """
+    升级模式下的8BitDo控制器
+    firmware_type: 设备信息中的固件类型，默认0 (不做兼容性检查，与命令行默认值相同)；261时按子类型检查头部PID
+    faults: {帧序号: 'nak' | 'timeout'}，帧序号从0开始 (头部、数据、校验帧统一计数；
+    结束帧没有回应，主机无法重发，不注入故障)
+    early_ack: 收到数据帧后先回应就绪再写入 (双缓冲)，写入与下一帧的传输重叠；
+    缓冲区被上一次写入占用时回应推迟到写入完成
+    """
+
+    def __init__(self, vid=0x2DC8, pid=0xAB11, version=100, beta=0, firmware_type=0, firmware_subtype=1,
+                 kind=200, ids=None, flash_size=0x100000, nak_rate=0.0, timeout_rate=0.0, faults=None,
+                 seed=0, timing=None, early_ack=False):
+        self.vid = vid
+        self.pid = pid
+        self.magic = is_magic(vid, pid)
+        self.version = version
+        self.beta = beta
+        self.firmware_type = firmware_type
+        self.firmware_subtype = firmware_subtype
+        self.kind = kind
+        self.rng = random.Random(seed)
+        self.ids = bytes(ids) if ids is not None else bytes(self.rng.getrandbits(8) for _ in range(12))
+        self.flash_size = flash_size
+        self.nak_rate = nak_rate
+        self.timeout_rate = timeout_rate
+        self.faults = dict(faults or {})
+        self.timing = dict(DEFAULT_TIMING, **(timing or {}))
+        self.early_ack = early_ack
+        self.reset()
+
+    def reset(self):
+        self.state = 'detached'
+        self.rx = bytearray()
+        self.header = None
+        self.payload_len = 0
+        self.image = bytearray()
+        self.backlog = 0.0
+        self.stats = {'reports': 0, 'frames': 0, 'naks': 0, 'timeouts': 0, 'ignored': 0}
+
+    @property
+    def flashed(self):
+        return self.state == 'done'
+
+    def attach(self):
+        """设备枚举后主动发送版本报告"""
+        self.reset()
+        self.state = 'version'
+        return version_report(self.version, self.beta, self.magic)
+
+    def transfer(self, reports):
+        """
+        依次处理主机的输出报告，返回 (输入报告列表, 虚拟耗时)
+        耗时包括报告传输、设备擦写以及回应到达的时间；没有回应时只计传输时间
+        """
+        responses = []
+        elapsed = 0.0
+        for report in reports:
+            elapsed += self.timing['report_time']
+            self.backlog = max(0.0, self.backlog - self.timing['report_time'])
+            reply, busy = self.set_report(report)
+            elapsed += busy
+            if reply is not None:
+                responses.append(reply)
+        if responses:
+            elapsed += self.timing['ack_time']
+            self.backlog = max(0.0, self.backlog - self.timing['ack_time'])
+        return responses, elapsed
+
+    def write(self, size):
+        """写入size字节，返回回应前需要等待的时间 (early_ack时只等待上一次写入)"""
+        busy = size * self.timing['write_time_per_byte']
+        if not self.early_ack:
+            return busy
+        wait, self.backlog = self.backlog, busy
+        return wait
+
+    def set_report(self, report):
+        """IOHIDDeviceSetReport的设备端，返回 (回应或None, 处理耗时)"""
+        self.stats['reports'] += 1
+        data = strip_report(bytes(report), self.magic)
+        if not self.rx:
+            if data[0] in (5, 6) and data[1] == 0 and data[2] == CMD_GET_INFO:
+                return self.handle_command(data[2])
+            if data[1] != 0 or data[2] != FRAME_MARK:
+                self.stats['ignored'] += 1
+                return None, 0.0
+        self.rx += data[1:1 + data[0]]
+        if len(self.rx) < 4:
+            return None, 0.0
+        size = frame_size(self.rx[2] | (self.rx[3] << 8), self.magic)
+        if len(self.rx) < size:
+            return None, 0.0
+        frame = bytes(self.rx[:size])
+        self.rx.clear()
+        return self.handle_frame(frame)
+
+    def handle_command(self, cmd):
+        if self.state != 'version':
+            self.stats['ignored'] += 1
+            return None, 0.0
+        self.state = 'header'
+        word_kind = 200 if self.magic else self.kind
+        return info_report(self.ids, self.firmware_type, self.firmware_subtype, word_kind, self.magic), 0.0
+
+    def next_fault(self):
+        index = self.stats['frames']
+        self.stats['frames'] += 1
+        if index in self.faults:
+            return self.faults[index]
+        draw = self.rng.random()
+        if draw < self.timeout_rate:
+            return 'timeout'
+        if draw < self.timeout_rate + self.nak_rate:
+            return 'nak'
+        return None
+
+    def handle_frame(self, frame):
+        flag = frame[4]
+        length = struct.unpack('<H', frame[5:7])[0] if len(frame) >= FRAME_HEADER_SIZE else 0
+        data = frame[FRAME_HEADER_SIZE:FRAME_HEADER_SIZE + length]
+        fault = self.next_fault() if flag != FLAG_END else None
+        if fault == 'timeout':
+            self.stats['timeouts'] += 1
+            return None, 0.0
+        if fault == 'nak':
+            self.stats['naks'] += 1
+            return status_report(STATUS_NAK, magic=self.magic), 0.0
+
+        if flag == FLAG_HEADER and self.state == 'header':
+            return self.handle_header(data)
+        if flag == FLAG_DATA and self.state == 'payload':
+            stored = data[:self.payload_len - len(self.image)]
+            self.image += stored
+            busy = self.write(len(stored))
+            if len(self.image) < self.payload_len:
+                return status_report(STATUS_READY, magic=self.magic), busy
+            # 最后一块之后主机直接发送校验码，不等待就绪
+            self.state = 'verify'
+            return None, busy
+        if flag == FLAG_VERIFY and self.state == 'verify':
+            if data != verify_code(self.ids):
+                self.state = 'failed'
+                return status_report(STATUS_FAILED, magic=self.magic), 0.0
+            # 校验前等待所有写入完成
+            busy, self.backlog = self.backlog, 0.0
+            self.state = 'end'
+            return status_report(STATUS_READY, magic=self.magic), busy
+        if flag == FLAG_END and self.state == 'end':
+            # 设备重启进入应用程序，不再回应
+            self.state = 'done'
+            return None, 0.0
+        # 状态不符的帧 (例如重发时已经收到的最后一块) 直接丢弃
+        self.stats['ignored'] += 1
+        return None, 0.0
+
+    def handle_header(self, data):
+        if len(data) < 12:
+            self.state = 'failed'
+            return status_report(STATUS_FAILED, magic=self.magic), 0.0
+        # 2DC8:3206 收到的是按双字反序的头部
+        fmt = '>3I' if self.magic else '<3I'
+        version, dest_addr, payload_len = struct.unpack(fmt, data[:12])
+        if payload_len == 0 or payload_len > self.flash_size:
+            self.state = 'failed'
+            return status_report(STATUS_FAILED, magic=self.magic), 0.0
+        self.header = {'version': version, 'dest_addr': dest_addr, 'payload_len': payload_len}
+        self.payload_len = payload_len
+        self.image = bytearray()
+        self.state = 'payload'
+        busy = payload_len / 1024.0 * self.timing['erase_time_per_kb']
+        return status_report(STATUS_READY, magic=self.magic), busy
+
+
+class FlashSession:
+    """
+    主机端状态机 (dword_10004A3A8): 只处理报告，不关心传输方式，
+    FlashSimulator在虚拟时钟上驱动它，也可以由其他传输层驱动
+    handle()/timeout() 返回接下来要发送的输出报告列表
+    """
+
+    def __init__(self, firmware, vid, pid, chunk_size=CHUNK_SIZE, max_retries=3, name=None, report_payload=None):
+        if isinstance(firmware, (bytes, bytearray)):
+            self.data = bytes(firmware)
+            self.name = name or '<memory>'
+        else:
+            with open(firmware, 'rb') as f:
+                self.data = f.read()
+            self.name = name or firmware
+        self.vid = vid
+        self.pid = pid
+        self.magic = is_magic(vid, pid)
+        self.chunk_size = min(chunk_size, MAX_FRAME_DATA)
+        self.report_payload = report_payload
+        self.max_retries = max_retries
+        self.state = 0
+        self.error = None
+        self.retryable = False
+        self.done = False
+        self.device_version = None
+        self.ids = None
+        self.total = 0
+        self.sent = 0
+        self.offset = HEADER_SIZE
+        self.pending = []
+        self.attempts = 0
+        self.stats = {'frames': 0, 'retries': 0, 'naks': 0, 'timeouts': 0}
+
+    @property
+    def finished(self):
+        return self.done or self.error is not None
+
+    @property
+    def progress(self):
+        return self.sent / self.total if self.total else 0.0
+
+    def check_image(self, image):
+        """设备写入的镜像是否与固件负载一致"""
+        return bytes(image) == self.data[HEADER_SIZE:HEADER_SIZE + self.total]
+
+    def fail(self, error, retryable=False):
+        """retryable: 通信错误 (NAK或无回应次数用完)，重新连接后可以整体重试"""
+        self.error = error
+        self.retryable = retryable
+        self.pending = []
+        return []
+
+    def send(self, frames):
+        """frames: [(标志, 数据)]，作为一批发送，NAK或超时时整批重发"""
+        return self.send_reports([report for flag, data in frames
+                                  for report in frame_reports(flag, data, self.magic, self.report_payload)], len(frames))
+
+    def send_reports(self, reports, frames=1):
+        self.pending = reports
+        self.attempts = 0
+        self.stats['frames'] += frames
+        return reports
+
+    def retry(self, reason):
+        if not self.pending:
+            return self.fail(reason)
+        if self.attempts >= self.max_retries:
+            return self.fail('{} (重试{}次后)'.format(reason, self.attempts), retryable=True)
+        self.attempts += 1
+        self.stats['retries'] += 1
+        return self.pending
+
+    def timeout(self):
+        if self.finished:
+            return []
+        self.stats['timeouts'] += 1
+        return self.retry('设备无回应')
+
+    def handle(self, report):
+        if self.finished:
+            return []
+        parsed = parse_input(report, self.magic)
+        if parsed is None:
+            return []
+        kind, body = parsed
+        if kind == REPORT_INFO:
+            return self.handle_info(body)
+        if kind != REPORT_STATUS:
+            return []
+
+        code = body[0]
+        if code == STATUS_VERSION:
+            self.device_version = struct.unpack('<H', body[3:5])[0]
+            return [command_report(CMD_GET_INFO, 0, self.vid, self.pid)]
+        if code == STATUS_NAK:
+            self.stats['naks'] += 1
+            return self.retry('设备返回NAK (状态21)')
+        if code == STATUS_FAILED:
+            return self.fail('设备返回失败 (状态24)')
+        if code != STATUS_READY:
+            return []
+
+        if self.state == 1:
+            self.state = 2
+            return self.send_chunk()
+        if self.state == 2:
+            return self.send_chunk()
+        if self.state == 3:
+            self.state = 4
+            self.done = True
+            self.pending = []
+            return self.end_reports()
+        return []
+
+    def accept_info(self, body, header_pid):
+        """sub_100006BBC: 记录设备ID，并对固件头部的PID做兼容性检查；失败时设置error并返回False"""
+        self.ids = bytes(body[:12])
+        word = struct.unpack('<I', body[36:40])[0]
+        firmware_type, firmware_subtype, kind = word >> 16, (word >> 8) & 0xFF, word & 0xFF
+        if not self.magic and kind not in FIRMWARE_KINDS:
+            self.fail('不支持的固件种类 {}'.format(kind))
+        elif not firmware_compatible(header_pid, firmware_type, firmware_subtype):
+            self.fail('固件不支持 (类型{}, 子类型{}, PID 0x{:04X})'.format(firmware_type, firmware_subtype, header_pid))
+        return self.error is None
+
+    def end_reports(self):
+        return frame_reports(FLAG_END, b'', self.magic)
+
+    def handle_info(self, body):
+        """sub_100006BBC + sub_100006CCA"""
+        if self.state != 0:
+            return []
+        if len(self.data) < HEADER_SIZE:
+            return self.fail('头部长度不足28字节')
+        header = self.data[:HEADER_SIZE]
+        if not self.accept_info(body, struct.unpack('<H', header[0:2])[0]):
+            return []
+        # DWORD1(xmmword_10004A350): 头部字节8-11
+        self.total = struct.unpack('<I', header[8:12])[0]
+        self.state = 1
+        return self.send([(FLAG_HEADER, header_for_device(header, self.magic))])
+
+    def send_chunk(self):
+        """sub_100006F09 状态1/2: 读一块发送，发送完毕后紧接着发送校验码并进入状态3"""
+        chunk = self.data[self.offset:self.offset + self.chunk_size]
+        if not chunk:
+            return self.fail('固件数据不足: 头部长度 {}，实际 {}'.format(self.total, self.sent))
+        self.offset += len(chunk)
+        self.sent += len(chunk)
+        frames = [(FLAG_DATA, chunk)]
+        if self.sent >= self.total:
+            frames.append((FLAG_VERIFY, verify_code(self.ids)))
+            self.state = 3
+        return self.send(frames)
+
+
+class FlashSimulator:
+    """在虚拟时钟上让FlashSession和VirtualBootloader互相收发报告"""
+
+    def __init__(self, device, session, ack_timeout=0.1):
+        self.device = device
+        self.session = session
+        self.ack_timeout = ack_timeout
+
+    def run(self):
+        session = self.session
+        device = self.device
+        elapsed = 0.0
+        inbox = [device.attach()]
+        while not session.finished:
+            if inbox:
+                outgoing = session.handle(inbox.pop(0))
+            else:
+                elapsed += self.ack_timeout
+                outgoing = session.timeout()
+            if outgoing:
+                responses, busy = device.transfer(outgoing)
+                elapsed += busy
+                inbox.extend(responses)
+        return self.result(elapsed)
+
+    def result(self, elapsed):
+        session = self.session
+        device = self.device
+        image_ok = device.flashed and session.check_image(device.image)
+        error = session.error
+        if error is None and not image_ok:
+            error = '设备镜像与固件不一致' if device.flashed else '设备未完成升级 ({})'.format(device.state)
+        return {
+            'name': session.name,
+            'success': error is None,
+            'error': error,
+            'elapsed': elapsed,
+            'bytes': session.sent,
+            'frames': session.stats['frames'],
+            'reports': device.stats['reports'],
+            'retries': session.stats['retries'],
+            'naks': device.stats['naks'],
+            'timeouts': device.stats['timeouts'],
+        }
+
+
+def simulate_flash(path, device=None, max_retries=3, ack_timeout=0.1, chunk_size=CHUNK_SIZE, report_payload=None):
+    device = device or VirtualBootloader()
+    session = FlashSession(path, device.vid, device.pid, chunk_size=chunk_size, max_retries=max_retries,
+                           report_payload=report_payload)
+    return FlashSimulator(device, session, ack_timeout).run()
+
+
+def main():
+    options = {'--device': '2DC8:AB11', '--type': '0', '--subtype': '1', '--nak-rate': '0',
+               '--timeout-rate': '0', '--seed': '0', '--retries': '3', '--ack-timeout': '0.1'}
+    args = []
+    argv = sys.argv[1:]
+    while argv:
+        arg = argv.pop(0)
+        if arg in options and argv:
+            options[arg] = argv.pop(0)
+        elif arg.startswith('-'):
+            args = None
+            break
+        else:
+            args.append(arg)
+
+    if args is None:
+        print("用法: python3 {} [固件文件或目录]... [--device VID:PID] [--type 类型] [--subtype 子类型]".format(
+            sys.argv[0]))
+        print("       [--nak-rate 概率] [--timeout-rate 概率] [--seed 种子] [--retries 次数] [--ack-timeout 秒]")
+        sys.exit(1)
+
+    from metainfo_index import parse_device
+    device_id = parse_device(options['--device'])
+    if device_id is None:
+        print("错误: 无效的设备 - {}".format(options['--device']))
+        sys.exit(1)
+
+    files = find_firmware_files(args or ['firmware_downloads'])
+    if not files:
+        print("错误: 未找到.dat文件")
+        sys.exit(1)
+
+    vid, pid = device_id
+    print("=== 模拟升级: VID 0x{:04X} PID 0x{:04X} 类型 {} 子类型 {}{} ===".format(
+        vid, pid, options['--type'], options['--subtype'], ' (字节重排)' if is_magic(vid, pid) else ''))
+    start_time = time.time()
+    totals = {'success': 0, 'failed': 0, 'elapsed': 0.0, 'reports': 0, 'retries': 0}
+    for i, path in enumerate(files):
+        device = VirtualBootloader(vid, pid, firmware_type=int(options['--type']),
+                                   firmware_subtype=int(options['--subtype']),
+                                   nak_rate=float(options['--nak-rate']), timeout_rate=float(options['--timeout-rate']),
+                                   seed=int(options['--seed']) + i)
+        result = simulate_flash(path, device, int(options['--retries']), float(options['--ack-timeout']))
+        totals['success' if result['success'] else 'failed'] += 1
+        for key in ('elapsed', 'reports', 'retries'):
+            totals[key] += result[key]
+        status = '✓' if result['success'] else '✗ {}'.format(result['error'])
+        print("{} {}: {} bytes, {} 个报告, 重试 {} (NAK {}, 超时 {}), 虚拟耗时 {:.3f}s".format(
+            status, path, result['bytes'], result['reports'], result['retries'], result['naks'],
+            result['timeouts'], result['elapsed']))
+
+    print("\n成功 {}/{}，共 {} 个报告，重试 {}，虚拟耗时 {:.3f}s (实际 {:.3f}s)".format(
+        totals['success'], len(files), totals['reports'], totals['retries'], totals['elapsed'],
+        time.time() - start_time))
+    if totals['failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
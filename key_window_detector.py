@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对称密钥窗口检测工具
+使用NumPy步进视图和前缀和一次性计算整个镜像上16/24/32字节窗口的熵值、
+不同字节数和重复度，输出按评分排序的AES/HMAC密钥候选位置
+"""
+
+import os
+import sys
+import time
+import binascii
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+class KeyWindowDetector:
+    # 窗口大小 -> 对应的密钥类型
+    WINDOW_TYPES = {
+        16: 'AES-128',
+        24: 'AES-192',
+        32: 'AES-256_HMAC',
+    }
+
+    def __init__(self, data, window_sizes=(16, 24, 32), step=4, context=128):
+        self.data = data
+        self.window_sizes = tuple(window_sizes)
+        self.step = step          # 窗口起点步长，固件中的密钥通常按4字节对齐
+        self.context = context    # 计算周边平均评分的范围 (字节)
+        self.arr = np.frombuffer(data, dtype=np.uint8)
+        self._prefix_cache = {}
+        self._gap = None
+
+    def _prefix(self, key, mask):
+        """返回布尔数组的前缀和，用于O(1)求任意窗口内的计数"""
+        if key not in self._prefix_cache:
+            prefix = np.zeros(len(mask) + 1, dtype=np.int32)
+            np.cumsum(mask, out=prefix[1:])
+            self._prefix_cache[key] = prefix
+        return self._prefix_cache[key]
+
+    def _window_counts(self, key, mask, starts, length):
+        """统计每个窗口[start, start+length)中mask为真的数量"""
+        prefix = self._prefix(key, mask)
+        return prefix[starts + length] - prefix[starts]
+
+    def _next_gap(self):
+        """
+        每个字节到下一个相同字节的距离 (最大255)
+        窗口内某位置的字节是"最后一次出现"当且仅当该距离超出窗口末尾
+        """
+        if self._gap is None:
+            arr = self.arr
+            order = np.argsort(arr, kind='stable')
+            nxt = np.full(len(arr), len(arr) + 255, dtype=np.int64)
+            same = arr[order[1:]] == arr[order[:-1]]
+            nxt[order[:-1][same]] = order[1:][same]
+            gap = np.minimum(nxt - np.arange(len(arr)), 255).astype(np.uint8)
+            self._gap = np.concatenate([gap, np.full(64, 255, dtype=np.uint8)])
+        return self._gap
+
+    def window_stats(self, window):
+        """
+        计算所有窗口的廉价统计量 (全部基于前缀和与步进视图，无逐窗口排序)
+        返回 (起点, 不同字节数, 重复度, 零/FF比例)
+        """
+        arr = self.arr
+        starts = np.arange(0, max(len(arr) - window + 1, 0), self.step)
+        count = len(starts)
+
+        # 不同字节数 = 窗口内"在窗口剩余部分不再出现"的位置数
+        gap = self._next_gap()
+        distinct = np.zeros(count, dtype=np.int32)
+        for j in range(window):
+            distinct += gap[j::self.step][:count] >= window - j
+
+        # 重复度: 窗口内与距离d处字节相同的比例，取d=1/2/4中的最大值
+        repetition = np.zeros(count)
+        for distance in (1, 2, 4):
+            same = np.zeros(len(arr), dtype=bool)
+            same[:-distance] = arr[distance:] == arr[:-distance]
+            counts = self._window_counts(('same', distance), same, starts, window - distance)
+            repetition = np.maximum(repetition, counts / (window - distance))
+
+        padding = self._window_counts('pad', (arr == 0x00) | (arr == 0xFF), starts, window) / window
+
+        return starts, distinct, repetition, padding
+
+    def window_entropy(self, starts, window):
+        """
+        计算指定窗口的香农熵
+        窗口按行排序后，每个元素在相同字节段中的序号k满足
+        sum(c*log2(c)) = sum(f(k) - f(k-1))，f(k) = k*log2(k)
+        """
+        if len(starts) == 0:
+            return np.zeros(0)
+        windows = self.arr[starts[:, None] + np.arange(window)]
+        ordered = np.sort(windows, axis=1, kind='stable')
+
+        new_run = np.empty(ordered.shape, dtype=bool)
+        new_run[:, 0] = True
+        np.not_equal(ordered[:, 1:], ordered[:, :-1], out=new_run[:, 1:])
+
+        index = np.arange(window, dtype=np.int32)
+        run_start = np.maximum.accumulate(np.where(new_run, index, 0), axis=1)
+        rank = index - run_start + 1
+
+        k = np.arange(window + 1, dtype=np.float64)
+        f = np.zeros(window + 1)
+        f[1:] = k[1:] * np.log2(k[1:])
+        increments = np.zeros(window + 1)
+        increments[1:] = f[1:] - f[:-1]
+        return np.log2(window) - increments[rank].sum(axis=1) / window
+
+    def score_windows(self, window, min_distinct_ratio=0.75, max_repetition=0.25):
+        """
+        计算窗口的密钥评分
+        基础评分 = 不同字节比例 × (1 - 重复度) × (1 - 填充比例)，减去周边窗口的
+        平均基础评分，使嵌在代码/常量中的高熵块更突出；只有通过廉价过滤的窗口
+        才计算熵值并乘以熵值比例 (以最大窗口的熵上限归一化，重叠时优先较长的密钥)
+        返回 (起点, 评分, 熵值, 不同字节数, 重复度)，只包含通过过滤的窗口
+        """
+        starts, distinct, repetition, padding = self.window_stats(window)
+        if len(starts) == 0:
+            empty = np.zeros(0)
+            return starts, empty, empty, distinct, repetition
+
+        base = (distinct / window) * (1 - repetition) * (1 - padding)
+
+        radius = max(1, self.context // self.step)
+        prefix = np.zeros(len(base) + 1)
+        np.cumsum(base, out=prefix[1:])
+        position = np.arange(len(base))
+        lo = np.clip(position - radius, 0, len(base))
+        hi = np.clip(position + radius + 1, 0, len(base))
+        neighbourhood = (prefix[hi] - prefix[lo] - base) / np.maximum(hi - lo - 1, 1)
+
+        keep = np.flatnonzero((distinct >= min_distinct_ratio * window) & (repetition <= max_repetition))
+        entropy = self.window_entropy(starts[keep], window)
+        score = base[keep] * (entropy / np.log2(max(self.window_sizes))) + (base[keep] - neighbourhood[keep])
+
+        return starts[keep], score, entropy, distinct[keep], repetition[keep]
+
+    def detect(self, top_n=32, min_entropy_ratio=0.9, min_distinct_ratio=0.75, max_repetition=0.25):
+        """
+        检测密钥候选位置
+        所有窗口大小的候选合并后按评分排序，重叠的候选只保留评分最高的一个
+        """
+        candidates = []
+        for window in self.window_sizes:
+            starts, score, entropy, distinct, repetition = self.score_windows(
+                window, min_distinct_ratio, max_repetition)
+            keep = entropy >= min_entropy_ratio * np.log2(window)
+            for i in np.flatnonzero(keep):
+                candidates.append((float(score[i]), int(starts[i]), window,
+                                   float(entropy[i]), int(distinct[i]), float(repetition[i])))
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        occupied = np.zeros(len(self.arr), dtype=bool)
+        results = []
+        for score, start, window, entropy, distinct, repetition in candidates:
+            end = start + window
+            if occupied[start:end].any():
+                continue
+            occupied[start:end] = True
+            results.append({
+                'type': 'POSSIBLE_{}_KEY'.format(self.WINDOW_TYPES.get(window, '{}B'.format(window))),
+                'start': start,
+                'end': end,
+                'size': window,
+                'score': round(score, 4),
+                'entropy': round(entropy, 3),
+                'distinct': distinct,
+                'repetition': round(repetition, 3),
+                'data': self.data[start:end]
+            })
+            if len(results) >= top_n:
+                break
+
+        return results
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python3 {} <文件路径> [候选数量]".format(sys.argv[0]))
+        sys.exit(1)
+
+    if not HAS_NUMPY:
+        print("错误: 需要安装 numpy")
+        sys.exit(1)
+
+    file_path = sys.argv[1]
+    if not os.path.exists(file_path):
+        print("错误: 文件不存在 - {}".format(file_path))
+        sys.exit(1)
+
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    print("文件加载成功，大小: {} bytes".format(len(data)))
+
+    start_time = time.time()
+    detector = KeyWindowDetector(data)
+    results = detector.detect(top_n=top_n)
+    elapsed = time.time() - start_time
+
+    print("\n=== 密钥窗口候选 (耗时 {:.3f}s) ===".format(elapsed))
+    for i, item in enumerate(results):
+        print("{:3d}. {}: 位置 0x{:08x}, 评分 {:.3f}, 熵值 {:.2f}, 不同字节 {}/{}, 重复度 {:.2f}".format(
+            i + 1, item['type'], item['start'], item['score'], item['entropy'],
+            item['distinct'], item['size'], item['repetition']))
+        print("     {}".format(binascii.hexlify(item['data']).decode()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metainfo.xml设备GUID索引
+用iterparse流式读取releases/下所有*.metainfo.xml，收集每个组件提供的固件GUID
+(<firmware type="flashed">) 及其前面注释中的USB实例ID (如 USB\\VID_2DC8&PID_AB11)，
+按fwupd的规则 (UUIDv5, DNS命名空间) 预先计算并缓存实例ID对应的GUID，
+建立 GUID -> (组件, 版本, 固件文件) 的哈希索引，插入设备后一次字典查找即可得到可用固件
+"""
+
+import io
+import os
+import re
+import sys
+import glob
+import json
+import time
+import uuid
+import xml.etree.ElementTree as ET
+
+INDEX_FORMAT = 1
+
+# 注释中的实例ID，后面可能跟说明 (如 "(old firmware)")
+INSTANCE_PATTERN = re.compile(r'USB\\VID_[0-9A-F]{4}&PID_[0-9A-F]{4}', re.I)
+
+# 没有转义的&，部分metainfo.xml中存在，appstream-util validate-relax同样会报错
+BARE_AMPERSAND = re.compile(rb'&(?!(?:[a-zA-Z]+|#[0-9]+|#x[0-9a-fA-F]+);)')
+
+
+def instance_id(vid, pid):
+    return 'USB\\VID_{:04X}&PID_{:04X}'.format(vid, pid)
+
+
+def guid_for(instance):
+    """fwupd_guid_hash_string: 以DNS命名空间对实例ID做UUIDv5"""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, instance))
+
+
+def version_key(version):
+    return tuple(int(part) if part.isdigit() else 0 for part in re.split(r'[.-]', version or '0'))
+
+
+def _iterparse(source):
+    return ET.iterparse(source, events=('start', 'end', 'comment'))
+
+
+def parse_metainfo(path):
+    """
+    流式解析一个metainfo.xml，返回组件字典
+    注释事件紧挨在对应的<firmware>之前，用它把GUID和实例ID配对；XML格式错误时转义多余的&后重试
+    """
+    try:
+        return _parse_events(_iterparse(path), path)
+    except ET.ParseError:
+        with open(path, 'rb') as f:
+            data = BARE_AMPERSAND.sub(b'&amp;', f.read())
+        component = _parse_events(_iterparse(io.BytesIO(data)), path)
+        component['repaired'] = True
+        return component
+
+
+def _parse_events(events, path):
+    component = {'metainfo': path, 'id': None, 'name': None, 'provides': [], 'releases': [], 'repaired': False}
+    stack = []
+    comment = None
+    release = None
+
+    for event, elem in events:
+        if event == 'comment':
+            match = INSTANCE_PATTERN.search(elem.text or '')
+            comment = match.group(0).upper() if match else None
+            continue
+        if event == 'start':
+            stack.append(elem.tag)
+            if elem.tag == 'release' and stack[-2:-1] == ['releases']:
+                release = {'version': elem.get('version'), 'date': elem.get('date'),
+                           'urgency': elem.get('urgency'), 'files': []}
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if elem.tag == 'id' and parent == 'component':
+            component['id'] = (elem.text or '').strip()
+        elif elem.tag == 'name' and parent == 'component':
+            component['name'] = (elem.text or '').strip()
+        elif elem.tag == 'firmware' and parent == 'provides' and elem.get('type') == 'flashed':
+            component['provides'].append({'guid': (elem.text or '').strip().lower(), 'instance_id': comment})
+            comment = None
+        elif elem.tag == 'checksum' and release is not None and elem.get('filename'):
+            if elem.get('filename') not in release['files']:
+                release['files'].append(elem.get('filename'))
+        elif elem.tag == 'release' and release is not None:
+            component['releases'].append(release)
+            release = None
+        # 已处理的子树不再需要，释放内存
+        if parent in ('component', 'provides', 'releases'):
+            elem.clear()
+    return component
+
+
+class MetainfoIndex:
+    def __init__(self, index_path='metainfo_index.json'):
+        self.index_path = index_path
+        self.files = {}
+        self.components = {}
+        self.guid_cache = {}
+        self.by_guid = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('format') == INDEX_FORMAT:
+            self.files = index['files']
+            self.components = index['components']
+            self.guid_cache = index['guid_cache']
+            self.build_lookup()
+
+    def save(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'format': INDEX_FORMAT, 'files': self.files, 'components': self.components,
+                       'guid_cache': self.guid_cache}, f, indent=1, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+
+    def guid(self, instance):
+        """实例ID -> GUID，只计算一次"""
+        guid = self.guid_cache.get(instance)
+        if guid is None:
+            guid = self.guid_cache[instance] = guid_for(instance)
+        return guid
+
+    def build(self, releases_dir='releases'):
+        """增量构建: 大小和修改时间都未变化的metainfo.xml不再解析"""
+        paths = sorted(glob.glob(os.path.join(releases_dir, '*', '*', '*.metainfo.xml')))
+        parsed = 0
+        for path in paths:
+            stat = os.stat(path)
+            signature = [stat.st_size, stat.st_mtime]
+            if self.files.get(path) == signature and path in self.components:
+                continue
+            component = parse_metainfo(path)
+            for provide in component['provides']:
+                if provide['instance_id']:
+                    self.guid(provide['instance_id'])
+            self.components[path] = component
+            self.files[path] = signature
+            parsed += 1
+
+        for path in set(self.components) - set(paths):
+            del self.components[path]
+            self.files.pop(path, None)
+        self.build_lookup()
+        return parsed
+
+    def build_lookup(self):
+        """GUID -> 条目列表 (新版本在前)"""
+        by_guid = {}
+        for path, component in self.components.items():
+            release_dir = os.path.dirname(path)
+            for release in component['releases']:
+                firmware = [os.path.join(release_dir, name) for name in release['files']]
+                entry = {'component': component['id'], 'name': component['name'], 'version': release['version'],
+                         'date': release['date'], 'firmware': firmware, 'metainfo': path}
+                for provide in component['provides']:
+                    by_guid.setdefault(provide['guid'], []).append(entry)
+        for entries in by_guid.values():
+            entries.sort(key=lambda entry: version_key(entry['version']), reverse=True)
+        self.by_guid = by_guid
+        return by_guid
+
+    def resolve(self, guid):
+        """GUID -> 可用固件列表 (新版本在前)"""
+        return self.by_guid.get(guid.lower(), [])
+
+    def resolve_device(self, vid, pid):
+        """插入设备的VID/PID -> 可用固件列表"""
+        return self.resolve(self.guid(instance_id(vid, pid)))
+
+    def mismatches(self):
+        """注释中的实例ID与列出的GUID不一致的条目"""
+        result = []
+        for path, component in sorted(self.components.items()):
+            for provide in component['provides']:
+                if provide['instance_id'] and self.guid(provide['instance_id']) != provide['guid']:
+                    result.append((path, provide['instance_id'], provide['guid']))
+        return result
+
+
+def parse_device(text):
+    """'2DC8:AB11'、'USB\\VID_2DC8&PID_AB11' 或GUID"""
+    match = INSTANCE_PATTERN.search(text)
+    if match:
+        vid, pid = re.findall(r'_([0-9A-Fa-f]{4})', match.group(0))
+        return int(vid, 16), int(pid, 16)
+    match = re.fullmatch(r'(?:0x)?([0-9A-Fa-f]{1,4}):(?:0x)?([0-9A-Fa-f]{1,4})', text)
+    if match:
+        return int(match.group(1), 16), int(match.group(2), 16)
+    return None
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('build', 'lookup', 'list'):
+        print("用法: python3 {} build [发布目录] [索引文件]".format(sys.argv[0]))
+        print("       python3 {} lookup <GUID|VID:PID|USB\\VID_xxxx&PID_xxxx> [索引文件]".format(sys.argv[0]))
+        print("       python3 {} list [索引文件]".format(sys.argv[0]))
+        sys.exit(1)
+
+    command = sys.argv[1]
+    args = sys.argv[2:]
+
+    if command == 'build':
+        releases_dir = args[0] if args else 'releases'
+        index = MetainfoIndex(args[1] if len(args) > 1 else 'metainfo_index.json')
+        if not os.path.isdir(releases_dir):
+            print("错误: 目录不存在 - {}".format(releases_dir))
+            sys.exit(1)
+        start_time = time.time()
+        parsed = index.build(releases_dir)
+        index.save()
+        print("索引已更新: {} ({} 个metainfo, 解析 {}, {} 个GUID, 耗时 {:.3f}s)".format(
+            index.index_path, len(index.components), parsed, len(index.by_guid), time.time() - start_time))
+        for path, component in sorted(index.components.items()):
+            if component['repaired']:
+                print("  警告: XML格式错误，已转义多余的& - {}".format(path))
+        for path, instance, guid in index.mismatches():
+            print("  警告: {} 的GUID {} 与 {} 不一致".format(path, guid, instance))
+        return
+
+    if command == 'lookup' and not args:
+        print("错误: 需要GUID或VID:PID")
+        sys.exit(1)
+    index_path = args[1 if command == 'lookup' else 0] if len(args) > (1 if command == 'lookup' else 0) \
+        else 'metainfo_index.json'
+    if not os.path.exists(index_path):
+        print("错误: 索引不存在，请先运行 build - {}".format(index_path))
+        sys.exit(1)
+    index = MetainfoIndex(index_path)
+
+    if command == 'list':
+        for guid, entries in sorted(index.by_guid.items(), key=lambda item: item[1][0]['component'] or ''):
+            instances = [instance for instance, cached in index.guid_cache.items() if cached == guid]
+            print("{} {} {} ({} 个版本, 最新 {})".format(
+                guid, entries[0]['component'], ', '.join(instances) or '-', len(entries), entries[0]['version']))
+        return
+
+    device = parse_device(args[0])
+    start_time = time.perf_counter()
+    entries = index.resolve_device(*device) if device else index.resolve(args[0])
+    elapsed = time.perf_counter() - start_time
+    if not entries:
+        print("未找到: {}".format(args[0]))
+        sys.exit(1)
+    print("{} -> {} 个版本 (查找耗时 {:.1f}µs)".format(args[0], len(entries), elapsed * 1e6))
+    for entry in entries:
+        print("  {} {} ({}) {}".format(entry['component'], entry['version'], entry['date'],
+                                       ', '.join(entry['firmware'])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+readme.txt元数据导入与校验工具
+并行读取firmware_downloads/中所有readme.txt，核对记录的文件大小和MD5与.dat文件是否一致，
+输出结构化目录 (JSON)，并为中英文更新日志建立倒排索引，支持关键词搜索
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from firmware_index import parse_readme, find_firmware_dirs, canonical_version
+
+CATALOG_FORMAT = 1
+
+
+def tokenize(text, query=False):
+    """
+    英文/数字按单词切分，中文按单字和相邻双字切分
+    查询时中文只用双字 (单个汉字时用单字)，减少无关命中
+    """
+    text = text.lower()
+    tokens = set(re.findall(r'[a-z0-9]+', text))
+    for run in re.findall(r'[\u4e00-\u9fff]+', text):
+        bigrams = {run[i:i + 2] for i in range(len(run) - 1)}
+        if query:
+            tokens.update(bigrams or {run})
+        else:
+            tokens.update(run)
+            tokens.update(bigrams)
+    return tokens
+
+
+def md5_file(path, chunk_size=4 * 1024 * 1024):
+    md5 = hashlib.md5()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+            size += len(chunk)
+    return md5.hexdigest(), size
+
+
+def ingest_one(readme_path, dat_path, firmware_dir):
+    """解析一个版本目录并校验大小和MD5"""
+    info = parse_readme(readme_path)
+    api = info['api'] or {}
+    actual_md5, actual_size = md5_file(dat_path)
+    raw_version = str(api.get('version', info['version'] or os.path.basename(os.path.dirname(dat_path))))
+    recorded_md5 = (info['md5'] or api.get('md5') or '').lower()
+    recorded_size = info['size'] if info['size'] is not None else api.get('fileSize')
+
+    return {
+        'product': api.get('fileName') or info['device_name'],
+        'type': api.get('type'),
+        'version': canonical_version(raw_version),
+        'raw_version': raw_version,
+        'date': api.get('date') or info['release_date'],
+        'beta': bool(api.get('beta')),
+        'path': os.path.relpath(dat_path, firmware_dir),
+        'size': recorded_size,
+        'actual_size': actual_size,
+        'md5': recorded_md5,
+        'actual_md5': actual_md5,
+        'size_ok': recorded_size == actual_size,
+        'md5_ok': recorded_md5 == actual_md5,
+        'changelog_zh': info['changelog_zh'],
+        'changelog_en': info['changelog_en'],
+        'downloads': info['downloads'],
+    }
+
+
+class ReadmeIngester:
+    def __init__(self, firmware_dir='firmware_downloads', jobs=None):
+        self.firmware_dir = firmware_dir
+        self.jobs = jobs or min(32, (os.cpu_count() or 1) * 4)
+        self.entries = []
+        self.index = {}
+
+    def ingest(self):
+        """并行处理所有版本目录 (hashlib在计算时释放GIL，线程池即可跑满磁盘)"""
+        pairs = find_firmware_dirs(self.firmware_dir)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = [pool.submit(ingest_one, readme, dat, self.firmware_dir) for readme, dat in pairs]
+            self.entries = [future.result() for future in futures]
+        self.entries.sort(key=lambda entry: (entry['type'] or 0, entry['product'] or '', float(entry['raw_version'])))
+        self.build_index()
+        return self.entries
+
+    def build_index(self):
+        """更新日志倒排索引: 词 -> 条目序号列表"""
+        index = {}
+        for i, entry in enumerate(self.entries):
+            text = '{}\n{}\n{}'.format(entry['product'], entry['changelog_zh'], entry['changelog_en'])
+            for token in tokenize(text):
+                index.setdefault(token, []).append(i)
+        self.index = index
+        return index
+
+    def search(self, query):
+        """返回更新日志中包含所有关键词的条目"""
+        terms = query.lower().split()
+        candidates = None
+        for token in tokenize(query, query=True):
+            postings = set(self.index.get(token, ()))
+            candidates = postings if candidates is None else candidates & postings
+        if not candidates:
+            return []
+        results = []
+        for i in sorted(candidates):
+            entry = self.entries[i]
+            text = '{}\n{}\n{}'.format(entry['product'], entry['changelog_zh'], entry['changelog_en']).lower()
+            if all(term in text for term in terms):
+                results.append(entry)
+        return results
+
+    def save(self, output_path):
+        tmp = output_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'format': CATALOG_FORMAT, 'firmware_dir': self.firmware_dir,
+                       'entries': self.entries, 'index': self.index}, f, ensure_ascii=False)
+        os.replace(tmp, output_path)
+
+    @classmethod
+    def load(cls, catalog_path):
+        with open(catalog_path, encoding='utf-8') as f:
+            catalog = json.load(f)
+        if catalog.get('format') != CATALOG_FORMAT:
+            raise ValueError('不支持的目录格式')
+        ingester = cls(catalog['firmware_dir'])
+        ingester.entries = catalog['entries']
+        ingester.index = catalog['index']
+        return ingester
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print("用法: python3 {} [固件目录] [输出文件]".format(sys.argv[0]))
+        print("       python3 {} search <关键词> [目录文件]".format(sys.argv[0]))
+        sys.exit(1)
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'search':
+        if len(sys.argv) < 3:
+            print("错误: 需要关键词")
+            sys.exit(1)
+        catalog_path = sys.argv[3] if len(sys.argv) > 3 else 'firmware_catalog.json'
+        if not os.path.exists(catalog_path):
+            print("错误: 目录文件不存在，请先运行导入 - {}".format(catalog_path))
+            sys.exit(1)
+        ingester = ReadmeIngester.load(catalog_path)
+        results = ingester.search(sys.argv[2])
+        print("搜索 \"{}\": {} 条结果\n".format(sys.argv[2], len(results)))
+        for entry in results:
+            print("{} {} ({})".format(entry['product'], entry['version'], entry['date']))
+            for line in (entry['changelog_zh'] + '\n' + entry['changelog_en']).splitlines():
+                if any(term in line.lower() for term in sys.argv[2].lower().split()):
+                    print("  " + line)
+        return
+
+    firmware_dir = sys.argv[1] if len(sys.argv) > 1 else 'firmware_downloads'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else 'firmware_catalog.json'
+    if not os.path.isdir(firmware_dir):
+        print("错误: 目录不存在 - {}".format(firmware_dir))
+        sys.exit(1)
+
+    start_time = time.time()
+    ingester = ReadmeIngester(firmware_dir)
+    entries = ingester.ingest()
+    elapsed = time.time() - start_time
+    ingester.save(output_path)
+
+    total_bytes = sum(entry['actual_size'] for entry in entries)
+    size_errors = [entry for entry in entries if not entry['size_ok']]
+    md5_errors = [entry for entry in entries if not entry['md5_ok']]
+
+    print("=== readme.txt 导入与校验 ===")
+    print("版本目录: {}".format(len(entries)))
+    print("校验数据: {} bytes, 耗时 {:.3f}s ({:.1f} MB/s, {} 线程)".format(
+        total_bytes, elapsed, total_bytes / max(elapsed, 1e-9) / (1024 * 1024), ingester.jobs))
+    print("大小一致: {}/{}".format(len(entries) - len(size_errors), len(entries)))
+    print("MD5一致: {}/{}".format(len(entries) - len(md5_errors), len(entries)))
+
+    for entry in size_errors:
+        print("  大小不一致: {} (记录 {}, 实际 {})".format(entry['path'], entry['size'], entry['actual_size']))
+    for entry in md5_errors[:10]:
+        print("  MD5不一致: {} (记录 {}, 实际 {})".format(entry['path'], entry['md5'], entry['actual_md5']))
+    if len(md5_errors) > 10:
+        print("  ... 另有 {} 个MD5不一致".format(len(md5_errors) - 10))
+
+    print("\n索引词条: {}".format(len(ingester.index)))
+    print("目录已保存: {}".format(output_path))
+
+
+if __name__ == "__main__":
+    main()
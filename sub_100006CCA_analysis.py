@@ -178,6 +178,15 @@ class Sub100006CCAAnalyzer:
         
         return shuffled, v13
     
+    def apply_byte_shuffle_batch(self, headers):
+        """
+        apply_byte_shuffle的批量版本: 对 (N × 28) 头部矩阵一次完成重排，不修改实例状态 (需要numpy)
+        返回 (重排后的矩阵, 每行的v13即字节12-15)
+        """
+        from header_batch import batch_byte_shuffle
+        shuffled = batch_byte_shuffle(headers, self.xmmword_10002F030)
+        return shuffled, shuffled[:, 12:16]
+    
     def simulate_sub_10002DF67(self, device_handle, cmd, flag, data_ptr, data_len):
         """
         模拟sub_10002DF67函数 - 数据传输函数
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+校验和求解器回归测试
+载荷长度不是对齐单位整数倍的文件 (非反射CRC-32尾部寄存器不在候选集合中时曾抛出KeyError)
+"""
+
+import os
+import sys
+import zlib
+import random
+import struct
+
+from checksum_solver import ChecksumSolver, BIT_REVERSE
+
+
+def bzip2_crc(data):
+    """CRC-32/BZIP2 (非反射)"""
+    crc = zlib.crc32(data.translate(BIT_REVERSE))
+    return int('{:032b}'.format(crc)[::-1], 2)
+
+
+def test_odd_length_random():
+    """随机数据，长度不是4的倍数"""
+    for length in (1001, 1002, 1003):
+        ChecksumSolver(os.urandom(length)).solve()
+
+
+def test_odd_length_tail_crc():
+    """头部中存放到文件末尾的CRC，区间长度不是4的倍数时仍能求出"""
+    rng = random.Random(0)
+    payload = bytes(rng.getrandbits(8) for _ in range(1003))
+    for algorithm, crc in (('CRC-32', zlib.crc32(payload)), ('CRC-32/BZIP2', bzip2_crc(payload))):
+        header = struct.pack('<I', crc) + bytes(rng.getrandbits(8) for _ in range(60))
+        matches = ChecksumSolver(header + payload).solve()
+        assert any(m['algorithm'] == algorithm and m['field_offset'] == 0 and m['start'] == 64 and
+                   m['end'] == 64 + len(payload) for m in matches), algorithm
+
+
+def test_no_narrow_sums_on_wide_fields():
+    """随机数据中，32位字段的小值不应被8位异或和/累加和命中"""
+    rng = random.Random(1)
+    for value in (1, 101, 255):
+        data = struct.pack('<I', value) + bytes(rng.getrandbits(8) for _ in range(8191))
+        matches = ChecksumSolver(data).solve()
+        narrow = [m for m in matches if m['width'] == 32 and m['algorithm'].lstrip('~-') in ('XOR8', 'SUM8')]
+        assert not narrow, value
+
+
+def test_sum8_in_wide_field():
+    """超出单元范围的8位累加和存在32位字段中仍能求出"""
+    rng = random.Random(2)
+    payload = bytes(rng.getrandbits(8) for _ in range(1024))
+    header = struct.pack('<I', sum(payload)) + bytes(rng.getrandbits(8) for _ in range(60))
+    matches = ChecksumSolver(header + payload).solve()
+    assert any(m['algorithm'] == 'SUM8' and m['width'] == 32 and m['field_offset'] == 0 and m['start'] == 64
+               for m in matches)
+
+
+def main():
+    failed = 0
+    for test in (test_odd_length_random, test_odd_length_tail_crc, test_no_narrow_sums_on_wide_fields,
+                 test_sum8_in_wide_field):
+        try:
+            test()
+            print("✓ {}".format(test.__name__))
+        except Exception as e:
+            failed += 1
+            print("✗ {}: {!r}".format(test.__name__, e))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+升级流程回归测试
+用虚拟设备把一个固件完整走一遍: 普通设备、需要字节重排的2DC8:3206、
+最后一个数据帧和校验帧上的NAK/超时重发、类型261子类型2的兼容性拒绝
+"""
+
+import os
+import sys
+import struct
+
+from hid_simulator import VirtualBootloader, simulate_flash, header_for_device, CHUNK_SIZE, HEADER_SIZE
+from flash_job import FlashJob
+from flash_orchestrator import FlashOrchestrator, SimulatedHandle
+
+FIRMWARE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'firmware_downloads', 'M30', '2',
+                        'firmware_v2.dat')
+
+
+def data_frame_count(path):
+    with open(path, 'rb') as f:
+        payload_len = struct.unpack('<I', f.read(HEADER_SIZE)[8:12])[0]
+    return -(-payload_len // CHUNK_SIZE)
+
+
+def test_normal_device():
+    device = VirtualBootloader()
+    result = simulate_flash(FIRMWARE, device)
+    assert result['success'], result['error']
+    assert result['retries'] == 0 and device.flashed
+
+
+def test_shuffled_device():
+    """2DC8:3206 收到的头部是重排过的，设备还原后镜像仍与固件一致"""
+    device = VirtualBootloader(0x2DC8, 0x3206)
+    assert device.magic
+    with open(FIRMWARE, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    assert header_for_device(header, True)[:16] != header[:16]
+    result = simulate_flash(FIRMWARE, device)
+    assert result['success'], result['error']
+
+
+def test_faults_on_last_frames():
+    """帧序号: 0为头部，1..n为数据帧，n+1为校验帧"""
+    last_data = data_frame_count(FIRMWARE)
+    for index in (last_data, last_data + 1):
+        for fault in ('nak', 'timeout'):
+            result = simulate_flash(FIRMWARE, VirtualBootloader(faults={index: fault}))
+            assert result['success'], (index, fault, result['error'])
+            assert result['retries'] == 1, (index, fault)
+            assert result[fault + 's'] == 1, (index, fault)
+
+
+def test_unsupported_firmware():
+    result = simulate_flash(FIRMWARE, VirtualBootloader(firmware_type=261, firmware_subtype=2))
+    assert not result['success']
+    assert result['error'].startswith('固件不支持'), result['error']
+    assert result['bytes'] == 0
+
+
+def test_compiled_jobs():
+    """预编译任务通过并发升级完成，编译设备不符的任务只让对应设备失败"""
+    job = FlashJob.compile(FIRMWARE, 0x2DC8, 0x3206)
+    handles = [SimulatedHandle(VirtualBootloader(0x2DC8, 0x3206, seed=i), time_scale=0.01) for i in range(2)]
+    results = FlashOrchestrator().run([(handle, job) for handle in handles])
+    assert all(result['success'] for result in results), results
+    results = FlashOrchestrator().run([(SimulatedHandle(VirtualBootloader(), time_scale=0.01), job),
+                                       (SimulatedHandle(VirtualBootloader(), time_scale=0.01), FIRMWARE)])
+    assert [result['success'] for result in results] == [False, True], results
+
+
+def main():
+    failed = 0
+    for test in (test_normal_device, test_shuffled_device, test_faults_on_last_frames, test_unsupported_firmware,
+                 test_compiled_jobs):
+        try:
+            test()
+            print("✓ {}".format(test.__name__))
+        except Exception as e:
+            failed += 1
+            print("✗ {}: {!r}".format(test.__name__, e))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,14 +7,21 @@ X.509证书和密钥提取工具
 
 import os
 import sys
-import re
 import binascii
 import struct
 from collections import OrderedDict
 
+from key_window_detector import KeyWindowDetector, HAS_NUMPY
+from crypto_constants import CryptoConstantScanner
+
 class X509Extractor:
-    def __init__(self, file_path):
+    # 常用算法OID (不含tag和长度)
+    OID_RSA_ENCRYPTION = b'\x2a\x86\x48\x86\xf7\x0d\x01\x01\x01'
+    OID_EC_PUBLIC_KEY = b'\x2a\x86\x48\xce\x3d\x02\x01'
+    
+    def __init__(self, file_path, max_der_depth=8):
         self.file_path = file_path
+        self.max_der_depth = max_der_depth  # DER嵌套结构校验深度
         self.data = None
         self.output_dir = os.path.join(os.path.dirname(file_path), 'x509_extracted')
         self.findings = OrderedDict()
@@ -84,98 +91,174 @@ class X509Extractor:
         return found_pem
     
     def search_der_certificates(self):
-        """搜索DER格式的证书和密钥"""
+        """
+        搜索DER格式的证书和密钥
+        对每个SEQUENCE候选直接在self.data上按偏移解析TLV，单次线性扫描完成
+        """
         print("\n=== 搜索DER格式证书和密钥 ===")
         
-        # ASN.1 DER编码的常见模式
-        der_patterns = [
-            # X.509证书通常以30 82开始 (SEQUENCE, length > 127)
-            (b'\x30\x82', 'X509_CERTIFICATE'),
-            # RSA公钥
-            (b'\x30\x0d\x06\x09\x2a\x86\x48\x86\xf7\x0d\x01\x01\x01', 'RSA_PUBLIC_KEY_OID'),
-            # RSA私钥
-            (b'\x30\x82.*\x02\x01\x00\x02\x82', 'RSA_PRIVATE_KEY_PATTERN'),
-            # ECDSA相关
-            (b'\x30\x13\x06\x07\x2a\x86\x48\xce\x3d\x02\x01', 'ECDSA_OID'),
-        ]
-        
+        data = self.data
+        data_len = len(data)
         found_der = []
-        for pattern, pattern_name in der_patterns:
-            if b'.*' in pattern:  # 正则表达式模式
-                matches = re.finditer(pattern, self.data, re.DOTALL)
-                for match in matches:
-                    start_pos = match.start()
-                    # 尝试解析ASN.1长度
-                    try:
-                        length = self._parse_asn1_length(self.data[start_pos:])
-                        if length and length < len(self.data) - start_pos:
-                            end_pos = start_pos + length
-                            found_der.append({
-                                'type': pattern_name,
-                                'start': start_pos,
-                                'end': end_pos,
-                                'size': length,
-                                'data': self.data[start_pos:end_pos]
-                            })
-                            print("✓ 发现 {}: 位置 0x{:08x}-0x{:08x}, 大小 {} bytes".format(
-                                pattern_name, start_pos, end_pos, length))
-                    except:
-                        continue
-            else:  # 简单字节模式
-                start_pos = 0
-                while True:
-                    pos = self.data.find(pattern, start_pos)
-                    if pos == -1:
-                        break
-                    
-                    # 尝试解析ASN.1结构
-                    try:
-                        length = self._parse_asn1_length(self.data[pos:])
-                        if length and length < 10000:  # 合理的长度限制
-                            end_pos = pos + length
-                            found_der.append({
-                                'type': pattern_name,
-                                'start': pos,
-                                'end': end_pos,
-                                'size': length,
-                                'data': self.data[pos:end_pos]
-                            })
-                            print("✓ 发现 {}: 位置 0x{:08x}-0x{:08x}, 大小 {} bytes".format(
-                                pattern_name, pos, end_pos, length))
-                    except:
-                        pass
-                    
-                    start_pos = pos + 1
+        
+        pos = data.find(b'\x30')
+        while pos != -1:
+            next_pos = pos + 1
+            tlv = self._read_tlv(pos, data_len)
+            if tlv is not None:
+                tag, content_start, end = tlv
+                der_type = self._classify_der(content_start, end)
+                if der_type and self._validate_der_tree(content_start, end, 1):
+                    size = end - pos
+                    found_der.append({
+                        'type': der_type,
+                        'start': pos,
+                        'end': end,
+                        'size': size,
+                        'data': data[pos:end]
+                    })
+                    print("✓ 发现 {}: 位置 0x{:08x}-0x{:08x}, 大小 {} bytes".format(
+                        der_type, pos, end, size))
+                    # 跳过已识别结构，内部的嵌套SEQUENCE不重复报告
+                    next_pos = end
+            pos = data.find(b'\x30', next_pos)
         
         self.findings['DER'] = found_der
         return found_der
     
-    def _parse_asn1_length(self, data):
-        """解析ASN.1 DER编码的长度字段"""
-        if len(data) < 2:
+    def _read_tlv(self, offset, limit):
+        """
+        在offset处解析一个DER TLV，不复制数据
+        返回 (tag, 内容起始偏移, 结束偏移)，不符合DER规则时返回None
+        """
+        data = self.data
+        if offset + 2 > limit:
             return None
         
-        # 跳过tag字节
-        offset = 1
-        length_byte = data[offset]
+        tag = data[offset]
+        # 不支持高标签号形式，固件中出现基本都是误报
+        if tag & 0x1f == 0x1f:
+            return None
         
+        length_byte = data[offset + 1]
+        offset += 2
         if length_byte & 0x80 == 0:
             # 短格式长度
-            return length_byte + offset + 1
+            length = length_byte
         else:
-            # 长格式长度
+            # 长格式长度；DER禁止不定长、前导零和可用短格式表示的长度
             length_bytes = length_byte & 0x7f
-            if length_bytes == 0 or length_bytes > 4:
+            if length_bytes == 0 or length_bytes > 4 or offset + length_bytes > limit:
                 return None
-            
-            if len(data) < offset + 1 + length_bytes:
+            if data[offset] == 0:
                 return None
-            
-            length = 0
-            for i in range(length_bytes):
-                length = (length << 8) + data[offset + 1 + i]
-            
-            return length + offset + 1 + length_bytes
+            length = int.from_bytes(data[offset:offset + length_bytes], 'big')
+            if length < 0x80:
+                return None
+            offset += length_bytes
+        
+        end = offset + length
+        if end > limit:
+            return None
+        return tag, offset, end
+    
+    def _der_children(self, start, end, max_children=16):
+        """
+        列出[start, end)范围内的直接子TLV
+        子TLV必须恰好铺满整个范围，否则返回None
+        """
+        children = []
+        pos = start
+        while pos < end:
+            if len(children) >= max_children:
+                return None
+            tlv = self._read_tlv(pos, end)
+            if tlv is None:
+                return None
+            children.append(tlv)
+            pos = tlv[2]
+        return children
+    
+    def _der_integer_equals(self, tlv, value):
+        """检查INTEGER TLV是否为指定的小整数"""
+        tag, content_start, end = tlv
+        return tag == 0x02 and end - content_start == 1 and self.data[content_start] == value
+    
+    def _classify_der(self, content_start, end):
+        """
+        根据SEQUENCE直接子元素的形状判断结构类型
+        只看前几层标签，形状不符的候选在几个字节内即被拒绝
+        """
+        children = self._der_children(content_start, end)
+        if not children:
+            return None
+        
+        tags = [child[0] for child in children]
+        data = self.data
+        
+        # X.509证书: SEQUENCE { tbsCertificate, signatureAlgorithm, signatureValue }
+        if tags == [0x30, 0x30, 0x03]:
+            tbs = self._der_children(children[0][1], children[0][2])
+            if tbs and len(tbs) >= 6:
+                tbs_tags = [child[0] for child in tbs]
+                if tbs_tags[0] == 0xa0:
+                    tbs_tags = tbs_tags[1:]
+                if tbs_tags[:2] == [0x02, 0x30]:
+                    return 'X509_CERTIFICATE'
+            return None
+        
+        # SubjectPublicKeyInfo: SEQUENCE { AlgorithmIdentifier, BIT STRING }
+        if tags == [0x30, 0x03]:
+            algorithm = self._der_children(children[0][1], children[0][2], 2)
+            if not algorithm or algorithm[0][0] != 0x06:
+                return None
+            oid = data[algorithm[0][1]:algorithm[0][2]]
+            if oid == self.OID_RSA_ENCRYPTION:
+                return 'SPKI_RSA_PUBLIC_KEY'
+            if oid == self.OID_EC_PUBLIC_KEY:
+                return 'SPKI_EC_PUBLIC_KEY'
+            return 'SPKI_PUBLIC_KEY'
+        
+        # PKCS#1 RSA私钥: SEQUENCE { version(0), n, e, d, p, q, dp, dq, qinv }
+        if len(tags) >= 9 and all(tag == 0x02 for tag in tags) and \
+                self._der_integer_equals(children[0], 0):
+            return 'RSA_PRIVATE_KEY'
+        
+        # PKCS#1 RSA公钥: SEQUENCE { modulus, publicExponent }
+        if tags == [0x02, 0x02] and children[0][2] - children[0][1] >= 64:
+            return 'RSA_PUBLIC_KEY'
+        
+        # PKCS#8私钥: SEQUENCE { version, AlgorithmIdentifier, OCTET STRING, ... }
+        if len(tags) >= 3 and tags[:3] == [0x02, 0x30, 0x04] and \
+                (self._der_integer_equals(children[0], 0) or self._der_integer_equals(children[0], 1)):
+            return 'PKCS8_PRIVATE_KEY'
+        
+        # SEC1 EC私钥: SEQUENCE { version(1), privateKey, [0] parameters, [1] publicKey }
+        if 2 <= len(tags) <= 4 and tags[1] == 0x04 and \
+                self._der_integer_equals(children[0], 1) and \
+                all(tag in (0xa0, 0xa1) for tag in tags[2:]):
+            return 'EC_PRIVATE_KEY'
+        
+        return None
+    
+    def _validate_der_tree(self, content_start, end, depth):
+        """
+        迭代方式校验嵌套结构，最多深入到self.max_der_depth层
+        每个构造类型的子元素都必须恰好铺满其父元素
+        """
+        stack = [(content_start, end, depth)]
+        while stack:
+            start, stop, level = stack.pop()
+            pos = start
+            while pos < stop:
+                tlv = self._read_tlv(pos, stop)
+                if tlv is None:
+                    return False
+                tag, child_start, child_end = tlv
+                if tag & 0x20 and level < self.max_der_depth:
+                    stack.append((child_start, child_end, level + 1))
+                pos = child_end
+        return True
     
     def search_key_patterns(self):
         """搜索密钥相关的二进制模式"""
@@ -210,6 +293,26 @@ class X509Extractor:
         self.findings['KEY_PATTERNS'] = found_patterns
         return found_patterns
     
+    def search_key_windows(self, top_n=32):
+        """
+        搜索对称密钥(AES/HMAC)候选窗口
+        使用KeyWindowDetector对整个文件一次性计算窗口统计量，结果按评分排序
+        """
+        print("\n=== 搜索对称密钥窗口 ===")
+        
+        if not HAS_NUMPY:
+            print("警告: numpy 未安装，跳过对称密钥窗口搜索")
+            self.findings['KEY_WINDOWS'] = []
+            return []
+        
+        found_windows = KeyWindowDetector(self.data).detect(top_n=top_n)
+        for item in found_windows:
+            print("✓ 发现 {}: 位置 0x{:08x}, 评分 {:.3f}, 熵值 {:.2f}".format(
+                item['type'], item['start'], item['score'], item['entropy']))
+        
+        self.findings['KEY_WINDOWS'] = found_windows
+        return found_windows
+    
     def _looks_like_key_data(self, data):
         """判断数据是否像密钥数据"""
         if len(data) < 32:
@@ -306,6 +409,12 @@ class X509Extractor:
                 print("✓ 发现 {}: 位置 0x{:08x}".format(name, pos))
                 start_pos = pos + 1
         
+        # 指纹库中的算法常量表 (AES/CRC/SHA/MD5/TEA/ChaCha/RC4)，一次扫描完成
+        for item in CryptoConstantScanner.shared().scan(self.data):
+            found_constants.append(item)
+            print("✓ 发现 {}: 位置 0x{:08x}, 大小 {} bytes{}".format(
+                item['type'], item['start'], item['size'], '' if item['complete'] else ' (部分)'))
+        
         self.findings['CRYPTO_CONSTANTS'] = found_constants
         return found_constants
     
@@ -381,6 +490,9 @@ class X509Extractor:
         # 搜索密钥模式
         self.search_key_patterns()
         
+        # 搜索对称密钥窗口
+        self.search_key_windows()
+        
         # 搜索加密常量
         self.search_crypto_constants()
         